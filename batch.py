@@ -0,0 +1,164 @@
+import csv
+import io
+import itertools
+import json
+import os
+import zipfile
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from ids import new_certificate_id
+from pdf_generator import generate_certificate_pdf
+from signing import signed_qr_payload
+
+ROSTER_FORMATS = ("csv", "ndjson")
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# Rows submitted to the render pool but not yet written out, per request.
+# Bounds memory use regardless of roster size.
+BATCH_MAX_IN_FLIGHT = int(os.environ.get("BATCH_MAX_IN_FLIGHT", (os.cpu_count() or 1) * 4))
+
+_generator = None
+
+
+def _get_generator():
+    global _generator
+    if _generator is None:
+        from content_generator import CertificateContentGenerator
+        _generator = CertificateContentGenerator()
+    return _generator
+
+
+def issue_certificate(row: Dict[str, Any], render_pdf: bool = True) -> Tuple[Dict[str, Any], Optional[bytes]]:
+    """
+    Build one certificate from a validated roster row.
+
+    Runs inside a worker process, so it only takes and returns picklable values.
+
+    Args:
+        row: CertificateRequest fields
+        render_pdf: Whether to also render the PDF
+
+    Returns:
+        The certificate record and the PDF bytes (None if not rendered)
+    """
+    certificate_id = new_certificate_id()
+    content = _get_generator().generate_content(
+        name=row["recipient_name"],
+        course=row["course_name"],
+        course_type=row["course_type"],
+        include_appreciation=row["include_appreciation"]
+    )
+    certificate = {
+        "recipient_name": row["recipient_name"],
+        "course_name": row["course_name"],
+        "issue_date": row["issue_date"],
+        "certificate_id": certificate_id,
+        "content": content
+    }
+    certificate["qr_payload"] = signed_qr_payload(certificate)
+    pdf = None
+    if render_pdf:
+        pdf = generate_certificate_pdf(certificate, layout=row["layout"]).getvalue()
+    return certificate, pdf
+
+
+def detect_roster_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    if content_type and content_type.split(";")[0].strip() in NDJSON_CONTENT_TYPES:
+        return "ndjson"
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+
+def iter_roster_rows(file: BinaryIO, roster_format: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Parse a CSV (with header row) or NDJSON roster incrementally.
+
+    Yields (row_number, row, error) tuples, where exactly one of row and error is set.
+    Reads the file through a buffered text stream, so only a small part of it is
+    held in memory at a time, and quoted CSV fields may contain newlines.
+    Blocking: iterate it in a thread.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        if roster_format == "csv":
+            yield from _csv_rows(text)
+        else:
+            yield from _ndjson_rows(text)
+    finally:
+        # Leave the underlying upload open for its owner to close
+        text.detach()
+
+
+def _csv_rows(text: io.TextIOWrapper) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    reader = csv.reader(text)
+    header = None
+    row_number = 0
+    while True:
+        try:
+            values = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            row_number += 1
+            yield row_number, None, f"could not parse row: {e}"
+            continue
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        yield row_number, {name: value for name, value in zip(header, values) if value != ""}, None
+
+
+def _ndjson_rows(text: io.TextIOWrapper) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    row_number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError("each NDJSON line must be an object")
+        except ValueError as e:
+            yield row_number, None, f"could not parse row: {e}"
+            continue
+        yield row_number, row, None
+
+
+def next_roster_rows(rows: Iterator, count: int) -> List[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """Up to `count` more rows from iter_roster_rows; an empty list once the roster is exhausted."""
+    return list(itertools.islice(rows, count))
+
+
+class ZipStream:
+    """Write-only file object that turns a ZipFile into a stream of chunks."""
+
+    def __init__(self):
+        self._chunks = []
+        # An object without tell()/seek() makes zipfile write streaming-friendly entries
+        self._zip = zipfile.ZipFile(self, mode="w", compression=zipfile.ZIP_STORED)
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def _drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+    def add(self, name: str, data: bytes) -> bytes:
+        """Add an entry and return the bytes to send for it."""
+        self._zip.writestr(name, data)
+        return self._drain()
+
+    def finish(self) -> bytes:
+        """Write the central directory and return the remaining bytes."""
+        self._zip.close()
+        return self._drain()
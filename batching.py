@@ -0,0 +1,92 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Generic, List, Sequence, TypeVar
+
+from metrics import Histogram
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class InferenceBatcher(Generic[T, R]):
+    """Coalesces concurrent single-item model calls into batched calls.
+
+    Callers block in `submit` (or `map`) from their own threads. A single
+    background thread takes the first queued item, collects more for up to
+    max_wait seconds or until max_batch_size items, runs batch_fn once on
+    the whole batch, and hands each caller its own result.
+    """
+
+    def __init__(self,
+                 name: str,
+                 batch_fn: Callable[[List[T]], Sequence[R]],
+                 max_batch_size: int = 16,
+                 max_wait: float = 0.005):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait = Histogram()
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+                    self._thread.start()
+
+    def map(self, items: Sequence[T]) -> List[R]:
+        """Submit several items at once and wait for all of their results."""
+        self._ensure_started()
+        futures = []
+        for item in items:
+            future: Future = Future()
+            self._queue.put((item, future, time.perf_counter()))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def submit(self, item: T) -> R:
+        return self.map([item])[0]
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.queue_wait.observe(started - enqueued)
+            self.batch_sizes.observe(len(batch))
+
+            try:
+                results = self.batch_fn([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_seconds": self.max_wait,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+        }
@@ -0,0 +1,71 @@
+"""Measure certificate search latency over a SQLite store.
+
+Run from the repository root:
+
+    python benchmarks/certificate_search.py [count]
+
+Builds a throwaway database of generated recipients, then times exact,
+prefix and misspelled queries.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import SQLiteCertificateStore
+
+FIRST_NAMES = ["Jane", "John", "Amara", "Chen", "Olga", "Mateo", "Priya", "Kwame", "Sofia", "Liam",
+               "Aiko", "Noah", "Fatima", "Lucas", "Zanele", "Emma", "Ravi", "Ines", "Omar", "Hana"]
+COURSES = ["Python Programming", "Machine Learning", "Data Engineering", "Cloud Security", "Project Management"]
+QUERIES = {
+    "exact": "{first} {last}",
+    "name and course": "{first} {last} python programming",
+    "prefix": "{first} {last_prefix}",
+    "misspelled": "{first} {last_typo}",
+}
+
+
+def surname(rng):
+    syllables = ["ka", "lo", "mi", "ran", "del", "son", "vic", "tor", "ber", "ma",
+                 "no", "zu", "shi", "wen", "gar", "pel", "sa", "ti", "mon", "ek"]
+    return "".join(rng.choice(syllables) for _ in range(rng.randint(3, 4))).capitalize()
+
+
+def typo(word, rng):
+    position = rng.randrange(1, len(word))
+    return word[:position] + word[position + 1:]
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rng = random.Random(0)
+    people = [(rng.choice(FIRST_NAMES), surname(rng)) for _ in range(count)]
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteCertificateStore(os.path.join(directory, "certificates.db"))
+        start = time.perf_counter()
+        for offset in range(0, count, 10_000):
+            store.put_many({
+                "certificate_id": str(uuid.uuid4()),
+                "recipient_name": f"{first} {last}",
+                "course_name": rng.choice(COURSES),
+                "issue_date": "2024-06-01",
+            } for first, last in people[offset:offset + 10_000])
+        print(f"Issued and indexed {count} certificates in {time.perf_counter() - start:.1f}s")
+
+        for label, template in QUERIES.items():
+            queries = []
+            for first, last in rng.sample(people, 200):
+                queries.append((last, template.format(first=first, last=last, last_prefix=last[:-2],
+                                                      last_typo=typo(last, rng))))
+            found = 0
+            start = time.perf_counter()
+            for last, query in queries:
+                results = store.search(query, limit=10)
+                found += any(last in certificate["recipient_name"] for certificate, _ in results)
+            elapsed = (time.perf_counter() - start) / len(queries)
+            print(f"{label:<16} {elapsed * 1000:6.2f} ms/query, wanted surname in top 10 for {found}/{len(queries)}")
+        store.close()
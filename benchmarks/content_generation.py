@@ -0,0 +1,28 @@
+"""Time bulk certificate content generation against the one-at-a-time path.
+
+Run from the repository root:
+
+    python benchmarks/content_generation.py [count]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from content_generator import CertificateContentGenerator
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    generator = CertificateContentGenerator()
+    rows = [(f"Recipient {i}", "Python Programming", "technical") for i in range(count)]
+
+    start = time.perf_counter()
+    for name, course, course_type in rows:
+        generator.generate_content(name, course, course_type)
+    print(f"generate_content  {time.perf_counter() - start:6.3f}s for {count}")
+
+    start = time.perf_counter()
+    for _ in generator.generate_batch(rows, seed=0):
+        pass
+    print(f"generate_batch    {time.perf_counter() - start:6.3f}s for {count}")
@@ -0,0 +1,291 @@
+"""Load and latency benchmarks for the API, run in-process, with regression checks.
+
+Run from the repository root:
+
+    python benchmarks/endpoints.py [--concurrency 8] [--requests 200] [--only verify_hit,listing]
+    python benchmarks/endpoints.py --update-baseline
+    python benchmarks/endpoints.py --check [--tolerance 0.5]
+
+Drives main.app and the content generator app through an ASGI client (no
+server or network), each scenario with `concurrency` requests in flight,
+and reports throughput and p50/p95/p99 latency. Peak RSS is reported once
+for the whole run, for this process and for the largest render process:
+ru_maxrss is a high-water mark, so per-scenario figures would only repeat
+the largest scenario so far.
+The chatbot runs with small stand-in models so it measures the serving
+path rather than BART. Micro-benchmarks time generate_qr_code and
+generate_certificate_pdf directly.
+
+With --check, results are compared with benchmarks/baseline.json: the run
+fails if a scenario's throughput drops, or its p95 latency rises, by more
+than --tolerance (default 50%; p95s of a few milliseconds are noisy).
+Baselines are machine-specific, so none is committed; record one with
+--update-baseline on the machine that runs the check.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+SEEDED_CERTIFICATES = 2000
+
+
+class StubZeroShot:
+    """Stands in for the BART zero-shot pipeline: picks the label sharing most words with the text."""
+
+    def __call__(self, texts, candidate_labels, hypothesis_template):
+        results = []
+        for text in [texts] if isinstance(texts, str) else texts:
+            words = set(text.lower().split())
+            labels = sorted(candidate_labels, key=lambda label: -len(words & set(label.split("_"))))
+            results.append({"sequence": text, "labels": labels, "scores": [1.0 / len(labels)] * len(labels)})
+        return results[0] if isinstance(texts, str) else results
+
+
+class StubSentenceTransformer:
+    """Stands in for the sentence transformer: hashed bag-of-words vectors."""
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        vectors = np.zeros((len(texts), 384), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % 384] += 1
+        if normalize_embeddings:
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+        return vectors
+
+
+class Lifespan:
+    """Runs an ASGI app's startup and shutdown handlers, which ASGI clients do not."""
+
+    def __init__(self, app):
+        self.app = app
+        self.messages = asyncio.Queue()
+        self.replies = asyncio.Queue()
+
+    async def __aenter__(self):
+        self.task = asyncio.create_task(self.app({"type": "lifespan"}, self.messages.get, self.replies.put))
+        await self.messages.put({"type": "lifespan.startup"})
+        reply = await self.replies.get()
+        if reply["type"] != "lifespan.startup.complete":
+            raise RuntimeError(f"Startup failed: {reply}")
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.messages.put({"type": "lifespan.shutdown"})
+        await self.replies.get()
+        await self.task
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF) -> float:
+    """Peak RSS of this process, or with RUSAGE_CHILDREN of the largest child waited for"""
+    # ru_maxrss is in kB on Linux and bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def summarize(latencies, elapsed, errors):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+    }
+
+
+async def load(send, requests, concurrency, expected_status=200):
+    """Call `send(i)` for i in range(requests), `concurrency` at a time; send returns a response."""
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await send(i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != expected_status:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+def micro(fn, iterations):
+    fn()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start, 0)
+
+
+def certificate(i):
+    return {
+        "recipient_name": f"Recipient {i}",
+        "course_name": ["Python Programming", "Data Science", "Web Design"][i % 3],
+        "issue_date": "2024-06-01",
+    }
+
+
+async def api_scenarios(args):
+    import httpx
+    import content_generator
+    import main
+    from qr_service import certificate_qr_payload
+
+    main.chatbot._intent_classifier = StubZeroShot()
+    main.chatbot._sentence_transformer = StubSentenceTransformer()
+    main.certificates_db.put_many({
+        **certificate(i),
+        "certificate_id": certificate_id,
+        "qr_payload": certificate_qr_payload(certificate_id),
+        "content": "This is to certify that the recipient has successfully completed the course.",
+    } for i, certificate_id in enumerate(str(uuid.UUID(int=i + 1)) for i in range(SEEDED_CERTIFICATES)))
+    ids = [str(uuid.UUID(int=i + 1)) for i in range(SEEDED_CERTIFICATES)]
+
+    async with Lifespan(main.app), Lifespan(content_generator.app):
+        # Worker processes must be up before PDF latencies mean anything
+        while not main.warmup_state["render_pool"] and not main.warmup_state["error"]:
+            await asyncio.sleep(0.05)
+        api = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench")
+        content = httpx.AsyncClient(transport=httpx.ASGITransport(app=content_generator.app), base_url="http://bench")
+        token = (await api.post("/token", data={"username": "admin", "password": "admin"})).json()["access_token"]
+        admin = {"Authorization": f"Bearer {token}"}
+        chat_messages = ["hello", "find the certificate for Recipient 42 in Data Science", "what can you do"]
+
+        # Scenario: request for the i-th call, or (request, expected status) when not 200
+        scenarios = {
+            "issuance": lambda i: api.post("/generate-certificate", json=certificate(i)),
+            "pdf_render": lambda i: api.post("/generate-certificate-pdf", json=certificate(i)),
+            "pdf_cached": lambda i: api.get(f"/certificates/{ids[i % 10]}/pdf"),
+            "verify_hit": lambda i: api.get(f"/verify-certificate/{ids[i * 7919 % len(ids)]}"),
+            "verify_miss": (lambda i: api.get(f"/verify-certificate/{uuid.uuid4()}"), 404),
+            "listing": lambda i: api.get("/certificates", params={"limit": 100}, headers=admin),
+            "chatbot": lambda i: api.post("/verify-certificate-chatbot", json={
+                "text": ids[i % len(ids)] if i % 4 == 0 else chat_messages[i % len(chat_messages)],
+                "conversation_id": f"bench-{i}",
+            }),
+            "content": lambda i: content.post("/api/generate-content", json={
+                "name": f"Recipient {i}", "course": "Python Programming"
+            }),
+            "appreciation": lambda i: content.post("/api/generate-appreciation", json={"course_type": "technical"}),
+        }
+        results = {}
+        for name, scenario in scenarios.items():
+            if args.only and name not in args.only:
+                continue
+            send, expected_status = scenario if isinstance(scenario, tuple) else (scenario, 200)
+            if name == "chatbot":
+                # Train the intent model and embed certificates issued by earlier scenarios
+                await asyncio.to_thread(main.chatbot.warm_up)
+            # One untimed request pays for other first-use costs (PDF cache fill)
+            await send(0)
+            results[name] = await load(send, args.requests, args.concurrency, expected_status)
+            print_result(name, results[name])
+        await api.aclose()
+        await content.aclose()
+    return results
+
+
+def micro_scenarios(args):
+    from pdf_generator import generate_certificate_pdf
+    from qr_service import generate_qr_code
+
+    data = {**certificate(0), "certificate_id": str(uuid.UUID(int=1)), "qr_payload": str(uuid.UUID(int=1))}
+    scenarios = {
+        "micro_generate_qr_code": lambda: generate_qr_code(str(uuid.uuid4())),
+        "micro_generate_certificate_pdf": lambda: generate_certificate_pdf(data),
+    }
+    results = {}
+    for name, fn in scenarios.items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = micro(fn, args.requests)
+        print_result(name, results[name])
+    return results
+
+
+def print_result(name, result):
+    print(f"{name:<32} {result['throughput']:9.1f}/s  p50 {result['p50_ms']:8.2f} ms  "
+          f"p95 {result['p95_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  errors {result['errors']}")
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if result["errors"]:
+            found.append(f"{name}: {result['errors']} failed requests")
+        if expected is None:
+            continue
+        if result["throughput"] < expected["throughput"] * (1 - tolerance):
+            found.append(f"{name}: throughput {result['throughput']}/s, baseline {expected['throughput']}/s")
+        if result["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+            found.append(f"{name}: p95 {result['p95_ms']} ms, baseline {expected['p95_ms']} ms")
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests (or calls) per scenario")
+    parser.add_argument("--only", type=lambda value: set(value.split(",")), help="comma-separated scenarios")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail on regressions against --baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update({
+            "CERTIFICATE_STORE_URL": f"sqlite:///{os.path.join(directory, 'certificates.db')}",
+            "PDF_CACHE_DIR": os.path.join(directory, "pdf_cache"),
+            "CHATBOT_WARMUP": "0",
+        })
+        results = asyncio.run(api_scenarios(args))
+    results.update(micro_scenarios(args))
+    # Render processes are waited for at shutdown, so RUSAGE_CHILDREN covers them now
+    print(f"peak RSS: benchmark process {peak_rss_mb():.1f} MB, "
+          f"largest render process {peak_rss_mb(resource.RUSAGE_CHILDREN):.1f} MB")
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Wrote {len(results)} scenarios to {args.baseline}")
+        sys.exit(0)
+
+    found = [f"{name}: {result['errors']} failed requests" for name, result in results.items() if result["errors"]]
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+            sys.exit(1)
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+    for regression in found:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if found else 0)
@@ -0,0 +1,70 @@
+"""Measure heap bytes per certificate for the record representations.
+
+Run from the repository root:
+
+    python benchmarks/record_memory.py [count]
+"""
+import os
+import random
+import sys
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qr_service import certificate_qr_payload, generate_qr_code
+from records import CertificateRecord, pack_certificate_id
+
+COURSES = ["Python Programming", "Machine Learning", "Data Engineering", "Cloud Security", "Project Management"]
+DATES = [f"2024-{month:02d}-{day:02d}" for month in range(1, 13) for day in range(1, 29)]
+CONTENT = ("This is to certify that {name} has successfully completed {course} with distinction.\n\n"
+           "We appreciate your dedication and commitment to learning.")
+SAMPLE_QR = generate_qr_code(certificate_qr_payload(str(uuid.uuid4())))
+
+
+def source_rows(count):
+    rng = random.Random(0)
+    for i in range(count):
+        course = rng.choice(COURSES)
+        name = f"Recipient {i}"
+        # Fresh string objects, as a request body or database row would produce them
+        yield {
+            "recipient_name": name,
+            "course_name": course.encode().decode(),
+            "issue_date": rng.choice(DATES).encode().decode(),
+            "certificate_id": str(uuid.uuid4()),
+            "content": CONTENT.format(name=name, course=course),
+        }
+
+
+def measure(label, count, build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    table = build(source_rows(count))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{label:<32} {(after - before) / count:8.0f} bytes/certificate")
+    return table
+
+
+def dicts_with_png(rows):
+    return {row["certificate_id"]: dict(row, qr_code=SAMPLE_QR.encode().decode()) for row in rows}
+
+
+def dicts_with_payload(rows):
+    return {row["certificate_id"]: dict(row, qr_payload=certificate_qr_payload(row["certificate_id"])) for row in rows}
+
+
+def records(rows):
+    table = {}
+    for row in rows:
+        record = CertificateRecord(qr_payload=certificate_qr_payload(row["certificate_id"]), **row)
+        table[pack_certificate_id(row["certificate_id"])] = record
+    return table
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    measure("dict + base64 PNG (original)", count, dicts_with_png)
+    measure("dict + QR payload", count, dicts_with_payload)
+    measure("CertificateRecord", count, records)
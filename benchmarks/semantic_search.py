@@ -0,0 +1,45 @@
+"""Time semantic top-k search over random embeddings at each storage dtype.
+
+Run from the repository root:
+
+    python benchmarks/semantic_search.py [count]
+
+Reports the index's memory, query latency and how often the top 10 agree
+with float32's.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semantic_index import DTYPES, SemanticIndex
+
+DIMENSIONS = 384
+QUERIES = 50
+
+
+def normalized(rows):
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rng = np.random.default_rng(0)
+    embeddings = normalized(rng.standard_normal((count, DIMENSIONS), dtype=np.float32))
+    queries = normalized(rng.standard_normal((QUERIES, DIMENSIONS), dtype=np.float32))
+    ids = [str(i) for i in range(count)]
+
+    exact = None
+    for dtype in DTYPES:
+        index = SemanticIndex(dtype)
+        index.add(ids, embeddings, watermark=count)
+        start = time.perf_counter()
+        results = [[certificate_id for certificate_id, _ in index.top_k(query, 10)] for query in queries]
+        elapsed = time.perf_counter() - start
+        exact = exact or results
+        overlap = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(results, exact)])
+        print(f"{dtype:<8} {index.stats()['bytes'] / 2**20:7.1f} MiB  "
+              f"{elapsed / QUERIES * 1000:6.2f} ms/query  top-10 recall {overlap:.3f}")
@@ -0,0 +1,72 @@
+"""Import-time profile and time-to-first-verification for main.py.
+
+Run from the repository root:
+
+    python benchmarks/startup_profile.py
+
+Starts fresh interpreters so nothing is already imported. Uses a temporary
+in-memory store.
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_VERIFY = r"""
+import time
+start = time.perf_counter()
+import asyncio
+import httpx
+import main
+imported = time.perf_counter()
+
+async def first_requests():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        main.certificates_db.put({
+            "certificate_id": "0b6f5e4e-3c1a-4d8e-9c55-4f1b1d6f2a77",
+            "recipient_name": "John Doe",
+            "course_name": "Python Programming",
+            "issue_date": "2024-01-01",
+        })
+        response = await client.get("/verify-certificate/0b6f5e4e-3c1a-4d8e-9c55-4f1b1d6f2a77")
+        assert response.status_code == 200, response.text
+        verified = time.perf_counter()
+        response = await client.get("/healthz")
+        assert response.status_code == 200
+
+    print(f"import main            {imported - start:7.3f} s")
+    print(f"first verification     {verified - start:7.3f} s")
+    print(f"models loaded          {main.chatbot.models_loaded()}")
+
+asyncio.run(first_requests())
+"""
+
+
+def run(args, **kwargs):
+    env = dict(os.environ, CERTIFICATE_STORE_URL="memory://")
+    return subprocess.run([sys.executable] + args, cwd=ROOT, env=env, capture_output=True, text=True, **kwargs)
+
+
+def import_profile(top: int = 15):
+    result = run(["-X", "importtime", "-c", "import main"])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line.split(":", 1)[1].split("|")]
+        rows.append((int(cumulative_us), int(self_us), name))
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    import_profile()
+    print()
+    result = run(["-c", FIRST_VERIFY])
+    sys.stdout.write(result.stdout)
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        sys.exit(result.returncode)
@@ -0,0 +1,78 @@
+"""Compare certificate lookups by ID through SQLite and the memory-mapped verify index.
+
+Run from the repository root:
+
+    python benchmarks/verify_index.py [count]
+
+Builds a throwaway database in a temporary directory, then reports lookups
+per second and, on Linux, how much of a reader's memory growth is heap.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qr_service import certificate_qr_payload
+from storage import SQLiteCertificateStore
+from verify_index import VerifyIndex
+
+LOOKUPS = 20_000
+
+
+def memory_kb():
+    """(heap, file-backed) resident kB of this process, from /proc; zeros elsewhere"""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = {line.split(":")[0]: int(line.split()[1]) for line in f if line.endswith("kB\n")}
+    except OSError:
+        return 0, 0
+    return fields.get("Anonymous", 0), fields.get("Rss", 0) - fields.get("Anonymous", 0)
+
+
+def timed_lookups(label, get, ids):
+    start = time.perf_counter()
+    for certificate_id in ids:
+        assert get(certificate_id) is not None
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {len(ids) / elapsed:10.0f} lookups/s  {elapsed / len(ids) * 1e6:6.1f} us each")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "certificates.db")
+        index_path = db_path + ".idx"
+        store = SQLiteCertificateStore(db_path)
+        ids = [str(uuid.uuid4()) for _ in range(count)]
+        store.put_many({
+            "certificate_id": certificate_id,
+            "recipient_name": f"Recipient {i}",
+            "course_name": "Python Programming",
+            "issue_date": "2024-06-01",
+            "qr_payload": certificate_qr_payload(certificate_id),
+            "content": "This is to certify that the recipient has successfully completed the course.",
+        } for i, certificate_id in enumerate(ids))
+
+        indexed = SQLiteCertificateStore(db_path, index_path=index_path)
+        start = time.perf_counter()
+        indexed.rebuild_index()
+        print(f"Built index of {count} certificates in {time.perf_counter() - start:.2f}s, "
+              f"{os.path.getsize(index_path) / count:.0f} bytes/certificate on disk")
+
+        sample = random.Random(0).sample(ids, min(LOOKUPS, count))
+        timed_lookups("SQLite", store.get, sample)
+        index = VerifyIndex(index_path)
+        before = memory_kb()
+        timed_lookups("Verify index", index.get, sample)
+        # Touch pages across the whole file, as a long-running worker eventually would
+        for certificate_id in ids[::50]:
+            index.get(certificate_id)
+        after = memory_kb()
+        # File-backed pages are the page cache, shared by every worker mapping the index
+        print(f"Reader memory growth: {after[0] - before[0]} kB heap, {after[1] - before[1]} kB file-backed")
+        store.close()
+        indexed.close()
@@ -0,0 +1,74 @@
+import hashlib
+import math
+import threading
+from typing import Iterable
+
+import numpy as np
+
+
+def _hashes(item: str):
+    digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+
+
+class BloomFilter:
+    """Set membership with no false negatives and a bounded false-positive rate.
+
+    Sized for `capacity` items at `fp_rate`; past capacity the rate rises,
+    so owners should rebuild a larger filter. Items cannot be removed.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float = 0.001):
+        self.capacity = max(capacity, 1)
+        self.fp_rate = fp_rate
+        self.num_bits = max(8, math.ceil(-self.capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def _positions(self, item: str):
+        h1, h2 = _hashes(item)
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item: str) -> None:
+        positions = self._positions(item)
+        with self._lock:
+            for position in positions:
+                self._bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def update(self, items: Iterable[str]) -> None:
+        """Add many items, setting bits with numpy rather than one at a time."""
+        hashes = np.array([_hashes(item) for item in items], dtype=np.uint64).reshape(-1, 2)
+        if not len(hashes):
+            return
+        # Same positions as _positions: (h1 + i * h2) mod m, reduced first so uint64 cannot overflow
+        hashes %= np.uint64(self.num_bits)
+        rounds = np.arange(self.num_hashes, dtype=np.uint64)
+        positions = ((hashes[:, :1] + rounds * hashes[:, 1:]) % np.uint64(self.num_bits)).ravel()
+        bits = np.frombuffer(self._bits, dtype=np.uint8)
+        with self._lock:
+            np.bitwise_or.at(bits, (positions >> np.uint64(3)).astype(np.intp),
+                             np.left_shift(np.uint64(1), positions & np.uint64(7)).astype(np.uint8))
+            self.count += len(hashes)
+
+    def __contains__(self, item: str) -> bool:
+        h1, h2 = _hashes(item)
+        bits = self._bits
+        num_bits = self.num_bits
+        # Most absent items fail on the first probe or two, so probe lazily
+        for i in range(self.num_hashes):
+            position = (h1 + i * h2) % num_bits
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def stats(self):
+        return {
+            "items": self.count,
+            "capacity": self.capacity,
+            "bytes": len(self._bits),
+            "hashes": self.num_hashes,
+            "target_fp_rate": self.fp_rate,
+        }
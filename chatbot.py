@@ -1,16 +1,19 @@
-import random
-from typing import Dict, Any, Optional
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.pipeline import Pipeline
-import os # Needed for potential model persistence
-import uuid
-from transformers import pipeline, AutoModelForSequenceClassification, AutoTokenizer
-import torch
-from sentence_transformers import SentenceTransformer, util
-import numpy as np
-import json
+from typing import Dict, Any, List, Optional, Tuple
+from collections import Counter
+from functools import lru_cache
+import threading
 import re
+import numpy as np
+from storage import CertificateStore
+from batching import InferenceBatcher
+from conversations import ConversationStore, MemoryConversationStore
+from metrics import span
+from ids import is_certificate_id, normalize_certificate_id
+from search import EDIT_MIN_LENGTH, tokenize, within_one_edit
+from semantic_index import SemanticIndex, certificate_text
+
+# transformers, sentence_transformers and sklearn are imported when their
+# models are first needed, so importing this module stays cheap
 
 # Define conversation states
 STATE_INITIAL = 'initial'
@@ -22,16 +25,32 @@ STATE_VERIFIED_FAIL = 'verified_fail'
 STATE_OTHER = 'other'
 STATE_ID_FOUND = 'id_found'
 
+# Sentence embedding model; stored certificate embeddings are keyed by it
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
 class CertificateChatbot:
-    def __init__(self, certificates_db: Dict[str, Dict[str, Any]]):
-        # Initialize the transformer models
-        self.intent_classifier = pipeline(
-            "zero-shot-classification",
-            model="facebook/bart-large-mnli"
-        )
+    def __init__(self,
+                 certificates_db: CertificateStore,
+                 intent_confidence_threshold: float = 0.5,
+                 batch_max_size: int = 16,
+                 batch_max_wait: float = 0.005,
+                 conversations: Optional[ConversationStore] = None,
+                 semantic_index_dtype: str = "float32",
+                 query_cache_size: int = 1024,
+                 semantic_sync_interval: float = 1.0):
+        # Models are loaded on first use or by warm_up()
+        self._intent_classifier = None
+        self._sentence_transformer = None
+        self._intent_model = None
+        self._model_lock = threading.Lock()
         
-        # Initialize sentence transformer for semantic similarity
-        self.sentence_transformer = SentenceTransformer('all-MiniLM-L6-v2')
+        # Concurrent conversations share batched model calls
+        self.zero_shot_batcher = InferenceBatcher(
+            "zero-shot", self._classify_batch, max_batch_size=batch_max_size, max_wait=batch_max_wait
+        )
+        self.embedding_batcher = InferenceBatcher(
+            "embedding", self._encode_batch, max_batch_size=batch_max_size * 4, max_wait=batch_max_wait
+        )
         
         # Store certificates database reference
         self.certificates_db = certificates_db
@@ -48,6 +67,27 @@ class CertificateChatbot:
             'ask_all': ['tell me everything', 'show all details', 'all information']
         }
         
+        # Extra phrasings used only to train the intent classifier
+        self.intent_examples = {
+            'greeting': ['hello there', 'hi bot', 'good morning', 'hey, how are you'],
+            'farewell': ['bye for now', 'see you later', 'that is all, goodbye', 'i am done'],
+            'thanks': ['thanks a lot', 'thank you so much', 'great, thanks', 'much appreciated'],
+            'ask_name': ['who owns this certificate', 'what is the name on it', 'whose certificate is this', 'who is the holder'],
+            'ask_course': ['what was the course', 'which program was completed', 'what subject is it for', 'what training is this'],
+            'ask_date': ['when was this issued', 'what date was it awarded', 'when did they get it', 'issued on which day'],
+            'ask_id': ['what is the certificate number', 'show me the id', 'which id is this', 'give me the verification code'],
+            'ask_all': ['show me everything', 'give me all the details', 'full details please', 'summarize the certificate']
+        }
+        
+        # Intent cascade: keyword match, then TF-IDF classifier, then zero-shot
+        # only when the classifier is below this confidence
+        self.intent_confidence_threshold = intent_confidence_threshold
+        self.intent_tier_hits = Counter()
+        self._keyword_patterns = {
+            intent: re.compile(r'\b(?:' + '|'.join(re.escape(p) for p in sorted(phrases, key=len, reverse=True)) + r')\b')
+            for intent, phrases in self.intents.items()
+        }
+        
         # Define conversation states
         self.STATE_INITIAL = 'initial'
         self.STATE_ID_FOUND = 'id_found'
@@ -55,39 +95,247 @@ class CertificateChatbot:
         self.STATE_VERIFIED_FAIL = 'verified_fail'
         self.STATE_OTHER = 'other'
         
-        # Store conversation states
-        self.conversation_states = {}
+        # Conversation states, bounded and expiring; they reference certificates by ID
+        self.conversations = conversations or MemoryConversationStore()
+        
+        # Certificate embeddings for semantic search, filled from the store as
+        # certificates are issued by a background thread; query embeddings are cached
+        self.semantic_index = SemanticIndex(semantic_index_dtype)
+        self.semantic_sync_interval = semantic_sync_interval
+        self.semantic_sync_error: Optional[str] = None
+        self._semantic_sync_lock = threading.Lock()
+        self._semantic_syncer: Optional[threading.Thread] = None
+        self._semantic_start_lock = threading.Lock()
+        self._semantic_dirty = threading.Event()
+        self._semantic_closed = threading.Event()
+        self._query_embedding = lru_cache(maxsize=query_cache_size)(self.embedding_batcher.submit)
 
     def is_certificate_id(self, text: str) -> bool:
-        """Check if the input text is a certificate ID in UUID format."""
-        # UUID format: 8-4-4-4-12 hexadecimal digits
-        uuid_pattern = r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
-        return bool(re.match(uuid_pattern, text.strip().lower()))
+        """Check if the input text is a certificate ID, either a ULID or a legacy UUID."""
+        return is_certificate_id(text)
+    
+    @property
+    def intent_classifier(self):
+        """Zero-shot classification pipeline (BART-large-MNLI), loaded on first use."""
+        if self._intent_classifier is None:
+            with self._model_lock:
+                if self._intent_classifier is None:
+                    from transformers import pipeline
+                    self._intent_classifier = pipeline(
+                        "zero-shot-classification",
+                        model="facebook/bart-large-mnli"
+                    )
+        return self._intent_classifier
+    
+    @property
+    def sentence_transformer(self):
+        """Sentence transformer for semantic similarity, loaded on first use."""
+        if self._sentence_transformer is None:
+            with self._model_lock:
+                if self._sentence_transformer is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._sentence_transformer = SentenceTransformer(EMBEDDING_MODEL)
+        return self._sentence_transformer
+    
+    @property
+    def intent_model(self):
+        """TF-IDF intent classifier, trained on first use."""
+        if self._intent_model is None:
+            with self._model_lock:
+                if self._intent_model is None:
+                    self._intent_model = self._train_intent_model()
+        return self._intent_model
+    
+    def warm_up(self) -> None:
+        """Load every model now rather than on the first message, then fill the semantic index."""
+        self.intent_model
+        self.intent_classifier
+        self.sentence_transformer
+        self.sync_semantic_index()
+        self.start_semantic_sync()
+    
+    def models_loaded(self) -> Dict[str, bool]:
+        return {
+            "intent_model": self._intent_model is not None,
+            "intent_classifier": self._intent_classifier is not None,
+            "sentence_transformer": self._sentence_transformer is not None
+        }
     
+    def _train_intent_model(self):
+        """Fit a small TF-IDF + logistic regression intent classifier on the intent phrases."""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import Pipeline
+        
+        texts, labels = [], []
+        for intent in self.intents:
+            for phrase in self.intents[intent] + self.intent_examples.get(intent, []):
+                texts.append(phrase)
+                labels.append(intent)
+        model = Pipeline([
+            ('tfidf', TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4), sublinear_tf=True)),
+            ('clf', LogisticRegression(C=20, max_iter=1000))
+        ])
+        model.fit(texts, labels)
+        return model
+    
+    def _keyword_intent(self, text: str) -> Optional[str]:
+        """Intent whose phrase matches the text, preferring the longest match; None if ambiguous."""
+        matches = {}
+        for intent, pattern in self._keyword_patterns.items():
+            found = pattern.findall(text)
+            if found:
+                matches[intent] = max(len(m) for m in found)
+        if not matches:
+            return None
+        best = max(matches.values())
+        winners = [intent for intent, length in matches.items() if length == best]
+        return winners[0] if len(winners) == 1 else None
+    
+    def _classifier_intent(self, text: str) -> Tuple[str, float]:
+        model = self.intent_model
+        probabilities = model.predict_proba([text])[0]
+        best = probabilities.argmax()
+        return str(model.classes_[best]), float(probabilities[best])
+    
+    @span("chatbot_intent")
     def get_intent(self, text: str) -> str:
-        """Classify the intent of the user's message using transformers."""
-        # Prepare the text for classification
-        candidate_labels = list(self.intents.keys())
-        
-        # Get classification results
-        result = self.intent_classifier(
-            text,
-            candidate_labels=candidate_labels,
-            hypothesis_template="This text is about {}."
-        )
+        """Classify the intent of the user's message, using the cheapest tier that is confident."""
+        normalized = text.strip().lower()
+        
+        intent = self._keyword_intent(normalized)
+        if intent is not None:
+            self.intent_tier_hits['keyword'] += 1
+            return intent
+        
+        intent, confidence = self._classifier_intent(normalized)
+        if confidence >= self.intent_confidence_threshold:
+            self.intent_tier_hits['classifier'] += 1
+            return intent
+        
+        # Fall back to zero-shot classification over all intent labels
+        self.intent_tier_hits['zero_shot'] += 1
+        result = self.zero_shot_batcher.submit(text)
         
         # Return the highest confidence intent
         return result['labels'][0]
     
+    def _classify_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Zero-shot classify a batch of messages in one pipeline call."""
+        results = self.intent_classifier(
+            texts,
+            candidate_labels=list(self.intents.keys()),
+            hypothesis_template="This text is about {}."
+        )
+        # The pipeline unwraps single-item batches
+        return [results] if isinstance(results, dict) else results
+    
+    def _encode_batch(self, texts: List[str]):
+        """Embed a batch of texts in one encode call; rows are L2-normalized."""
+        return list(self.sentence_transformer.encode(texts, convert_to_numpy=True, normalize_embeddings=True))
+    
+    def batching_stats(self) -> Dict[str, Any]:
+        return {
+            "zero_shot": self.zero_shot_batcher.stats(),
+            "embedding": self.embedding_batcher.stats()
+        }
+    
+    def intent_stats(self) -> Dict[str, Any]:
+        """Per-tier intent classification counts and hit rates."""
+        total = sum(self.intent_tier_hits.values())
+        return {
+            tier: {
+                "count": self.intent_tier_hits[tier],
+                "rate": self.intent_tier_hits[tier] / total if total else 0.0
+            }
+            for tier in ('keyword', 'classifier', 'zero_shot')
+        }
+    
     def get_semantic_similarity(self, text1: str, text2: str) -> float:
         """Calculate semantic similarity between two texts."""
-        # Encode the texts
-        embedding1 = self.sentence_transformer.encode(text1, convert_to_tensor=True)
-        embedding2 = self.sentence_transformer.encode(text2, convert_to_tensor=True)
+        # Encode both texts in the same batch
+        embedding1, embedding2 = self.embedding_batcher.map([text1, text2])
         
-        # Calculate cosine similarity
-        similarity = util.pytorch_cos_sim(embedding1, embedding2)
-        return similarity.item()
+        # Embeddings are normalized, so the dot product is the cosine similarity
+        return float(embedding1 @ embedding2)
+    
+    def sync_semantic_index(self) -> int:
+        """Add certificates issued since the last sync to the semantic index; returns how many.
+
+        Embeddings stored by any worker are reused, and the ones computed
+        here are stored, so each certificate is embedded once.
+        """
+        with self._semantic_sync_lock:
+            added = 0
+            while True:
+                changes = self.certificates_db.changes(self.semantic_index.watermark, limit=1000)
+                if not changes:
+                    return added
+                ids = [certificate['certificate_id'] for _, certificate in changes]
+                stored = self.certificates_db.get_embeddings(EMBEDDING_MODEL, ids)
+                missing = [certificate for _, certificate in changes if certificate['certificate_id'] not in stored]
+                if missing:
+                    vectors = self._encode_batch([certificate_text(certificate) for certificate in missing])
+                    computed = {
+                        certificate['certificate_id']: np.asarray(vector, dtype=np.float32).tobytes()
+                        for certificate, vector in zip(missing, vectors)
+                    }
+                    self.certificates_db.put_embeddings(EMBEDDING_MODEL, computed)
+                    stored.update(computed)
+                embeddings = np.stack([np.frombuffer(stored[certificate_id], dtype=np.float32) for certificate_id in ids])
+                self.semantic_index.add(ids, embeddings, watermark=changes[-1][0])
+                added += len(ids)
+    
+    def start_semantic_sync(self) -> None:
+        """Start the background thread that fills the semantic index and keeps it caught up, or wake it."""
+        if self._semantic_syncer is None:
+            with self._semantic_start_lock:
+                if self._semantic_syncer is None:
+                    self._semantic_syncer = threading.Thread(
+                        target=self._semantic_sync_loop, name="chatbot-semantic-sync", daemon=True
+                    )
+                    self._semantic_syncer.start()
+        self._semantic_dirty.set()
+
+    def _semantic_sync_loop(self) -> None:
+        while not self._semantic_closed.is_set():
+            self._semantic_dirty.wait(self.semantic_sync_interval)
+            if self._semantic_closed.is_set():
+                break
+            self._semantic_dirty.clear()
+            try:
+                self.sync_semantic_index()
+                self.semantic_sync_error = None
+            except Exception as e:
+                # Searches keep working from the current snapshot
+                self.semantic_sync_error = str(e)
+
+    def close(self) -> None:
+        self._semantic_closed.set()
+        self._semantic_dirty.set()
+
+    def semantic_search(self, query: str, k: int = 10) -> List[Tuple[Dict[str, Any], float]]:
+        """Certificates closest in meaning to a free-text query, with cosine similarities.
+
+        Searches the index as it stands, which is empty until the background
+        thread's first fill; certificates issued since the last sync show up
+        once the thread has embedded them.
+        """
+        self.start_semantic_sync()
+        results = []
+        for certificate_id, score in self.semantic_index.top_k(self._query_embedding(query.strip()), k):
+            certificate = self.certificates_db.get(certificate_id)
+            if certificate is not None:
+                results.append((certificate, score))
+        return results
+    
+    def semantic_stats(self) -> Dict[str, Any]:
+        cache = self._query_embedding.cache_info()
+        return dict(
+            self.semantic_index.stats(),
+            sync_error=self.semantic_sync_error,
+            query_cache={"hits": cache.hits, "misses": cache.misses, "entries": cache.currsize}
+        )
     
     def get_certificate_summary(self, certificate_data: Dict[str, Any]) -> str:
         """Generate a summary of all certificate details."""
@@ -99,39 +347,127 @@ class CertificateChatbot:
             f"• Certificate ID: {certificate_data['certificate_id']}"
         )
 
+    # Words in requests like "find the certificate for Jane Doe" that are not part of a name
+    SEARCH_STOPWORDS = frozenset((
+        "a", "an", "and", "by", "can", "certificate", "certificates", "course", "find", "for", "from",
+        "i", "in", "is", "issued", "look", "me", "my", "of", "on", "please", "search", "show", "the",
+        "to", "up", "verify", "who", "with", "you"
+    ))
+    # Search score a certificate needs before it is considered; low enough for a
+    # typo in each word, since it must also name both recipient and course
+    SEARCH_MATCH_SCORE = 0.4
+    # Cosine similarity a certificate needs before a semantic match is offered
+    SEMANTIC_MATCH_SCORE = 0.5
+
+    @span("chatbot_search")
+    def _search_response(self, conversation_id: str, user_input: str) -> Optional[Dict[str, Any]]:
+        """Look for certificates by recipient and course name in a free-text message.
+
+        Returns None when nothing matches well enough.
+        """
+        words = self._search_words(user_input)
+        results = self.certificates_db.search(" ".join(words), limit=4) if words else []
+        results = [(certificate, score) for certificate, score in results if score >= self.SEARCH_MATCH_SCORE]
+        return self._offer_certificates(conversation_id, words, results)
+
+    @span("chatbot_semantic")
+    def _semantic_response(self, conversation_id: str, user_input: str) -> Optional[Dict[str, Any]]:
+        """Look for certificates described in a message, for wording keyword search misses.
+
+        Returns None when nothing is close enough in meaning.
+        """
+        results = self.semantic_search(user_input, k=4)
+        results = [(certificate, score) for certificate, score in results if score >= self.SEMANTIC_MATCH_SCORE]
+        return self._offer_certificates(conversation_id, self._search_words(user_input), results)
+
+    def _revoked_response(self, conversation_id: str) -> Dict[str, Any]:
+        self.conversations.delete(conversation_id)
+        return {
+            "response": "This certificate has been revoked and is no longer valid.",
+            "conversation_id": conversation_id
+        }
+
+    def _search_words(self, user_input: str) -> List[str]:
+        return [word for word in tokenize(user_input) if word not in self.SEARCH_STOPWORDS]
+
+    @staticmethod
+    def _names(words: List[str], text: str) -> bool:
+        """Whether a message word is one of text's words, or one typo away from it; prefixes do not count"""
+        tokens = tokenize(text)
+        return any(
+            word == token or (len(word) >= EDIT_MIN_LENGTH and within_one_edit(word, token))
+            for word in words for token in tokens
+        )
+
+    def _offer_certificates(self, conversation_id: str, words: List[str],
+                            results: List[Tuple[Dict[str, Any], float]]) -> Optional[Dict[str, Any]]:
+        """Select the one certificate a message names by both recipient and course; None if none does.
+
+        The chatbot is unauthenticated, so matches are never listed: a message
+        naming several certificates is asked for the ID instead.
+        """
+        results = [
+            (certificate, score) for certificate, score in results
+            if self._names(words, certificate['recipient_name']) and self._names(words, certificate['course_name'])
+        ]
+        if not results:
+            return None
+        if len(results) > 1:
+            return {
+                "response": "Several certificates match that description. Please reply with the certificate ID.",
+                "conversation_id": conversation_id
+            }
+        certificate = results[0][0]
+        if self.certificates_db.is_revoked(certificate['certificate_id']):
+            return self._revoked_response(conversation_id)
+        self.conversations.set(conversation_id, {
+            "state": self.STATE_ID_FOUND,
+            "certificate_id": certificate['certificate_id']
+        })
+        return {
+            "response": (
+                f"I found a certificate for {certificate['recipient_name']} in {certificate['course_name']}. "
+                "What would you like to know about it?"
+            ),
+            "conversation_id": conversation_id
+        }
+
     def get_bot_response(self, conversation_id: str, user_input: str, certificate_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Get bot response based on user input and conversation state."""
-        # Get or initialize conversation state
-        if conversation_id not in self.conversation_states:
-            self.conversation_states[conversation_id] = {
-                "state": self.STATE_INITIAL,
-                "certificate_data": None
-            }
-        
-        state = self.conversation_states[conversation_id]
+        # Get conversation state; new conversations are only stored once they find a certificate
+        state = self.conversations.get(conversation_id) or {
+            "state": self.STATE_INITIAL,
+            "certificate_id": None
+        }
         
         # If certificate data is provided (from QR scan), update state
         if certificate_data:
-            state["certificate_data"] = certificate_data
-            state["state"] = self.STATE_ID_FOUND
+            if self.certificates_db.is_revoked(certificate_data['certificate_id']):
+                return self._revoked_response(conversation_id)
+            self.conversations.set(conversation_id, {
+                "state": self.STATE_ID_FOUND,
+                "certificate_id": certificate_data['certificate_id']
+            })
             return {
                 "response": f"I found a certificate for {certificate_data['recipient_name']}. What would you like to know about it?",
                 "conversation_id": conversation_id
             }
         
-        # Get intent from user input
-        intent = self.get_intent(user_input)
-        
         # Handle different states
         if state["state"] == self.STATE_INITIAL:
             # Check if input is a certificate ID
             if self.is_certificate_id(user_input):
                 # Check if certificate exists in database
-                if user_input in self.certificates_db:
-                    state["certificate_data"] = self.certificates_db[user_input]
-                    state["state"] = self.STATE_ID_FOUND
+                certificate = self.certificates_db.get(normalize_certificate_id(user_input))
+                if certificate is not None and self.certificates_db.is_revoked(certificate['certificate_id']):
+                    return self._revoked_response(conversation_id)
+                if certificate is not None:
+                    self.conversations.set(conversation_id, {
+                        "state": self.STATE_ID_FOUND,
+                        "certificate_id": certificate['certificate_id']
+                    })
                     return {
-                        "response": f"I found a certificate for {state['certificate_data']['recipient_name']}. What would you like to know about it?",
+                        "response": f"I found a certificate for {certificate['recipient_name']}. What would you like to know about it?",
                         "conversation_id": conversation_id
                     }
                 else:
@@ -140,7 +476,13 @@ class CertificateChatbot:
                         "conversation_id": conversation_id
                     }
             
+            # Free text may name a recipient and course
+            found = self._search_response(conversation_id, user_input)
+            if found is not None:
+                return found
+            
             # Handle other intents
+            intent = self.get_intent(user_input)
             if intent == 'greeting':
                 return {
                     "response": "Hello! I'm your certificate verification assistant. Please provide a certificate ID to get started.",
@@ -152,15 +494,28 @@ class CertificateChatbot:
                     "conversation_id": conversation_id
                 }
             else:
+                # Descriptions keyword search missed ("the data course Jane took last spring")
+                found = self._semantic_response(conversation_id, user_input)
+                if found is not None:
+                    return found
                 return {
-                    "response": "Please provide a certificate ID to get started.",
+                    "response": "Please provide a certificate ID, or the recipient's name and course, to get started.",
                     "conversation_id": conversation_id
                 }
         
         # Handle ID_FOUND state
         elif state["state"] == self.STATE_ID_FOUND:
+            cert_data = self.certificates_db.get(state["certificate_id"])
+            if cert_data is None:
+                self.conversations.delete(conversation_id)
+                return {
+                    "response": "I can no longer find that certificate. Please provide a certificate ID to start again.",
+                    "conversation_id": conversation_id
+                }
+            if self.certificates_db.is_revoked(cert_data['certificate_id']):
+                return self._revoked_response(conversation_id)
+            intent = self.get_intent(user_input)
             if intent == 'ask_all':
-                cert_data = state["certificate_data"]
                 return {
                     "response": f"Here are all the details for certificate {cert_data['certificate_id']}:\n"
                               f"• Recipient: {cert_data['recipient_name']}\n"
@@ -171,27 +526,27 @@ class CertificateChatbot:
                 }
             elif intent == 'ask_name':
                 return {
-                    "response": f"The certificate belongs to {state['certificate_data']['recipient_name']}.",
+                    "response": f"The certificate belongs to {cert_data['recipient_name']}.",
                     "conversation_id": conversation_id
                 }
             elif intent == 'ask_course':
                 return {
-                    "response": f"This certificate is for the course: {state['certificate_data']['course_name']}.",
+                    "response": f"This certificate is for the course: {cert_data['course_name']}.",
                     "conversation_id": conversation_id
                 }
             elif intent == 'ask_date':
                 return {
-                    "response": f"The certificate was issued on {state['certificate_data']['issue_date']}.",
+                    "response": f"The certificate was issued on {cert_data['issue_date']}.",
                     "conversation_id": conversation_id
                 }
             elif intent == 'ask_id':
                 return {
-                    "response": f"The certificate ID is {state['certificate_data']['certificate_id']}.",
+                    "response": f"The certificate ID is {cert_data['certificate_id']}.",
                     "conversation_id": conversation_id
                 }
             elif intent == 'greeting':
                 return {
-                    "response": f"Hello! I can tell you about the certificate for {state['certificate_data']['recipient_name']}. What would you like to know?",
+                    "response": f"Hello! I can tell you about the certificate for {cert_data['recipient_name']}. What would you like to know?",
                     "conversation_id": conversation_id
                 }
             elif intent == 'farewell':
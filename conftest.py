@@ -0,0 +1,55 @@
+import os
+import tempfile
+
+import pytest
+
+# Set before main is imported: a throwaway store and PDF cache, and no model warm-up
+_directory = tempfile.mkdtemp(prefix="certificate-tests-")
+os.environ.setdefault("CERTIFICATE_STORE_URL", "memory://")
+os.environ.setdefault("PDF_CACHE_DIR", os.path.join(_directory, "pdf_cache"))
+os.environ.setdefault("CHATBOT_WARMUP", "0")
+os.environ.setdefault("RENDER_WORKERS", "2")
+
+collect_ignore = [
+    # Exercises a running server at localhost:8000
+    "test_certificate.py",
+    "benchmarks",
+    "frontend",
+]
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def admin(client):
+    token = client.post("/token", data={"username": "admin", "password": "admin"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def certificate_request():
+    """Body for issuing a certificate"""
+    return {"recipient_name": "Jane Doe", "course_name": "Python Programming", "issue_date": "2024-06-01"}
+
+
+@pytest.fixture
+def issue(client, certificate_request):
+    """Issue a certificate through the API and return it"""
+    def issue():
+        response = client.post("/generate-certificate", json=certificate_request)
+        assert response.status_code == 200
+        return response.json()
+    return issue
+
+
+@pytest.fixture
+def certificate_id(issue):
+    return issue()["certificate_id"]
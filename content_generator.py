@@ -1,12 +1,18 @@
+import json
+import os
 import random
-from typing import List, Dict
+import secrets
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
+import numpy as np
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import uvicorn
-import pandas as pd
-from sklearn.preprocessing import LabelEncoder
-from sklearn.ensemble import RandomForestClassifier
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+# Rows drawn per vectorized pass in generate_batch; part of what a seed reproduces
+BATCH_CHUNK_SIZE = 8192
 
 class CertificateContentGenerator:
     def __init__(self):
@@ -14,6 +20,7 @@ class CertificateContentGenerator:
         self.templates = self._build_templates()
         self.achievements = self._build_achievements()
         self.appreciation_messages = self._build_appreciation_messages()
+        self._batch_parts = self._build_batch_parts()
         
     def _build_vocabulary(self) -> Dict[str, List[str]]:
         return {
@@ -98,6 +105,24 @@ class CertificateContentGenerator:
             "We congratulate you on this outstanding accomplishment."
         ]
     
+    def _build_batch_parts(self) -> Tuple[List[str], List[str], List[str]]:
+        """Every template/verb/qualifier combination pre-formatted around the name and course.
+
+        Combination (t, v, q) is at index (t * verbs + v) * qualifiers + q, as
+        (text before the name, text between name and course, text after the course).
+        """
+        heads, middles, tails = [], [], []
+        for template in self.templates:
+            for verb in self.vocabulary['achievement_verbs']:
+                for qualifier in self.vocabulary['qualifiers']:
+                    text = template.format(name="\0", achievement_verb=verb, course="\1", qualifier=qualifier)
+                    head, rest = text.split("\0")
+                    middle, tail = rest.split("\1")
+                    heads.append(head)
+                    middles.append(middle)
+                    tails.append(tail)
+        return heads, middles, tails
+    
     def _generate_achievement(self, course_type: str = 'technical') -> str:
         return random.choice(self.achievements.get(course_type, self.achievements['technical']))
     
@@ -140,7 +165,8 @@ class CertificateContentGenerator:
                                 name: str, 
                                 course: str, 
                                 course_type: str = 'technical',
-                                num_options: int = 3) -> List[str]:
+                                num_options: int = 3,
+                                seed: Optional[int] = None) -> List[str]:
         """
         Generate multiple content options for the certificate.
         
@@ -149,14 +175,46 @@ class CertificateContentGenerator:
             course: Course name
             course_type: Type of course
             num_options: Number of options to generate
+            seed: Seed for the choices; None draws fresh ones
             
         Returns:
             List of generated content options
         """
-        return [
-            self.generate_content(name, course, course_type, include_appreciation=True)
-            for _ in range(num_options)
-        ]
+        return list(self.generate_batch([(name, course, course_type)] * num_options, seed=seed))
+    
+    def generate_batch(self,
+                       rows: Iterable[Tuple[str, str, str]],
+                       seed: Optional[int] = None,
+                       include_appreciation: bool = True) -> Iterator[str]:
+        """
+        Generate content for many (name, course, course_type) rows, lazily and in row order.
+        
+        Template, verb, qualifier and appreciation choices are drawn for
+        BATCH_CHUNK_SIZE rows at a time from a NumPy generator, so the same
+        seed and rows always give the same texts.
+        
+        Args:
+            rows: (name, course, course_type) tuples
+            seed: Seed for the choices; None draws fresh ones
+            include_appreciation: Whether to append an appreciation message
+            
+        Returns:
+            Iterator of generated contents, one per row
+        """
+        heads, middles, tails = self._batch_parts
+        appreciations = [f"\n\n{message}" for message in self.appreciation_messages] if include_appreciation else [""]
+        # Each combination's closing text with each appreciation, indexed combination * len(appreciations) + appreciation
+        endings = [tail + appreciation for tail in tails for appreciation in appreciations]
+        rng = np.random.default_rng(seed)
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, BATCH_CHUNK_SIZE))
+            if not chunk:
+                return
+            combinations = rng.integers(0, len(heads), size=len(chunk))
+            ending_indices = combinations * len(appreciations) + rng.integers(0, len(appreciations), size=len(chunk))
+            for (name, course, _), combination, ending in zip(chunk, combinations.tolist(), ending_indices.tolist()):
+                yield f"{heads[combination]}{name}{middles[combination]}{course}{endings[ending]}"
 
 # Appreciation messages and course types for training
 appreciation_data = {
@@ -189,20 +247,33 @@ appreciation_data = {
         "Your art has touched the hearts of many."
     ]
 }
-df = pd.DataFrame(appreciation_data)
-le = LabelEncoder()
-X = le.fit_transform(df["course_type"]).reshape(-1, 1)
-y = df["appreciation_message"]
-clf = RandomForestClassifier()
-clf.fit(X, y)
+
+# Appreciation lookup table written by train_appreciation.py
+APPRECIATION_MODEL_PATH = os.environ.get(
+    "APPRECIATION_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "appreciation_model.json")
+)
+APPRECIATION_MODEL_VERSION = 1
+
+@lru_cache(maxsize=None)
+def _appreciation_model() -> Tuple[Dict[str, str], List[str]]:
+    """Load the trained predictions as a course type -> message table, plus fallback messages."""
+    with open(APPRECIATION_MODEL_PATH) as f:
+        model = json.load(f)
+    if model.get("version") != APPRECIATION_MODEL_VERSION:
+        raise ValueError(
+            f"{APPRECIATION_MODEL_PATH} has version {model.get('version')}, expected {APPRECIATION_MODEL_VERSION}; "
+            "retrain it with train_appreciation.py"
+        )
+    return model["messages"], model["fallback"]
 
 def predict_appreciation(course_type: str) -> str:
-    try:
-        x = le.transform([course_type]).reshape(-1, 1)
-        return clf.predict(x)[0]
-    except Exception:
-        # fallback to random if unknown course_type
-        return random.choice(df["appreciation_message"].tolist())
+    messages, fallback = _appreciation_model()
+    message = messages.get(course_type)
+    # fallback to random if unknown course_type
+    return message if message is not None else random.choice(fallback)
+
+def predict_appreciations(course_types: List[str]) -> List[str]:
+    return [predict_appreciation(course_type) for course_type in course_types]
 
 # FastAPI app setup
 app = FastAPI(title="Certificate Content Generator")
@@ -219,6 +290,11 @@ app.add_middleware(
 # Initialize the content generator
 generator = CertificateContentGenerator()
 
+@app.on_event("startup")
+async def load_appreciation_model():
+    # Fail at startup, not on the first request, if the artifact is missing or stale
+    _appreciation_model()
+
 class ContentRequest(BaseModel):
     name: str
     course: str
@@ -237,9 +313,22 @@ class ContentRequest(BaseModel):
             }
         }
 
+class BatchContentRow(BaseModel):
+    name: str
+    course: str
+    course_type: str = "technical"
+
+class BatchContentRequest(BaseModel):
+    rows: List[BatchContentRow]
+    seed: Optional[int] = Field(None, ge=0)
+    include_appreciation: bool = True
+
 class AppreciationRequest(BaseModel):
     course_type: str
 
+class BatchAppreciationRequest(BaseModel):
+    course_types: List[str]
+
 @app.post("/api/generate-content")
 async def generate_content(request: ContentRequest) -> List[str]:
     try:
@@ -253,10 +342,44 @@ async def generate_content(request: ContentRequest) -> List[str]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/generate-content/batch")
+async def generate_content_batch(request: BatchContentRequest):
+    """Stream one NDJSON line of content per row, in row order.
+
+    The seed used is returned in X-Content-Seed; sending it back with the
+    same rows reproduces the output.
+    """
+    seed = request.seed if request.seed is not None else secrets.randbits(63)
+    contents = generator.generate_batch(
+        ((row.name, row.course, row.course_type) for row in request.rows),
+        seed=seed,
+        include_appreciation=request.include_appreciation
+    )
+
+    # Lines are assembled from encoded strings; json.dumps of a dict per row costs more than generating it
+    encode = json.encoder.encode_basestring_ascii
+
+    def lines():
+        pending = []
+        for row, content in zip(request.rows, contents):
+            pending.append(f'{{"name": {encode(row.name)}, "course": {encode(row.course)}, "content": {encode(content)}}}')
+            if len(pending) >= BATCH_CHUNK_SIZE:
+                yield "\n".join(pending) + "\n"
+                pending = []
+        if pending:
+            yield "\n".join(pending) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Content-Seed": str(seed)})
+
 @app.post("/api/generate-appreciation")
 async def generate_appreciation(request: AppreciationRequest):
     message = predict_appreciation(request.course_type)
     return {"appreciation_message": message}
 
+@app.post("/api/generate-appreciation/batch")
+async def generate_appreciation_batch(request: BatchAppreciationRequest):
+    return {"appreciation_messages": predict_appreciations(request.course_types)}
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001) 
\ No newline at end of file
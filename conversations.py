@@ -0,0 +1,176 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Conversation state is a small dict: {"state": ..., "certificate_id": ...}.
+# Certificates are referenced by ID and looked up in the certificate store
+# when needed, never copied into the conversation.
+ConversationState = Dict[str, Any]
+
+
+class ConversationStore:
+    """Base class for chatbot conversation state backends.
+
+    Conversations expire after ttl seconds without activity, and at most
+    max_entries are kept, dropping the least recently active first.
+    """
+
+    def __init__(self, ttl: float = 1800, max_entries: int = 100_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+
+    def get(self, conversation_id: str) -> Optional[ConversationState]:
+        raise NotImplementedError
+
+    def set(self, conversation_id: str, state: ConversationState) -> None:
+        raise NotImplementedError
+
+    def delete(self, conversation_id: str) -> None:
+        raise NotImplementedError
+
+    def live(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {"live": self.live(), "evictions": self.evictions}
+
+
+class MemoryConversationStore(ConversationStore):
+    """Per-process store: an OrderedDict kept in least recently active order."""
+
+    def __init__(self, ttl: float = 1800, max_entries: int = 100_000):
+        super().__init__(ttl, max_entries)
+        self._states: "OrderedDict[str, Tuple[ConversationState, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        # Oldest entries are at the front, so stop at the first live one
+        while self._states:
+            conversation_id, (_, last_active) = next(iter(self._states.items()))
+            if now - last_active <= self.ttl:
+                break
+            del self._states[conversation_id]
+            self.evictions += 1
+
+    def get(self, conversation_id: str) -> Optional[ConversationState]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._states.get(conversation_id)
+            if entry is None:
+                return None
+            self._states[conversation_id] = (entry[0], now)
+            self._states.move_to_end(conversation_id)
+            return dict(entry[0])
+
+    def set(self, conversation_id: str, state: ConversationState) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._states[conversation_id] = (dict(state), now)
+            self._states.move_to_end(conversation_id)
+            self._expire(now)
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, conversation_id: str) -> None:
+        with self._lock:
+            self._states.pop(conversation_id, None)
+
+    def live(self) -> int:
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._states)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Store shared by all workers on a host through one SQLite file."""
+
+    # Expired and excess rows are pruned once every this many writes
+    PRUNE_EVERY = 256
+
+    def __init__(self, path: str, ttl: float = 1800, max_entries: int = 100_000):
+        super().__init__(ttl, max_entries)
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            " conversation_id TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations (updated_at)")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, conversation_id: str) -> Optional[ConversationState]:
+        now = time.time()
+        row = self._conn.execute(
+            "UPDATE conversations SET updated_at = ? WHERE conversation_id = ? AND updated_at >= ? RETURNING state",
+            (now, conversation_id, now - self.ttl),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, conversation_id: str, state: ConversationState) -> None:
+        self._conn.execute(
+            "INSERT INTO conversations (conversation_id, state, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (conversation_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+            (conversation_id, json.dumps(state), time.time()),
+        )
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self) -> None:
+        """Delete expired conversations and any beyond max_entries."""
+        conn = self._conn
+        expired = conn.execute("DELETE FROM conversations WHERE updated_at < ?", (time.time() - self.ttl,)).rowcount
+        excess = conn.execute(
+            "DELETE FROM conversations WHERE conversation_id IN ("
+            " SELECT conversation_id FROM conversations ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        with self._lock:
+            self.evictions += max(expired, 0) + max(excess, 0)
+
+    def delete(self, conversation_id: str) -> None:
+        self._conn.execute("DELETE FROM conversations WHERE conversation_id = ?", (conversation_id,))
+
+    def live(self) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM conversations WHERE updated_at >= ?", (time.time() - self.ttl,)
+        ).fetchone()[0]
+
+
+def create_conversation_store(url: Optional[str] = None, ttl: Optional[float] = None,
+                              max_entries: Optional[int] = None) -> ConversationStore:
+    """Create a store from a URL such as `memory://` or `sqlite:///conversations.db`.
+
+    Defaults come from CONVERSATION_STORE_URL, CONVERSATION_TTL_SECONDS and
+    CONVERSATION_MAX_ENTRIES.
+    """
+    url = url or os.environ.get("CONVERSATION_STORE_URL", "memory://")
+    ttl = ttl if ttl is not None else float(os.environ.get("CONVERSATION_TTL_SECONDS", 1800))
+    max_entries = max_entries if max_entries is not None else int(os.environ.get("CONVERSATION_MAX_ENTRIES", 100_000))
+    if url.startswith("memory://"):
+        return MemoryConversationStore(ttl, max_entries)
+    if url.startswith("sqlite:///"):
+        return SQLiteConversationStore(url[len("sqlite:///"):], ttl, max_entries)
+    raise ValueError(f"Unsupported conversation store URL: {url}")
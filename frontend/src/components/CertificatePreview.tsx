@@ -83,10 +83,14 @@ export default function CertificatePreview({
             Issued on:{" "}
             <span className="text-white">{certificate.issue_date}</span>
           </p>
-          {certificate.qr_code && (
+          {(certificate.qr_code || certificate.qr_code_url) && (
             <div className="mt-4 flex justify-center">
               <img
-                src={`data:image/png;base64,${certificate.qr_code}`}
+                src={
+                  certificate.qr_code
+                    ? `data:image/png;base64,${certificate.qr_code}`
+                    : `http://localhost:8000${certificate.qr_code_url}`
+                }
                 alt="Certificate QR Code"
                 className="w-32 h-32 bg-white p-2 rounded-lg"
               />
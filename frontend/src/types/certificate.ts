@@ -6,6 +6,7 @@ export interface Certificate {
   content: string;
   qr_code?: string;
   qr_code_url?: string;
+  qr_payload?: string;
 }
 
 export interface VerificationResult {
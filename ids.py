@@ -0,0 +1,86 @@
+import os
+import re
+import secrets
+import time
+import uuid
+from typing import Optional
+
+# "ulid" (default): 26-character, time-ordered IDs; "uuid4": the original random UUIDs
+ID_SCHEME = os.environ.get("CERTIFICATE_ID_SCHEME", "ulid").strip().lower()
+
+# Crockford's base32: no I, L, O or U, so IDs survive being read aloud or retyped
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {char: value for value, char in enumerate(_ALPHABET)}
+_DECODE.update({"I": 1, "L": 1, "O": 0})
+# Two characters per 10 bits; a ULID is 13 pairs
+_PAIRS = [first + second for first in _ALPHABET for second in _ALPHABET]
+_PAIR_SHIFTS = tuple(range(120, -1, -10))
+
+_ULID = re.compile(r"[0-7][0-9A-HJKMNP-TV-Z]{25}")
+_UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+# Certificate IDs of either scheme as they appear in free text, in any case
+CERTIFICATE_ID_PATTERN = re.compile(
+    r"\b(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-7][0-9A-Za-z]{25})\b"
+)
+
+_RANDOM_BITS = 80
+
+
+def encode_ulid(value: int) -> str:
+    return "".join([_PAIRS[(value >> shift) & 1023] for shift in _PAIR_SHIFTS])
+
+
+def decode_ulid(text: str) -> int:
+    value = 0
+    for char in text:
+        value = (value << 5) | _DECODE[char]
+    return value
+
+
+def new_ulid() -> str:
+    """A ULID: 48-bit millisecond timestamp then 80 random bits.
+
+    The random bits are fresh for every ID, so one ID does not reveal the
+    IDs issued alongside it; IDs made in the same millisecond sort in no
+    particular order.
+    """
+    millis = time.time_ns() // 1_000_000
+    return encode_ulid(millis << _RANDOM_BITS | secrets.randbits(_RANDOM_BITS))
+
+
+def new_certificate_id() -> str:
+    """A new certificate ID in the configured CERTIFICATE_ID_SCHEME"""
+    if ID_SCHEME == "uuid4":
+        return str(uuid.uuid4())
+    return new_ulid()
+
+
+def normalize_certificate_id(text: str) -> Optional[str]:
+    """The canonical form of a certificate ID (lowercase UUID, uppercase ULID), or None if it is not one"""
+    text = text.strip()
+    if _UUID.fullmatch(text.lower()):
+        return text.lower()
+    if len(text) == 26:
+        text = text.upper()
+        if all(char in _DECODE for char in text) and text[0] in "01234567":
+            return encode_ulid(decode_ulid(text))
+    return None
+
+
+def is_certificate_id(text: str) -> bool:
+    return normalize_certificate_id(text) is not None
+
+
+def is_ulid(certificate_id: str) -> bool:
+    return _ULID.fullmatch(certificate_id) is not None
+
+
+def ulid_timestamp(certificate_id: str) -> float:
+    """Unix time, in seconds, at which a ULID was made"""
+    return (decode_ulid(certificate_id) >> _RANDOM_BITS) / 1000
+
+
+def ulid_floor(timestamp: float) -> str:
+    """The smallest ULID made at or after a Unix time; IDs sorting at or above it were issued since then"""
+    return encode_ulid(max(int(timestamp * 1000), 0) << _RANDOM_BITS)
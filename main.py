@@ -1,20 +1,32 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Request
+from fastapi import FastAPI, HTTPException, Depends, status, Request, File, UploadFile, Query
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, Response, FileResponse, JSONResponse
+from pydantic import BaseModel, ValidationError
+from jose import JWTError, jwt
 from typing import Optional, List, Dict, Any
-import qrcode
-from io import BytesIO
+from datetime import datetime, timezone
 import base64
-import cv2
-import numpy as np
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from datetime import datetime
+import secrets
+import time
 import uuid
-from pdf_generator import generate_certificate_pdf
+import asyncio
+import json
+import logging
+import multiprocessing
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from pdf_generator import render_certificate_pdf, get_layout, DEFAULT_LAYOUT
+from storage import create_store
+from qr_service import qr_service, certificate_qr_payload, render_qr_png, signature_from_payload
+from ids import new_certificate_id, normalize_certificate_id
+from signing import InvalidSignature, load_signer, load_verifier, signed_qr_payload
+import batch
+from workers import render_pool, inference_pool, shutdown_pools, PoolBusy
+from pdf_cache import PDFCache, etag_matches
+from metrics import RequestMetrics, PrometheusText, span, stage_snapshots
+from conversations import create_conversation_store
+import os
 from content_generator import CertificateContentGenerator
 from chatbot import CertificateChatbot
 
@@ -27,10 +39,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Certificate-Id", "Server-Timing"],
 )
 
-# In-memory storage (replace with database in production)
-certificates_db: Dict[str, Dict[str, Any]] = {}
+# Request latencies by route, in-flight requests and Server-Timing headers; see /metrics
+app.add_middleware(RequestMetrics)
+
+# Certificate storage, configured with CERTIFICATE_STORE_URL (SQLite by default)
+certificates_db = create_store()
 users_db = {
     "admin": {
         "username": "admin",
@@ -39,9 +55,44 @@ users_db = {
     }
 }
 
+# Signs login tokens; workers that share clients must share the key
+AUTH_SECRET_KEY = os.environ.get("AUTH_SECRET_KEY") or secrets.token_urlsafe(32)
+ACCESS_TOKEN_EXPIRE_SECONDS = int(os.environ.get("ACCESS_TOKEN_EXPIRE_SECONDS", 3600))
+
+logger = logging.getLogger(__name__)
+
+@app.on_event("startup")
+async def check_auth_secret_key():
+    """Refuse to run several workers that would each sign tokens with their own random key"""
+    if os.environ.get("AUTH_SECRET_KEY"):
+        return
+    if int(os.environ.get("WEB_CONCURRENCY", 1)) > 1:
+        raise RuntimeError("AUTH_SECRET_KEY must be set when running more than one worker")
+    # uvicorn --workers runs the app in child processes
+    if multiprocessing.parent_process() is not None:
+        logger.warning(
+            "AUTH_SECRET_KEY is not set: each worker signs tokens with its own random key, "
+            "so a token is only accepted by the worker that issued it"
+        )
+
+# Rendered PDFs, reused across downloads of the same certificate
+pdf_cache = PDFCache(
+    os.environ.get("PDF_CACHE_DIR", ".pdf_cache"),
+    max_bytes=int(os.environ.get("PDF_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+)
+
 # Initialize the content generator and chatbot
 generator = CertificateContentGenerator()
-chatbot = CertificateChatbot(certificates_db=certificates_db)
+chatbot = CertificateChatbot(
+    certificates_db=certificates_db,
+    intent_confidence_threshold=float(os.environ.get("CHATBOT_INTENT_THRESHOLD", 0.5)),
+    batch_max_size=int(os.environ.get("CHATBOT_BATCH_MAX_SIZE", 16)),
+    batch_max_wait=float(os.environ.get("CHATBOT_BATCH_MAX_WAIT_MS", 5)) / 1000,
+    conversations=create_conversation_store(),
+    semantic_index_dtype=os.environ.get("SEMANTIC_INDEX_DTYPE", "float32"),
+    query_cache_size=int(os.environ.get("SEMANTIC_QUERY_CACHE_SIZE", 1024)),
+    semantic_sync_interval=float(os.environ.get("SEMANTIC_SYNC_INTERVAL_SECONDS", 1.0))
+)
 
 class Certificate(BaseModel):
     recipient_name: str
@@ -49,6 +100,8 @@ class Certificate(BaseModel):
     issue_date: str
     certificate_id: Optional[str] = None
     qr_code: Optional[str] = None
+    qr_code_url: Optional[str] = None
+    qr_payload: Optional[str] = None
     content: Optional[str] = None
 
 class User(BaseModel):
@@ -65,6 +118,7 @@ class CertificateRequest(BaseModel):
     issue_date: str
     course_type: str = "technical"
     include_appreciation: bool = True
+    layout: str = DEFAULT_LAYOUT
 
 class ChatbotRequest(BaseModel):
     text: str
@@ -73,6 +127,14 @@ class ChatbotRequest(BaseModel):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+@app.exception_handler(PoolBusy)
+async def pool_busy_handler(request: Request, exc: PoolBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 @app.post("/token", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     user = users_db.get(form_data.username)
@@ -82,148 +144,798 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return {"access_token": user["username"], "token_type": "bearer"}
+    claims = {"sub": user["username"], "exp": int(time.time()) + ACCESS_TOKEN_EXPIRE_SECONDS}
+    return {"access_token": jwt.encode(claims, AUTH_SECRET_KEY, algorithm="HS256"), "token_type": "bearer"}
+
+async def require_admin(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+    """The admin user a bearer token from /token was issued to; 401 for any other token"""
+    try:
+        username = jwt.decode(token, AUTH_SECRET_KEY, algorithms=["HS256"]).get("sub")
+    except JWTError:
+        username = None
+    user = users_db.get(username)
+    if user is None or user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+def canonical_certificate_id(certificate_id: str) -> str:
+    """A certificate ID path parameter in canonical form; IDs that are neither scheme pass through"""
+    # ULIDs are case-insensitive and UUIDs may arrive uppercased; the store keys the canonical form
+    return normalize_certificate_id(certificate_id) or certificate_id
 
 def verify_password(plain_password, hashed_password):
     return plain_password == "admin"  # In production, use proper password hashing
 
-def generate_qr_code(data: str) -> str:
-    """Generate QR code and return as base64 string"""
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(data)
-    qr.make(fit=True)
-    
-    # Create QR code image
-    qr_image = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to base64
-    buffered = BytesIO()
-    qr_image.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode()
+async def qr_png(qr_payload: str, wait: bool = False) -> bytes:
+    """QR PNG from the cache, rendered in the render pool on a miss"""
+    with span("qr"):
+        png = qr_service.cached_png(qr_payload)
+        if png is None:
+            png = await render_pool.run(render_qr_png, qr_payload, wait=wait)
+            qr_service.add_png(qr_payload, png)
+        return png
+
+# Background QR renders, referenced until they finish. They get a small budget
+# of their own and never take the second half of the render pool's queue, so
+# a burst of issuance cannot crowd out PDF renders that clients are waiting for.
+_prefetches = set()
+QR_PREFETCH_MAX_PENDING = int(os.environ.get("QR_PREFETCH_MAX_PENDING", max(1, render_pool.max_pending // 4)))
+
+def prefetch_qr(qr_payload: str) -> None:
+    """Render a new certificate's QR code into the cache in the background, if the render pool has room"""
+    if len(_prefetches) >= QR_PREFETCH_MAX_PENDING or render_pool.pending >= render_pool.max_pending // 2:
+        # Rendered on its first fetch instead
+        return
+
+    async def render():
+        try:
+            await qr_png(qr_payload)
+        except PoolBusy:
+            # Rendered on its first fetch instead
+            pass
+
+    task = asyncio.ensure_future(render())
+    _prefetches.add(task)
+    task.add_done_callback(_prefetches.discard)
+
+async def certificate_response(record: Dict[str, Any], wait: bool = False,
+                               fields: Optional[List[str]] = None,
+                               render_qr: bool = False) -> Dict[str, Any]:
+    """Shape a stored record as a Certificate
+
+    The QR image is served by qr_code_url; qr_code is only filled from the
+    QR cache, so verification never renders one.
+
+    Args:
+        fields: Certificate fields to include (all by default)
+        render_qr: Render the QR image on a cache miss, for callers that
+                   explicitly asked for qr_code
+    """
+    fields = fields or list(Certificate.model_fields)
+    response = {field: record.get(field) for field in fields}
+    if record.get("qr_payload"):
+        if "qr_code" in response:
+            if render_qr:
+                png = await qr_png(record["qr_payload"], wait=wait)
+            else:
+                png = qr_service.cached_png(record["qr_payload"])
+            if png is not None:
+                with span("qr_encode"):
+                    response["qr_code"] = base64.b64encode(png).decode()
+        if "qr_code_url" in response:
+            response["qr_code_url"] = f"/certificates/{record['certificate_id']}/qr"
+    return response
+
+async def issued_response(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Response for a certificate that has just been stored.
+
+    Nothing here may fail once the record is committed (a 503 would invite a
+    retry that issues a duplicate), so the QR image is not rendered inline.
+    """
+    prefetch_qr(record["qr_payload"])
+    return await certificate_response(record)
 
 @app.post("/generate-certificate", response_model=Certificate)
 async def generate_certificate(certificate: Certificate):
     # Generate unique certificate ID
-    certificate_id = str(uuid.uuid4())
-    certificate.certificate_id = certificate_id
+    certificate_id = new_certificate_id()
     
-    # Generate QR code
-    qr_data = f"Certificate ID: {certificate_id}"
-    certificate.qr_code = generate_qr_code(qr_data)
-    
-    # Store certificate
-    certificates_db[certificate_id] = certificate.dict()
+    # Store certificate; the QR code is rendered from its payload when needed
+    record = {
+        "recipient_name": certificate.recipient_name,
+        "course_name": certificate.course_name,
+        "issue_date": certificate.issue_date,
+        "certificate_id": certificate_id,
+        "content": certificate.content
+    }
+    # Carries a signed token when signing is configured, so the QR code verifies offline
+    record["qr_payload"] = signed_qr_payload(record)
+    with span("storage"):
+        await run_in_threadpool(certificates_db.put, record)
     
-    return certificate
+    return await issued_response(record)
 
 @app.get("/verify-certificate/{certificate_id}")
-async def verify_certificate(certificate_id: str):
-    if certificate_id not in certificates_db:
+async def verify_certificate(certificate_id: str = Depends(canonical_certificate_id)):
+    with span("lookup"):
+        certificate = certificates_db.get(certificate_id)
+    if certificate is None:
+        raise HTTPException(status_code=404, detail="Certificate not found")
+    with span("revocation"):
+        revoked = certificates_db.is_revoked(certificate_id)
+    if revoked:
+        raise HTTPException(status_code=410, detail="Certificate has been revoked")
+    return await certificate_response(certificate)
+
+class SignedVerificationRequest(BaseModel):
+    payload: str
+    check_revocation: bool = False
+
+@app.post("/verify-certificate/signed")
+async def verify_signed_certificate(request: SignedVerificationRequest):
+    """Verify a certificate from its signed QR payload, without reading the store.
+
+    `payload` is the scanned QR text or the bare token. With check_revocation
+    the store's revocation list is also consulted; `revoked` is null otherwise.
+    """
+    verifier = load_verifier()
+    if verifier is None:
+        raise HTTPException(status_code=501, detail="Signed verification is not configured")
+    token = signature_from_payload(request.payload) or request.payload.strip()
+    with span("signature"):
+        try:
+            certificate = verifier.verify(token)
+        except InvalidSignature as e:
+            raise HTTPException(status_code=400, detail=f"Invalid certificate signature: {e}")
+    revoked = None
+    if request.check_revocation:
+        with span("revocation"):
+            revoked = certificates_db.is_revoked(certificate["certificate_id"])
+    return {**certificate, "valid": not revoked, "revoked": revoked}
+
+@app.post("/certificates/{certificate_id}/revoke")
+async def revoke_certificate(
+    certificate_id: str = Depends(canonical_certificate_id),
+    admin: Dict[str, Any] = Depends(require_admin)
+):
+    """Revoke a certificate (admin only); signed verification with check_revocation then reports it"""
+    if certificates_db.get(certificate_id) is None:
         raise HTTPException(status_code=404, detail="Certificate not found")
-    return certificates_db[certificate_id]
+    await run_in_threadpool(certificates_db.revoke, certificate_id)
+    return {"certificate_id": certificate_id, "revoked": True}
+
+@app.get("/.well-known/jwks.json")
+async def jwks():
+    """Public keys that signed certificate QR codes verify against, for offline verifiers"""
+    verifier = load_verifier()
+    return verifier.jwks() if verifier is not None else {"keys": []}
+
+# Largest accepted photo or scan, in bytes, and most images in one request
+SCAN_MAX_BYTES = int(os.environ.get("SCAN_MAX_BYTES", 20 * 1024 * 1024))
+SCAN_MAX_IMAGES = int(os.environ.get("SCAN_MAX_IMAGES", 10))
+
+@app.post("/verify-certificate/scan")
+async def verify_certificate_scan(images: List[UploadFile] = File(...)):
+    """Verify the certificates whose QR codes appear in uploaded photos or scans.
+
+    Each image may hold several QR codes. Images are decoded in the render
+    pool, then every decoded ID is looked up in one store call.
+    """
+    # Imported here so processes that never scan do not pay for it; OpenCV
+    # itself is only loaded by the render processes
+    from qr_scan import decode_certificate_ids
+
+    if len(images) > SCAN_MAX_IMAGES:
+        raise HTTPException(status_code=413, detail=f"At most {SCAN_MAX_IMAGES} images can be scanned per request")
+    contents = []
+    for image in images:
+        data = await image.read(SCAN_MAX_BYTES + 1)
+        if len(data) > SCAN_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"{image.filename} is larger than {SCAN_MAX_BYTES} bytes")
+        contents.append(data)
+
+    # The request bounds its own size, so wait for pool slots rather than failing part-way
+    with span("qr_decode"):
+        decoded = await asyncio.gather(
+            *(render_pool.run(decode_certificate_ids, data, wait=True) for data in contents),
+            return_exceptions=True
+        )
+    with span("lookup"):
+        found = await run_in_threadpool(
+            certificates_db.get_many,
+            [certificate_id for ids in decoded if not isinstance(ids, BaseException) for certificate_id in ids]
+        )
+    with span("revocation"):
+        revoked = certificates_db.revoked(found)
+
+    results = []
+    for image, ids in zip(images, decoded):
+        if isinstance(ids, BaseException):
+            results.append({"filename": image.filename, "error": str(ids), "certificates": []})
+            continue
+        certificates = []
+        for certificate_id in ids:
+            certificate = found.get(certificate_id)
+            certificates.append({
+                "certificate_id": certificate_id,
+                "valid": certificate is not None and certificate_id not in revoked,
+                "revoked": certificate_id in revoked,
+                "recipient_name": certificate["recipient_name"] if certificate else None,
+                "course_name": certificate["course_name"] if certificate else None,
+                "issue_date": certificate["issue_date"] if certificate else None
+            })
+        results.append({"filename": image.filename, "certificates": certificates})
+    return {"results": results}
+
+@app.get("/certificates/stats")
+async def certificate_store_stats():
+    return certificates_db.stats()
+
+@app.get("/certificates/search")
+async def search_certificates(
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    admin: Dict[str, Any] = Depends(require_admin)
+):
+    """Find certificates by recipient and course name, best matches first.
+
+    Tolerates prefixes and small typos; each result carries a score from 0 to 1.
+    """
+    results = await run_in_threadpool(certificates_db.search, q, limit)
+    return [
+        {
+            "certificate_id": certificate["certificate_id"],
+            "recipient_name": certificate["recipient_name"],
+            "course_name": certificate["course_name"],
+            "issue_date": certificate["issue_date"],
+            "score": score
+        }
+        for certificate, score in results
+    ]
+
+@app.get("/certificates/semantic-search")
+async def semantic_search_certificates(
+    q: str,
+    k: int = Query(10, ge=1, le=100),
+    admin: Dict[str, Any] = Depends(require_admin)
+):
+    """Find certificates by meaning ("Jane's data science course last spring"), closest first.
+
+    Each result carries its cosine similarity to the query.
+    """
+    results = await inference_pool.run(chatbot.semantic_search, q, k)
+    return [
+        {
+            "certificate_id": certificate["certificate_id"],
+            "recipient_name": certificate["recipient_name"],
+            "course_name": certificate["course_name"],
+            "issue_date": certificate["issue_date"],
+            "score": round(score, 4)
+        }
+        for certificate, score in results
+    ]
+
+# Listing page sizes; exports read the table in pages of EXPORT_PAGE_SIZE
+LIST_PAGE_SIZE = 100
+LIST_MAX_PAGE_SIZE = 1000
+EXPORT_PAGE_SIZE = 1000
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in Certificate.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+def _encode_cursor(certificate_id: str) -> str:
+    return base64.urlsafe_b64encode(certificate_id.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @app.get("/certificates", response_model=List[Certificate])
-async def list_certificates(token: str = Depends(oauth2_scheme)):
-    return list(certificates_db.values())
+async def list_certificates(
+    admin: Dict[str, Any] = Depends(require_admin),
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    course_name: Optional[str] = None,
+    issue_date: Optional[str] = None,
+    issued_since: Optional[datetime] = None,
+    output: str = Query("json", alias="format")
+):
+    """List certificates ordered by ID, one page at a time.
+
+    When there are more results, the X-Next-Cursor header holds the cursor
+    for the next page. `fields` is a comma-separated subset of certificate
+    fields; QR images are only rendered when qr_code is named there. With
+    `format=ndjson` every matching certificate is streamed, one per line.
+    `issued_since` (ISO 8601, UTC unless a zone is given) lists only
+    certificates issued since then, which have time-ordered IDs.
+    """
+    if output not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+    selected = _parse_fields(fields)
+    # QR images are only rendered for listings that ask for them by name
+    render_qr = selected is not None and "qr_code" in selected
+    after = _decode_cursor(cursor) if cursor else None
+    since = None
+    if issued_since is not None:
+        if issued_since.tzinfo is None:
+            issued_since = issued_since.replace(tzinfo=timezone.utc)
+        since = issued_since.timestamp()
+
+    if output == "ndjson":
+        async def export():
+            last = after
+            while True:
+                page = await run_in_threadpool(
+                    certificates_db.find,
+                    course_name=course_name, issue_date=issue_date, limit=EXPORT_PAGE_SIZE, after=last,
+                    issued_since=since
+                )
+                for certificate in page:
+                    yield json.dumps(await certificate_response(certificate, wait=True, fields=selected, render_qr=render_qr)) + "\n"
+                if len(page) < EXPORT_PAGE_SIZE:
+                    break
+                last = page[-1]["certificate_id"]
+        return StreamingResponse(export(), media_type="application/x-ndjson")
+
+    # One extra row tells whether there is a next page
+    page = await run_in_threadpool(
+        certificates_db.find,
+        course_name=course_name, issue_date=issue_date, limit=limit + 1, after=after, issued_since=since
+    )
+    headers = {}
+    if len(page) > limit:
+        page = page[:limit]
+        headers["X-Next-Cursor"] = _encode_cursor(page[-1]["certificate_id"])
+    # Returned directly, skipping response_model validation of every item
+    return JSONResponse(
+        content=[await certificate_response(certificate, wait=True, fields=selected, render_qr=render_qr) for certificate in page],
+        headers=headers
+    )
+
+def _check_layout(layout: str) -> None:
+    try:
+        get_layout(layout)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Chunk size when streaming rendered PDFs
+PDF_STREAM_CHUNK_BYTES = 64 * 1024
+
+def _negotiate(accept: Optional[str], offered: List[str]) -> Optional[str]:
+    """The offered media type the Accept header prefers, earlier offers winning ties; None if none is acceptable
+
+    Each offer takes the q of the most specific range matching it (exact type,
+    then `type/*`, then `*/*`), so `application/pdf;q=0, */*` refuses PDFs.
+    """
+    if not accept:
+        return offered[0]
+    ranges = []
+    for part in accept.split(","):
+        pattern, *params = [piece.strip() for piece in part.split(";")]
+        if not pattern:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        ranges.append((pattern.lower(), q))
+
+    best, best_q = None, 0.0
+    for media_type in offered:
+        patterns = {media_type: 2, f"{media_type.split('/')[0]}/*": 1, "*/*": 0}
+        specificity, media_q = -1, 0.0
+        for pattern, q in ranges:
+            rank = patterns.get(pattern, -1)
+            if rank < 0:
+                continue
+            if rank > specificity or (rank == specificity and q > media_q):
+                specificity, media_q = rank, q
+        # q=0 is a refusal, even when a broader range would accept the type
+        if media_q > best_q:
+            best, best_q = media_type, media_q
+    return best
+
+def _chunks(data: bytes, size: int):
+    view = memoryview(data)
+    for start in range(0, len(view), size):
+        yield view[start:start + size]
 
 @app.post("/generate-certificate-pdf")
-async def generate_certificate_pdf_endpoint(request: CertificateRequest):
+async def generate_certificate_pdf_endpoint(request: CertificateRequest, http_request: Request):
+    """Issue a certificate and return its PDF.
+
+    Responds with the PDF itself (`application/pdf`) unless the client only
+    accepts `application/json`, the legacy mode, which returns the certificate
+    ID and the PDF as base64.
+    """
+    media_type = _negotiate(http_request.headers.get("accept"), ["application/pdf", "application/json"])
+    if media_type is None:
+        raise HTTPException(status_code=406, detail="Supported response types: application/pdf, application/json")
+    _check_layout(request.layout)
+
+    # Generate a unique certificate ID
+    certificate_id = new_certificate_id()
+    
+    # Create certificate data; this PDF's QR code holds the bare certificate ID, or
+    # the signed payload when signing is configured
+    certificate_data = {
+        "certificate_id": certificate_id,
+        "recipient_name": request.recipient_name,
+        "course_name": request.course_name,
+        "issue_date": request.issue_date
+    }
+    certificate_data["qr_payload"] = signed_qr_payload(certificate_data) if load_signer() else certificate_id
+    
+    # Generate PDF, drawing the QR code as vector modules
     try:
-        # Generate a unique certificate ID
-        certificate_id = str(uuid.uuid4())
-        
-        # Create certificate data
-        certificate_data = {
-            "certificate_id": certificate_id,
-            "recipient_name": request.recipient_name,
-            "course_name": request.course_name,
-            "issue_date": request.issue_date
-        }
-        
-        # Generate QR code
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(certificate_id)
-        qr.make(fit=True)
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convert QR code to base64
-        buffered = BytesIO()
-        qr_img.save(buffered, format="PNG")
-        qr_base64 = base64.b64encode(buffered.getvalue()).decode()
-        
-        # Generate PDF
-        pdf_buffer = generate_certificate_pdf(certificate_data, qr_base64)
-        
-        # Store in database
-        certificates_db[certificate_id] = certificate_data
-        
+        with span("pdf_render"):
+            pdf = await render_pool.run(render_certificate_pdf, certificate_data, request.layout)
+    except PoolBusy:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"PDF rendering failed: {e}")
+    
+    # Store in database
+    try:
+        with span("storage"):
+            await run_in_threadpool(certificates_db.put, certificate_data)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not store certificate: {e}")
+    
+    if media_type == "application/json":
+        with span("pdf_encode"):
+            pdf_base64 = base64.b64encode(pdf).decode()
         return {
             "certificate_id": certificate_id,
-            "pdf_base64": base64.b64encode(pdf_buffer.getvalue()).decode()
+            "pdf_base64": pdf_base64
         }
-    except Exception as e:
-        return {"error": str(e)}
+
+    # Chunks are views of the rendered bytes, so streaming copies nothing
+    return StreamingResponse(
+        _chunks(pdf, PDF_STREAM_CHUNK_BYTES),
+        media_type="application/pdf",
+        headers={
+            "Content-Length": str(len(pdf)),
+            "Content-Disposition": f'attachment; filename="certificate_{certificate_id}.pdf"',
+            "X-Certificate-Id": certificate_id
+        }
+    )
 
 @app.post("/certificates/generate", response_model=Certificate)
 async def certificates_generate(request: CertificateRequest):
     # Generate unique certificate ID
-    certificate_id = str(uuid.uuid4())
+    certificate_id = new_certificate_id()
     
     # Generate content using the generator
-    generated_content = generator.generate_content(
-        name=request.recipient_name,
-        course=request.course_name,
-        course_type=request.course_type,
-        include_appreciation=request.include_appreciation
-    )
-    
-    # Generate QR code
-    qr_data = f"Certificate ID: {certificate_id}"
-    qr_code = generate_qr_code(qr_data)
+    with span("content"):
+        generated_content = generator.generate_content(
+            name=request.recipient_name,
+            course=request.course_name,
+            course_type=request.course_type,
+            include_appreciation=request.include_appreciation
+        )
     
-    # Store certificate
+    # Store certificate; the QR code is rendered from its payload when needed
     cert_data = {
         "recipient_name": request.recipient_name,
         "course_name": request.course_name,
         "issue_date": request.issue_date,
         "certificate_id": certificate_id,
-        "qr_code": qr_code,
         "content": generated_content
     }
-    certificates_db[certificate_id] = cert_data
+    # Carries a signed token when signing is configured, so the QR code verifies offline
+    cert_data["qr_payload"] = signed_qr_payload(cert_data)
+    with span("storage"):
+        await run_in_threadpool(certificates_db.put, cert_data)
     
-    return cert_data
+    return await issued_response(cert_data)
+
+@app.post("/certificates/batch")
+async def certificates_batch(
+    roster: UploadFile = File(...),
+    roster_format: Optional[str] = Query(None, alias="format"),
+    output: str = "zip"
+):
+    """Issue certificates for a CSV or NDJSON roster.
+
+    Streams back a ZIP of PDFs (`output=zip`) or NDJSON lines of
+    certificate ids (`output=ndjson`) as rows finish.
+    """
+    roster_format = roster_format or batch.detect_roster_format(roster.filename, roster.content_type)
+    if roster_format not in batch.ROSTER_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported roster format: {roster_format}")
+    if output not in ("zip", "ndjson"):
+        raise HTTPException(status_code=400, detail=f"Unsupported output: {output}")
+    render_pdf = output == "zip"
+
+    async def issue():
+        zip_stream = batch.ZipStream() if render_pdf else None
+
+        def emit_error(row_number, error):
+            if zip_stream:
+                return zip_stream.add(f"errors/row_{row_number}.txt", error)
+            return json.dumps({"row": row_number, "error": error}) + "\n"
+
+        # FastAPI 0.118+ keeps the upload open until the streamed response has finished
+        rows = batch.iter_roster_rows(roster.file, roster_format)
+        pending = []
+        in_flight = {}
+        exhausted = False
+        while True:
+            # Keep the pool busy without reading further ahead than necessary
+            while not exhausted and len(in_flight) < batch.BATCH_MAX_IN_FLIGHT:
+                if not pending:
+                    # Parsing reads the upload's spooled file, so it runs off the event loop
+                    pending = await run_in_threadpool(batch.next_roster_rows, rows, batch.BATCH_MAX_IN_FLIGHT)
+                    pending.reverse()
+                    if not pending:
+                        exhausted = True
+                        break
+                row_number, row, error = pending.pop()
+                if error is None:
+                    try:
+                        request = CertificateRequest(**row)
+                    except ValidationError as e:
+                        error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                if error is not None:
+                    yield emit_error(row_number, error)
+                    continue
+                # Wait for pool slots rather than failing part-way through the roster
+                future = asyncio.ensure_future(
+                    render_pool.run(batch.issue_certificate, request.dict(), render_pdf, wait=True)
+                )
+                in_flight[future] = row_number
+
+            if not in_flight:
+                break
+
+            done, _ = await asyncio.wait(set(in_flight), return_when=asyncio.FIRST_COMPLETED)
+            finished = []
+            for future in done:
+                row_number = in_flight.pop(future)
+                try:
+                    certificate, pdf = future.result()
+                except Exception as e:
+                    yield emit_error(row_number, str(e))
+                    continue
+                finished.append((row_number, certificate, pdf))
+
+            # One store transaction for everything that finished together
+            await run_in_threadpool(certificates_db.put_many, [certificate for _, certificate, _ in finished])
+            for row_number, certificate, pdf in finished:
+                certificate_id = certificate["certificate_id"]
+                if zip_stream:
+                    yield zip_stream.add(f"certificate_{certificate_id}.pdf", pdf)
+                else:
+                    yield json.dumps({"row": row_number, "certificate_id": certificate_id}) + "\n"
+
+        if zip_stream:
+            yield zip_stream.finish()
+
+    if render_pdf:
+        return StreamingResponse(
+            issue(),
+            media_type="application/zip",
+            headers={"Content-Disposition": "attachment; filename=certificates.zip"}
+        )
+    return StreamingResponse(issue(), media_type="application/x-ndjson")
 
 @app.get("/certificates/{certificate_id}/pdf")
-async def get_certificate_pdf(certificate_id: str):
-    cert = certificates_db.get(certificate_id)
+async def get_certificate_pdf(
+    request: Request,
+    certificate_id: str = Depends(canonical_certificate_id),
+    layout: str = DEFAULT_LAYOUT
+):
+    _check_layout(layout)
+    with span("lookup"):
+        cert = certificates_db.get(certificate_id)
     if not cert:
         raise HTTPException(status_code=404, detail="Certificate not found")
-    pdf_buffer = generate_certificate_pdf(cert)
-    return StreamingResponse(
-        pdf_buffer,
+    qr_payload = cert.get("qr_payload") or certificate_qr_payload(certificate_id)
+    cert = {**cert, "qr_payload": qr_payload}
+
+    # Certificates never change once issued, so the render inputs identify the file
+    key = pdf_cache.key(cert, layout)
+    headers = {
+        "ETag": f'"{key}"',
+        "Cache-Control": "public, max-age=86400"
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    with span("pdf_cache"):
+        file = pdf_cache.get(key)
+    if file is None:
+        with span("pdf_render"):
+            pdf = await render_pool.run(render_certificate_pdf, dict(cert), layout)
+        with span("pdf_cache"):
+            file = await run_in_threadpool(pdf_cache.put, key, pdf)
+
+    # Served through the descriptor opened above, so an eviction before the
+    # body is sent cannot remove the file from under the response. FileResponse
+    # handles Range requests and uses sendfile when the server supports it.
+    return FileResponse(
+        f"/dev/fd/{file.fileno()}",
         media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename=certificate_{certificate_id}.pdf"
-        }
+        filename=f"certificate_{certificate_id}.pdf",
+        headers=headers,
+        stat_result=os.fstat(file.fileno()),
+        background=BackgroundTask(file.close)
     )
 
+@app.get("/certificates/{certificate_id}/qr")
+async def get_certificate_qr(
+    certificate_id: str = Depends(canonical_certificate_id),
+    qr_format: str = Query("png", alias="format")
+):
+    cert = certificates_db.get(certificate_id)
+    if not cert:
+        raise HTTPException(status_code=404, detail="Certificate not found")
+    qr_payload = cert.get("qr_payload") or certificate_qr_payload(certificate_id)
+    # A certificate's QR code never changes once issued
+    headers = {"Cache-Control": "public, max-age=31536000, immutable"}
+    if qr_format == "png":
+        return Response(await qr_png(qr_payload), media_type="image/png", headers=headers)
+    if qr_format == "svg":
+        svg = await run_in_threadpool(qr_service.svg, qr_payload)
+        return Response(svg, media_type="image/svg+xml", headers=headers)
+    raise HTTPException(status_code=400, detail=f"Unsupported QR format: {qr_format}")
+
 @app.post("/verify-certificate-chatbot")
 async def verify_certificate_chatbot(request: ChatbotRequest):
     # Get certificate data if available
     certificate_data = None
     if request.certificate_id:
-        certificate_data = certificates_db.get(request.certificate_id)
+        certificate_data = certificates_db.get(canonical_certificate_id(request.certificate_id))
     
-    # Get response from chatbot
-    response = chatbot.get_bot_response(
-        conversation_id=request.conversation_id or str(uuid.uuid4()),
-        user_input=request.text,
-        certificate_data=certificate_data
-    )
+    # Get response from chatbot; model inference runs in its own pool
+    with span("chatbot"):
+        response = await inference_pool.run(
+            chatbot.get_bot_response,
+            conversation_id=request.conversation_id or str(uuid.uuid4()),
+            user_input=request.text,
+            certificate_data=certificate_data
+        )
     
     return response
 
+# Background warm-up of models and worker processes; see /readyz
+CHATBOT_WARMUP = os.environ.get("CHATBOT_WARMUP", "1") != "0"
+warmup_state: Dict[str, Any] = {"started_at": time.time(), "render_pool": False, "error": None}
+
+async def warm_up():
+    try:
+        # Start every render process so no early PDF pays for spawning one
+        await render_pool.start(render_qr_png, "warm-up")
+        warmup_state["render_pool"] = True
+        if CHATBOT_WARMUP:
+            await inference_pool.run(chatbot.warm_up, wait=True)
+    except Exception as e:
+        warmup_state["error"] = str(e)
+
+@app.on_event("startup")
+async def start_warm_up():
+    # Keep a reference so the task is not garbage collected
+    warmup_state["task"] = asyncio.create_task(warm_up())
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok", "uptime_seconds": round(time.time() - warmup_state["started_at"], 3)}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: worker processes started and, unless disabled, models loaded"""
+    models = chatbot.models_loaded()
+    ready = warmup_state["render_pool"] and (not CHATBOT_WARMUP or all(models.values()))
+    body = {
+        "status": "ready" if ready else "warming_up",
+        "render_pool": warmup_state["render_pool"],
+        "models": models,
+        "error": warmup_state["error"]
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+@app.get("/chatbot/stats")
+async def chatbot_stats():
+    return {
+        "intent_tiers": chatbot.intent_stats(),
+        "batching": chatbot.batching_stats(),
+        "conversations": chatbot.conversations.stats(),
+        "semantic_index": chatbot.semantic_stats()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text-format metrics: latencies, in-flight work, cache hit ratios and model calls"""
+    text = PrometheusText()
+
+    text.family("http_request_duration_seconds", "histogram", "Request latency by route and status.")
+    for (method, route, status_code), histogram in list(RequestMetrics.latencies.items()):
+        text.histogram("http_request_duration_seconds", histogram.snapshot(),
+                       {"method": method, "route": route, "status": status_code})
+    text.family("http_requests_in_flight", "gauge", "Requests being handled.")
+    text.sample("http_requests_in_flight", RequestMetrics.in_flight)
+
+    text.family("stage_duration_seconds", "histogram", "Time spent in each stage of request handling.")
+    for stage, snapshot in sorted(stage_snapshots().items()):
+        text.histogram("stage_duration_seconds", snapshot, {"stage": stage})
+
+    text.family("worker_pool_pending", "gauge", "Calls queued or running in a worker pool.")
+    for pool in (render_pool, inference_pool):
+        text.sample("worker_pool_pending", pool.pending, {"pool": pool.name})
+    text.family("worker_pool_rejected_total", "counter", "Calls rejected because a worker pool was full.")
+    for pool in (render_pool, inference_pool):
+        text.sample("worker_pool_rejected_total", pool.rejected, {"pool": pool.name})
+
+    caches = {"qr": qr_service.stats(), "pdf": pdf_cache.stats()}
+    store_stats = certificates_db.stats()
+    if "verify_index" in store_stats:
+        caches["verify_index"] = store_stats["verify_index"]
+    query_cache = chatbot.semantic_stats()["query_cache"]
+    caches["semantic_query"] = query_cache
+    text.family("cache_hits_total", "counter", "Cache lookups answered from the cache.")
+    for name, stats in caches.items():
+        text.sample("cache_hits_total", stats["hits"], {"cache": name})
+    text.family("cache_misses_total", "counter", "Cache lookups that missed.")
+    for name, stats in caches.items():
+        text.sample("cache_misses_total", stats["misses"], {"cache": name})
+    text.family("cache_hit_ratio", "gauge", "Share of cache lookups answered from the cache.")
+    for name, stats in caches.items():
+        lookups = stats["hits"] + stats["misses"]
+        text.sample("cache_hit_ratio", stats["hits"] / lookups if lookups else 0.0, {"cache": name})
+    if "bloom" in store_stats:
+        text.family("certificate_bloom_absorbed_total", "counter", "Lookups of unknown IDs answered by the Bloom filter.")
+        text.sample("certificate_bloom_absorbed_total", store_stats["bloom"]["absorbed"])
+
+    text.family("chatbot_intents_total", "counter", "Intent classifications by the tier that answered.")
+    for tier, stats in chatbot.intent_stats().items():
+        text.sample("chatbot_intents_total", stats["count"], {"tier": tier})
+    batching = chatbot.batching_stats()
+    text.family("model_inference_calls_total", "counter", "Batched model calls.")
+    for model, stats in batching.items():
+        text.sample("model_inference_calls_total", stats["batch_size"]["count"], {"model": model})
+    text.family("model_inference_items_total", "counter", "Items passed through model calls.")
+    for model, stats in batching.items():
+        text.sample("model_inference_items_total", stats["batch_size"]["sum"], {"model": model})
+    text.family("model_inference_batch_size", "histogram", "Items per batched model call.")
+    for model, stats in batching.items():
+        text.histogram("model_inference_batch_size", stats["batch_size"], {"model": model})
+    text.family("model_inference_queue_wait_seconds", "histogram", "Time items waited for their batch to run.")
+    for model, stats in batching.items():
+        text.histogram("model_inference_queue_wait_seconds", stats["queue_wait_seconds"], {"model": model})
+
+    conversations = chatbot.conversations.stats()
+    text.family("chatbot_conversations_live", "gauge", "Chatbot conversations held and not yet expired.")
+    text.sample("chatbot_conversations_live", conversations["live"])
+    text.family("chatbot_conversation_evictions_total", "counter", "Chatbot conversations evicted for being idle or over the limit.")
+    text.sample("chatbot_conversation_evictions_total", conversations["evictions"])
+
+    return Response(text.render(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("shutdown")
+async def close_certificate_store():
+    chatbot.close()
+    shutdown_pools()
+    certificates_db.close()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -0,0 +1,189 @@
+import bisect
+import functools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Thread-safe histogram with fixed, cumulative-style buckets."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        """Counts of observations <= each bucket bound, plus sum and count."""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(list(self.buckets) + ["+Inf"], counts):
+            running += bucket_count
+            cumulative.append((bound, running))
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+
+# Per-stage latencies, named by the code that records them ("storage", "qr", ...)
+_stages: Dict[str, Histogram] = {}
+_stages_lock = threading.Lock()
+
+# Stage timings of the request being handled, as (stage, seconds); None outside requests
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+
+def stage_histogram(stage: str) -> Histogram:
+    histogram = _stages.get(stage)
+    if histogram is None:
+        with _stages_lock:
+            histogram = _stages.setdefault(stage, Histogram())
+    return histogram
+
+
+class span:
+    """Time a block (or, as a decorator, each call of a function) as one stage of the current request.
+
+    The time goes into the stage's histogram and, inside a request, into its
+    Server-Timing header. Cheap enough to leave on: two clock reads and a
+    histogram update.
+    """
+
+    __slots__ = ("stage", "_start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        elapsed = time.perf_counter() - self._start
+        stage_histogram(self.stage).observe(elapsed)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((self.stage, elapsed))
+
+    def __call__(self, fn):
+        # A new span per call, so concurrent calls do not share a start time
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            with span(self.stage):
+                return fn(*args, **kwargs)
+        return timed
+
+
+def server_timing(spans: Sequence[Tuple[str, float]], total: float) -> str:
+    """Server-Timing header value in milliseconds; repeated stages are summed."""
+    durations: Dict[str, float] = {}
+    for stage, elapsed in spans:
+        durations[stage] = durations.get(stage, 0.0) + elapsed
+    durations["total"] = total
+    return ", ".join(f"{stage};dur={elapsed * 1000:.2f}" for stage, elapsed in durations.items())
+
+
+class RequestMetrics:
+    """ASGI middleware recording request latencies by route and in-flight requests.
+
+    Collects the spans recorded while handling each request and reports them
+    in a Server-Timing header. Responses started before a span finishes (such
+    as streamed bodies) only report the spans finished by then.
+    """
+
+    # (method, route, status) -> latency histogram; shared by every instance,
+    # and only updated from the event loop
+    latencies: Dict[Tuple[str, str, str], Histogram] = {}
+    in_flight = 0
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        spans: List[Tuple[str, float]] = []
+        token = _request_spans.set(spans)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing(spans, time.perf_counter() - start)
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", header.encode())]}
+            await send(message)
+
+        RequestMetrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            RequestMetrics.in_flight -= 1
+            _request_spans.reset(token)
+            # Label by route template rather than path, so IDs do not each get a series
+            route = scope.get("route")
+            key = (scope["method"], getattr(route, "path", "unmatched"), str(status))
+            histogram = RequestMetrics.latencies.get(key)
+            if histogram is None:
+                histogram = RequestMetrics.latencies.setdefault(key, Histogram())
+            histogram.observe(time.perf_counter() - start)
+
+
+def stage_snapshots() -> Dict[str, Dict[str, object]]:
+    with _stages_lock:
+        stages = dict(_stages)
+    return {stage: histogram.snapshot() for stage, histogram in stages.items()}
+
+
+class PrometheusText:
+    """Builds a Prometheus text-format exposition, one metric family at a time."""
+
+    def __init__(self):
+        self._lines: List[str] = []
+
+    @staticmethod
+    def _labels(labels: Optional[Dict[str, object]]) -> str:
+        if not labels:
+            return ""
+        pairs = []
+        for name, value in labels.items():
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            pairs.append(f'{name}="{value}"')
+        return "{" + ",".join(pairs) + "}"
+
+    def family(self, name: str, kind: str, help_text: str) -> "PrometheusText":
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+        return self
+
+    def sample(self, name: str, value: float, labels: Optional[Dict[str, object]] = None) -> "PrometheusText":
+        self._lines.append(f"{name}{self._labels(labels)} {value}")
+        return self
+
+    def histogram(self, name: str, snapshot: Dict[str, object],
+                  labels: Optional[Dict[str, object]] = None) -> "PrometheusText":
+        labels = labels or {}
+        for bound, count in snapshot["buckets"]:
+            self.sample(f"{name}_bucket", count, {**labels, "le": bound})
+        self.sample(f"{name}_sum", snapshot["sum"], labels)
+        self.sample(f"{name}_count", snapshot["count"], labels)
+        return self
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Mapping, Optional
+
+from pdf_generator import PDF_RENDER_VERSION, get_layout
+
+# Certificate fields that affect the rendered PDF
+_RENDERED_FIELDS = ("certificate_id", "recipient_name", "course_name", "issue_date", "content", "qr_payload")
+
+
+class PDFCache:
+    """Content-addressed on-disk cache of rendered certificate PDFs.
+
+    Files are named by a hash of everything that goes into the render, so
+    the key doubles as a strong ETag. Entries are evicted least recently
+    used first once the directory exceeds max_bytes. Recency is tracked per
+    process and seeded from file modification times, so workers sharing a
+    directory each keep it roughly within budget.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        existing = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".pdf") and entry.is_file():
+                stat = entry.stat()
+                existing.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(existing):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    @staticmethod
+    def key(certificate: Mapping[str, Any], layout: str) -> str:
+        layout_config = {k: v for k, v in vars(get_layout(layout)).items() if not k.startswith("_") and isinstance(v, (str, int, float))}
+        material = {
+            "version": PDF_RENDER_VERSION,
+            "layout": layout_config,
+            "certificate": {field: certificate.get(field) for field in _RENDERED_FIELDS},
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True).encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key: str) -> Optional[BinaryIO]:
+        """Open the cached file, or return None on a miss.
+
+        The open file stays readable if the entry is evicted, by this worker
+        or another, before it has been served; the caller closes it.
+        """
+        path = self.path(key)
+        try:
+            file = open(path, "rb")
+            size = os.fstat(file.fileno()).st_size
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                if key in self._entries:
+                    self._total_bytes -= self._entries.pop(key)
+            return None
+        with self._lock:
+            self.hits += 1
+            if key not in self._entries:
+                # Written by another worker
+                self._entries[key] = size
+                self._total_bytes += size
+            self._entries.move_to_end(key)
+        return file
+
+    def put(self, key: str, data: bytes) -> BinaryIO:
+        """Store a rendered PDF and return it opened for reading, like get; the caller closes it."""
+        path = self.path(key)
+        # Write then rename, so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        file = None
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            file = open(temp_path, "rb")
+            os.replace(temp_path, path)
+        except BaseException:
+            if file is not None:
+                file.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries[key]
+            self._entries[key] = len(data)
+            self._entries.move_to_end(key)
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                self.evictions += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self.path(old_key))
+            except FileNotFoundError:
+                pass
+        return file
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches the given strong ETag."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak comparison, as required for If-None-Match
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
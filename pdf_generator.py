@@ -5,56 +5,185 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import Paragraph
 from io import BytesIO
 import base64
-from PIL import Image
-import qrcode
-from reportlab.lib.colors import HexColor
-import tempfile
-import os
+from reportlab.lib.colors import HexColor, white, black
+from reportlab.lib.utils import ImageReader
+from reportlab import rl_config
+from qr_service import qr_service
+
+from copy import copy
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence
+
+
+# Bump when rendering changes in a way layouts don't capture, so cached PDFs are not reused
+PDF_RENDER_VERSION = 1
+
+# Write page streams as binary Flate rather than ASCII85-wrapped Flate:
+# smaller files and no pure-Python base85 pass per page
+rl_config.useA85 = 0
+
+
+@lru_cache(maxsize=None)
+def _sample_styles():
+    return getSampleStyleSheet()
+
+
+class CertificateLayout:
+    """A named certificate design.
+
+    Styles and the title paragraph are built once by `compile()`. The static
+    page (background, border, title) is drawn into a PDF form object once per
+    document and placed with `doForm`, so each certificate only lays out its
+    variable fields.
+    """
+
+    def __init__(self,
+                 name: str,
+                 title: str = "CERTIFICATE OF ACHIEVEMENT",
+                 background_color: str = '#F5F7FA',
+                 border_color: str = '#1976D2',
+                 title_color: str = '#2E3A59',
+                 name_color: str = '#1B5E20',
+                 body_color: str = '#263238'):
+        self.name = name
+        self.title = title
+        self.background_color = background_color
+        self.border_color = border_color
+        self.title_color = title_color
+        self.name_color = name_color
+        self.body_color = body_color
+        self._compiled = False
+
+    @property
+    def form_name(self) -> str:
+        return f"layout_{self.name}"
+
+    def compile(self) -> "CertificateLayout":
+        styles = _sample_styles()
+        self.title_style = ParagraphStyle(
+            f'{self.name}Title',
+            parent=styles['Heading1'],
+            fontSize=28,
+            textColor=HexColor(self.title_color),
+            spaceAfter=30,
+            alignment=1
+        )
+        self.name_style = ParagraphStyle(
+            f'{self.name}Name',
+            parent=styles['Heading2'],
+            fontSize=20,
+            textColor=HexColor(self.name_color),
+            spaceAfter=20,
+            alignment=1
+        )
+        self.body_style = ParagraphStyle(
+            f'{self.name}Body',
+            parent=styles['Normal'],
+            fontSize=14,
+            textColor=HexColor(self.body_color),
+            spaceAfter=10,
+            alignment=1
+        )
+        self._title_paragraph = Paragraph(self.title, self.title_style)
+        self._title_paragraph.wrap(500, 50)
+        self._compiled = True
+        return self
+
+    def draw_static(self, c: canvas.Canvas) -> None:
+        """Place the static page, defining its form object on first use in this document."""
+        if not self._compiled:
+            self.compile()
+        if not c.hasForm(self.form_name):
+            c.beginForm(self.form_name)
+
+            # Draw a light background
+            c.setFillColor(HexColor(self.background_color))
+            c.rect(0, 0, 612, 792, fill=1, stroke=0)
+
+            # Draw a colored border
+            c.setStrokeColor(HexColor(self.border_color))
+            c.setLineWidth(6)
+            c.rect(40, 40, 532, 712, fill=0, stroke=1)
+
+            # Add title; drawOn sets attributes on the paragraph, so draw a copy
+            copy(self._title_paragraph).drawOn(c, 56, 700)
+
+            c.endForm()
+        c.doForm(self.form_name)
+
+
+def draw_qr_code(c: canvas.Canvas, matrix: Sequence[Sequence[bool]], x: float, y: float, size: float) -> None:
+    """Draw a QR module matrix as vector rectangles in a size x size square at (x, y)."""
+    modules = len(matrix)
+    module = size / modules
+
+    # White square underneath so the quiet zone survives a tinted background
+    c.setFillColor(white)
+    c.rect(x, y, size, size, fill=1, stroke=0)
+
+    # One rectangle per horizontal run of dark modules, all in a single path
+    path = c.beginPath()
+    for row_index, row in enumerate(matrix):
+        row_y = y + size - (row_index + 1) * module
+        run_start = None
+        for col_index, dark in enumerate(list(row) + [False]):
+            if dark and run_start is None:
+                run_start = col_index
+            elif not dark and run_start is not None:
+                path.rect(x + run_start * module, row_y, (col_index - run_start) * module, module)
+                run_start = None
+    c.setFillColor(black)
+    c.drawPath(path, fill=1, stroke=0)
+
+
+LAYOUTS: Dict[str, CertificateLayout] = {}
+DEFAULT_LAYOUT = "classic"
+
+
+def register_layout(layout: CertificateLayout) -> CertificateLayout:
+    """Compile a layout and make it available by name."""
+    LAYOUTS[layout.name] = layout.compile()
+    return layout
+
+
+def get_layout(name: str) -> CertificateLayout:
+    try:
+        return LAYOUTS[name]
+    except KeyError:
+        raise ValueError(f"Unknown certificate layout: {name}")
+
+
+register_layout(CertificateLayout(DEFAULT_LAYOUT))
+register_layout(CertificateLayout(
+    "modern",
+    background_color='#FFFFFF',
+    border_color='#37474F',
+    title_color='#37474F',
+    name_color='#00695C',
+    body_color='#424242'
+))
+register_layout(CertificateLayout(
+    "completion",
+    title="CERTIFICATE OF COMPLETION",
+    background_color='#FFFDF5',
+    border_color='#B8860B',
+    title_color='#5D4037',
+    name_color='#8B5A00',
+    body_color='#3E2723'
+))
+
+
+def generate_certificate_pdf(certificate_data: Dict[str, Any], layout: str = DEFAULT_LAYOUT):
+    certificate_layout = get_layout(layout)
+    name_style = certificate_layout.name_style
+    body_style = certificate_layout.body_style
 
-def generate_certificate_pdf(certificate_data):
     buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
+    # Invariant output: the same certificate always renders to the same bytes
+    c = canvas.Canvas(buffer, pagesize=letter, invariant=1)
     
-    # Set up styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=28,
-        textColor=HexColor('#2E3A59'),
-        spaceAfter=30,
-        alignment=1
-    )
-    name_style = ParagraphStyle(
-        'CustomName',
-        parent=styles['Heading2'],
-        fontSize=20,
-        textColor=HexColor('#1B5E20'),
-        spaceAfter=20,
-        alignment=1
-    )
-    body_style = ParagraphStyle(
-        'CustomBody',
-        parent=styles['Normal'],
-        fontSize=14,
-        textColor=HexColor('#263238'),
-        spaceAfter=10,
-        alignment=1
-    )
-    
-    # Draw a light background
-    c.setFillColor(HexColor('#F5F7FA'))
-    c.rect(0, 0, 612, 792, fill=1, stroke=0)
-    
-    # Draw a colored border
-    c.setStrokeColor(HexColor('#1976D2'))
-    c.setLineWidth(6)
-    c.rect(40, 40, 532, 712, fill=0, stroke=1)
-    
-    # Add title
-    title = Paragraph("CERTIFICATE OF ACHIEVEMENT", title_style)
-    title.wrapOn(c, 500, 50)
-    title.drawOn(c, 56, 700)
+    # Background, border and title
+    certificate_layout.draw_static(c)
     
     # Add recipient name
     name_text = f"Recipient: {certificate_data.get('recipient_name', '')}" 
@@ -81,34 +210,25 @@ def generate_certificate_pdf(certificate_data):
     id_para.drawOn(c, 56, 550)
 
     # Add the full generated content
-    content_text = certificate_data.get('content', '')
+    content_text = certificate_data.get('content') or ''
     content_para = Paragraph(content_text.replace('\n', '<br/>'), body_style)
     content_para.wrapOn(c, 500, 200)
     content_para.drawOn(c, 56, 450)
     
     # Add QR code at bottom right
-    if certificate_data.get('qr_code'):
-        temp_file = None
-        try:
-            qr_data = base64.b64decode(certificate_data['qr_code'])
-            qr_image = Image.open(BytesIO(qr_data))
-            
-            # Save to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-                qr_image.save(temp_file, format='PNG')
-                temp_file_path = temp_file.name
-                
-            # Draw the image from the temporary file
-            c.drawImage(temp_file_path, 442, 70, width=120, height=120, preserveAspectRatio=True, mask='auto')
-            
-        except Exception as e:
-            print(f"Error adding QR code to PDF: {e}")
-            raise e
-        finally:
-            # Clean up the temporary file
-            if temp_file and os.path.exists(temp_file.name):
-                os.remove(temp_file.name)
+    qr_x, qr_y, qr_size = 442, 70, 120
+    if certificate_data.get('qr_matrix') or certificate_data.get('qr_payload'):
+        matrix = certificate_data.get('qr_matrix') or qr_service.matrix(certificate_data['qr_payload'])
+        draw_qr_code(c, matrix, qr_x, qr_y, qr_size)
+    elif certificate_data.get('qr_code'):
+        # Legacy base64 PNG, decoded in memory
+        qr_image = ImageReader(BytesIO(base64.b64decode(certificate_data['qr_code'])))
+        c.drawImage(qr_image, qr_x, qr_y, width=qr_size, height=qr_size, preserveAspectRatio=True, mask='auto')
     
     c.save()
     buffer.seek(0)
-    return buffer 
\ No newline at end of file
+    return buffer 
+
+def render_certificate_pdf(certificate_data: Dict[str, Any], layout: str = DEFAULT_LAYOUT) -> bytes:
+    """Render a certificate to PDF bytes; picklable entry point for worker processes."""
+    return generate_certificate_pdf(certificate_data, layout=layout).getvalue()
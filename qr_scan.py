@@ -0,0 +1,65 @@
+from typing import List
+
+import numpy as np
+
+from qr_service import certificate_id_from_payload
+
+# cv2 is imported by the functions that use it, so the API process can import
+# this module to hand decode_certificate_ids to the render pool without
+# loading OpenCV; only the render processes that decode images load it
+
+# Longest side of each pyramid level tried before the full-size image. Phone
+# photos and page scans are often 3000-5000 px, where detection is slow and a
+# QR code occupying a few hundred pixels still decodes after downscaling.
+PYRAMID_SIDES = (1024, 2048)
+
+_detector = None
+
+
+def _pyramid(image: np.ndarray):
+    """The image at each pyramid size smaller than itself, smallest first, then full size."""
+    import cv2
+    longest = max(image.shape[:2])
+    for side in PYRAMID_SIDES:
+        if side < longest:
+            scale = side / longest
+            yield cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    yield image
+
+
+def decode_qr_payloads(data: bytes) -> List[str]:
+    """Texts of every QR code found in an encoded image (PNG, JPEG, ...), in detection order.
+
+    Each pyramid level is tried in turn until one decodes every code it
+    detects; codes decoded at any level are kept.
+    """
+    global _detector
+    import cv2
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError("Not a readable image")
+    if _detector is None:
+        # The ArUco-based detector (OpenCV 4.8+) finds more codes in cluttered, downscaled images
+        _detector = cv2.QRCodeDetectorAruco() if hasattr(cv2, "QRCodeDetectorAruco") else cv2.QRCodeDetector()
+
+    payloads: List[str] = []
+    for level in _pyramid(image):
+        found, texts, _, _ = _detector.detectAndDecodeMulti(level)
+        if not found:
+            continue
+        for text in texts:
+            if text and text not in payloads:
+                payloads.append(text)
+        if all(texts):
+            break
+    return payloads
+
+
+def decode_certificate_ids(data: bytes) -> List[str]:
+    """Certificate IDs in an image's QR codes; picklable entry point for worker processes."""
+    ids = []
+    for payload in decode_qr_payloads(data):
+        certificate_id = certificate_id_from_payload(payload)
+        if certificate_id is not None and certificate_id not in ids:
+            ids.append(certificate_id)
+    return ids
@@ -0,0 +1,182 @@
+import base64
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import qrcode
+from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q
+from qrcode.exceptions import DataOverflowError
+from PIL import Image
+
+from ids import CERTIFICATE_ID_PATTERN, normalize_certificate_id
+
+# Tried from most to least robust once the smallest version is known
+_ERROR_CORRECTION_LEVELS = (ERROR_CORRECT_H, ERROR_CORRECT_Q, ERROR_CORRECT_M)
+
+Matrix = Tuple[Tuple[bool, ...], ...]
+
+
+def certificate_qr_payload(certificate_id: str, signature: Optional[str] = None) -> str:
+    """Text encoded in a certificate's QR code, with its signed token on a second line if given"""
+    payload = f"Certificate ID: {certificate_id}"
+    return f"{payload}\nSignature: {signature}" if signature else payload
+
+
+def signature_from_payload(payload: str) -> Optional[str]:
+    """Signed token in a scanned QR payload, if it has one"""
+    for line in payload.splitlines():
+        if line.startswith("Signature: "):
+            return line[len("Signature: "):].strip()
+    return None
+
+
+def certificate_id_from_payload(payload: str) -> Optional[str]:
+    """Certificate ID in a scanned QR payload, either certificate_qr_payload's text or a bare ID"""
+    for match in CERTIFICATE_ID_PATTERN.finditer(payload):
+        certificate_id = normalize_certificate_id(match.group(0))
+        if certificate_id is not None:
+            return certificate_id
+    return None
+
+
+def encode_qr(payload: str, border: int = 5) -> qrcode.QRCode:
+    """
+    Encode a payload in the smallest QR version that fits, using the
+    strongest error correction level that still fits in that version.
+    """
+    qr = qrcode.QRCode(version=None, error_correction=ERROR_CORRECT_L, border=border)
+    qr.add_data(payload)
+    # Only the version; the matrix (and its mask choice) is built once, at the level kept
+    version = qr.best_fit()
+
+    for level in _ERROR_CORRECTION_LEVELS:
+        candidate = qrcode.QRCode(version=version, error_correction=level, border=border)
+        candidate.add_data(payload)
+        try:
+            candidate.make(fit=False)
+        except DataOverflowError:
+            continue
+        return candidate
+    qr.make(fit=False)
+    return qr
+
+
+class QRService:
+    """Renders QR codes from their payload, with a byte-bounded LRU cache.
+
+    Certificates only store the QR payload; module matrices, PNGs and SVGs
+    are derived on demand and cached by payload.
+    """
+
+    def __init__(self, max_cache_bytes: int = 32 * 1024 * 1024, border: int = 5):
+        self.max_cache_bytes = max_cache_bytes
+        self.border = border
+        self._cache: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _cached(self, key: Hashable, build, size_of):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = build()
+        size = size_of(value)
+        with self._lock:
+            if key not in self._cache and size <= self.max_cache_bytes:
+                self._cache[key] = (value, size)
+                self._cache_bytes += size
+                while self._cache_bytes > self.max_cache_bytes:
+                    _, (_, evicted_size) = self._cache.popitem(last=False)
+                    self._cache_bytes -= evicted_size
+                    self.evictions += 1
+        return value
+
+    def matrix(self, payload: str) -> Matrix:
+        """Module matrix for the payload, quiet zone included"""
+        def build():
+            return tuple(tuple(row) for row in encode_qr(payload, self.border).get_matrix())
+        # A tuple of bools costs one pointer per module
+        return self._cached(("matrix", payload), build, lambda m: 8 * len(m) * (len(m) + 1))
+
+    def png(self, payload: str, box_size: int = 10) -> bytes:
+        def build():
+            matrix = self.matrix(payload)
+            modules = len(matrix)
+            image = Image.new("1", (modules, modules), 1)
+            image.putdata([0 if dark else 1 for row in matrix for dark in row])
+            image = image.resize((modules * box_size, modules * box_size), Image.NEAREST)
+            buffered = BytesIO()
+            image.save(buffered, format="PNG", optimize=True)
+            return buffered.getvalue()
+        return self._cached(("png", payload, box_size), build, len)
+
+    def cached_png(self, payload: str, box_size: int = 10) -> Optional[bytes]:
+        """PNG from the cache, or None without rendering it"""
+        with self._lock:
+            entry = self._cache.get(("png", payload, box_size))
+            if entry is None:
+                return None
+            self._cache.move_to_end(("png", payload, box_size))
+            self.hits += 1
+            return entry[0]
+
+    def add_png(self, payload: str, png: bytes, box_size: int = 10) -> None:
+        """Cache a PNG rendered elsewhere, e.g. in a worker process"""
+        self._cached(("png", payload, box_size), lambda: png, len)
+
+    def png_base64(self, payload: str) -> str:
+        return base64.b64encode(self.png(payload)).decode()
+
+    def svg(self, payload: str, box_size: int = 10) -> str:
+        def build():
+            matrix = self.matrix(payload)
+            size = len(matrix) * box_size
+            # One rectangle per horizontal run of dark modules
+            parts = []
+            for y, row in enumerate(matrix):
+                run_start = None
+                for x, dark in enumerate(row + (False,)):
+                    if dark and run_start is None:
+                        run_start = x
+                    elif not dark and run_start is not None:
+                        parts.append(f"M{run_start * box_size} {y * box_size}h{(x - run_start) * box_size}v{box_size}h-{(x - run_start) * box_size}z")
+                        run_start = None
+            return (
+                f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {size} {size}">'
+                f'<rect width="{size}" height="{size}" fill="#fff"/>'
+                f'<path d="{"".join(parts)}" fill="#000"/></svg>'
+            )
+        return self._cached(("svg", payload, box_size), build, len)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "bytes": self._cache_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+qr_service = QRService(max_cache_bytes=int(os.environ.get("QR_CACHE_BYTES", 32 * 1024 * 1024)))
+
+
+def render_qr_png(payload: str) -> bytes:
+    """Render a QR PNG; picklable entry point for worker processes."""
+    return qr_service.png(payload)
+
+
+def generate_qr_code(data: str) -> str:
+    """Generate QR code and return as base64 string"""
+    return qr_service.png_base64(data)
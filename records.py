@@ -0,0 +1,114 @@
+import sys
+import uuid
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional, Union
+
+from ids import decode_ulid, encode_ulid, is_ulid
+from qr_service import certificate_qr_payload
+
+# How a record's QR payload relates to its certificate ID
+_QR_NONE = 0
+_QR_PREFIXED = 1  # "Certificate ID: <id>"
+_QR_BARE = 2      # "<id>"
+
+_FIELDS = ("recipient_name", "course_name", "issue_date", "certificate_id", "qr_payload", "content")
+
+
+def pack_certificate_id(certificate_id: str) -> Union[bytes, int, str]:
+    """Pack a canonical UUID string into its 16 bytes and a ULID into its 128-bit int; anything else is kept as is."""
+    if isinstance(certificate_id, str) and is_ulid(certificate_id):
+        return decode_ulid(certificate_id)
+    try:
+        packed = uuid.UUID(certificate_id)
+    except (ValueError, AttributeError, TypeError):
+        return certificate_id
+    # Only pack IDs that unpack to exactly the same text
+    if str(packed) != certificate_id:
+        return certificate_id
+    return packed.bytes
+
+
+def unpack_certificate_id(packed: Union[bytes, int, str]) -> str:
+    if isinstance(packed, bytes):
+        return str(uuid.UUID(bytes=packed))
+    if isinstance(packed, int):
+        return encode_ulid(packed)
+    return packed
+
+
+class CertificateRecord(Mapping):
+    """Memory-compact certificate record.
+
+    Uses __slots__ instead of a per-record dict. UUIDs are held as 16 bytes
+    and ULIDs as ints, course names and dates are interned so records share
+    them, and the QR payload is kept as a flag when it can be derived from
+    the ID. Behaves as a read-only mapping with the same keys as a stored
+    certificate dict.
+    """
+
+    __slots__ = ("_id", "recipient_name", "course_name", "issue_date", "_qr", "content")
+
+    def __init__(self,
+                 certificate_id: str,
+                 recipient_name: str,
+                 course_name: str,
+                 issue_date: str,
+                 qr_payload: Optional[str] = None,
+                 content: Optional[str] = None):
+        self._id = pack_certificate_id(certificate_id)
+        self.recipient_name = recipient_name
+        self.course_name = sys.intern(course_name)
+        self.issue_date = sys.intern(issue_date)
+        if qr_payload is None:
+            self._qr = _QR_NONE
+        elif qr_payload == certificate_qr_payload(certificate_id):
+            self._qr = _QR_PREFIXED
+        elif qr_payload == certificate_id:
+            self._qr = _QR_BARE
+        else:
+            self._qr = qr_payload
+        self.content = content
+
+    @classmethod
+    def from_dict(cls, certificate: Mapping) -> "CertificateRecord":
+        if isinstance(certificate, cls):
+            return certificate
+        return cls(
+            certificate_id=certificate["certificate_id"],
+            recipient_name=certificate["recipient_name"],
+            course_name=certificate["course_name"],
+            issue_date=certificate["issue_date"],
+            qr_payload=certificate.get("qr_payload"),
+            content=certificate.get("content")
+        )
+
+    @property
+    def certificate_id(self) -> str:
+        return unpack_certificate_id(self._id)
+
+    @property
+    def qr_payload(self) -> Optional[str]:
+        if self._qr == _QR_NONE:
+            return None
+        if self._qr == _QR_PREFIXED:
+            return certificate_qr_payload(self.certificate_id)
+        if self._qr == _QR_BARE:
+            return self.certificate_id
+        return self._qr
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_FIELDS)
+
+    def __len__(self) -> int:
+        return len(_FIELDS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in _FIELDS}
+
+    def __repr__(self) -> str:
+        return f"CertificateRecord({self.to_dict()!r})"
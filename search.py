@@ -0,0 +1,155 @@
+import heapq
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Set, Tuple
+
+# Fields searched by name; recipient matches count for more than course matches
+SEARCH_FIELDS = {"recipient_name": 1.0, "course_name": 0.6}
+
+# Trigram similarity below which a vocabulary token is not a typo of a query token
+MIN_SIMILARITY = 0.3
+# Padded trigrams miss single typos in short words ("jame" and "jane" share
+# a quarter of theirs), so query words of EDIT_MIN_LENGTH or more also match
+# tokens one edit away, scored EDIT_SIMILARITY
+EDIT_MIN_LENGTH = 4
+EDIT_SIMILARITY = 0.6
+# Score of a query token that is a prefix of a record token ("jan" for "jane")
+PREFIX_SCORE = 0.9
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case, accent-free word tokens of text."""
+    text = text or ""
+    if text.isascii():
+        return _WORD.findall(text.lower())
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _WORD.findall(stripped.casefold())
+
+
+def certificate_tokens(certificate: Mapping) -> Set[str]:
+    """Tokens a certificate is indexed under."""
+    tokens: Set[str] = set()
+    for field in SEARCH_FIELDS:
+        tokens.update(tokenize(certificate.get(field)))
+    return tokens
+
+
+@lru_cache(maxsize=65536)
+def trigrams(token: str) -> FrozenSet[str]:
+    # Padded so short tokens and word starts get trigrams of their own
+    padded = f"  {token} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similarity(a: str, b: str) -> float:
+    """Jaccard similarity of two tokens' trigrams"""
+    ta, tb = trigrams(a), trigrams(b)
+    return len(ta & tb) / len(ta | tb)
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """Whether a and b differ by at most one insertion, deletion, substitution or adjacent transposition"""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    start = 0
+    while start < min(len(a), len(b)) and a[start] == b[start]:
+        start += 1
+    if len(a) != len(b):
+        longer, shorter = (a, b) if len(a) > len(b) else (b, a)
+        return longer[start + 1:] == shorter[start:]
+    if a[start + 1:] == b[start + 1:]:
+        return True
+    # Adjacent transposition ("pyhton")
+    return (start + 1 < len(a) and a[start] == b[start + 1] and a[start + 1] == b[start]
+            and a[start + 2:] == b[start + 2:])
+
+
+def typo_similarity(query_token: str, token: str) -> float:
+    """Trigram similarity, raised to EDIT_SIMILARITY for tokens one edit from a long enough query word"""
+    score = similarity(query_token, token)
+    if score < EDIT_SIMILARITY and len(query_token) >= EDIT_MIN_LENGTH and within_one_edit(query_token, token):
+        return EDIT_SIMILARITY
+    return score
+
+
+def token_score(query_token: str, token: str) -> float:
+    if token == query_token:
+        return 1.0
+    if len(query_token) >= 2 and token.startswith(query_token):
+        return PREFIX_SCORE
+    score = typo_similarity(query_token, token)
+    return score if score >= MIN_SIMILARITY else 0.0
+
+
+def score_certificate(query_tokens: List[str], certificate: Mapping) -> float:
+    """Mean over query tokens of their best weighted match in the certificate."""
+    field_tokens = [(tokenize(certificate.get(field)), weight) for field, weight in SEARCH_FIELDS.items()]
+    total = 0.0
+    for query_token in query_tokens:
+        total += max(
+            (token_score(query_token, token) * weight for tokens, weight in field_tokens for token in tokens),
+            default=0.0
+        )
+    return total / len(query_tokens)
+
+
+def rank(query_tokens: List[str], candidates: Iterable[Mapping], limit: int) -> List[Tuple[Mapping, float]]:
+    """Top `limit` candidates by score, best first; ties go to the lower certificate ID."""
+    scored = []
+    for certificate in candidates:
+        score = score_certificate(query_tokens, certificate)
+        if score > 0:
+            scored.append((score, certificate["certificate_id"], certificate))
+    best = heapq.nsmallest(limit, scored, key=lambda item: (-item[0], item[1]))
+    return [(certificate, round(score, 4)) for score, _, certificate in best]
+
+
+class MemorySearchIndex:
+    """Inverted index from tokens to certificate IDs, with a trigram index over the tokens."""
+
+    def __init__(self):
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def add(self, certificate: Mapping) -> None:
+        with self._lock:
+            for token in certificate_tokens(certificate):
+                if token not in self._postings:
+                    for trigram in trigrams(token):
+                        self._trigrams[trigram].add(token)
+                self._postings[token].add(certificate["certificate_id"])
+
+    def matching_tokens(self, query_token: str) -> Dict[str, int]:
+        """Vocabulary tokens matching a query token, with their document counts."""
+        with self._lock:
+            if len(query_token) < 2:
+                return {query_token: len(self._postings[query_token])} if query_token in self._postings else {}
+            matches = {token: len(ids) for token, ids in self._postings.items() if token.startswith(query_token)}
+            if not matches:
+                candidates = set()
+                for trigram in trigrams(query_token):
+                    candidates.update(self._trigrams.get(trigram, ()))
+                matches = {
+                    token: len(self._postings[token]) for token in candidates
+                    if typo_similarity(query_token, token) >= MIN_SIMILARITY
+                }
+            return matches
+
+    def postings(self, tokens: Iterable[str], limit: int) -> Set[str]:
+        found: Set[str] = set()
+        if limit <= 0:
+            return found
+        with self._lock:
+            for token in tokens:
+                for certificate_id in self._postings.get(token, ()):
+                    found.add(certificate_id)
+                    if len(found) >= limit:
+                        return found
+        return found
@@ -0,0 +1,106 @@
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+DTYPES = ("float32", "float16", "int8")
+
+# Rows scored per matrix product when the matrix is not float32; each chunk is
+# cast into a reused float32 buffer small enough to stay in cache (numpy has no
+# fast float16 or int8 matrix product)
+_CHUNK_ROWS = 2048
+
+
+def certificate_text(certificate: Mapping[str, Any]) -> str:
+    """Text embedded for a certificate, with the issue date spelled out ("4 March 2024")."""
+    issue_date = certificate.get("issue_date") or ""
+    try:
+        date = datetime.strptime(issue_date[:10], "%Y-%m-%d")
+        issued = f"{date.day} {date:%B %Y}"
+    except ValueError:
+        issued = issue_date
+    return f"{certificate.get('recipient_name')} completed the {certificate.get('course_name')} course, issued {issued}"
+
+
+class SemanticIndex:
+    """Certificate embeddings in one contiguous matrix, searched with a matrix product.
+
+    Rows are L2-normalized embeddings, so a row's dot product with a
+    normalized query is their cosine similarity. Rows can be stored as
+    float32, float16 or int8 (with a float32 scale per row). The matrix
+    grows by doubling; searches work on a snapshot taken under the lock.
+    `watermark` records how far through the store's issuance order the
+    index has been filled.
+    """
+
+    def __init__(self, dtype: str = "float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype} (expected one of {', '.join(DTYPES)})")
+        self.dtype = dtype
+        self.watermark = 0
+        self._ids: List[str] = []
+        self._matrix = None
+        self._scales = None
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, certificate_ids: Sequence[str], embeddings: np.ndarray, watermark: int) -> None:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            count = self._count
+            needed = count + len(certificate_ids)
+            if self._matrix is None or needed > len(self._matrix):
+                capacity = max(needed, 2 * (len(self._matrix) if self._matrix is not None else 512))
+                matrix = np.empty((capacity, embeddings.shape[1]), dtype=self.dtype)
+                scales = np.empty(capacity, dtype=np.float32)
+                if self._matrix is not None:
+                    matrix[:count] = self._matrix[:count]
+                    scales[:count] = self._scales[:count]
+                self._matrix, self._scales = matrix, scales
+            if self.dtype == "int8":
+                scales = np.abs(embeddings).max(axis=1) / 127
+                scales[scales == 0] = 1
+                self._matrix[count:needed] = np.round(embeddings / scales[:, None]).astype(np.int8)
+                self._scales[count:needed] = scales
+            else:
+                self._matrix[count:needed] = embeddings
+            self._ids.extend(certificate_ids)
+            self._count = needed
+            self.watermark = watermark
+
+    def top_k(self, query: np.ndarray, k: int = 10) -> List[Tuple[str, float]]:
+        """IDs and cosine similarities of the k rows closest to a normalized query."""
+        with self._lock:
+            matrix, scales, count, ids = self._matrix, self._scales, self._count, self._ids
+        if not count:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        if self.dtype == "float32":
+            scores = matrix[:count] @ query
+        else:
+            scores = np.empty(count, dtype=np.float32)
+            buffer = np.empty((min(_CHUNK_ROWS, count), matrix.shape[1]), dtype=np.float32)
+            for start in range(0, count, _CHUNK_ROWS):
+                stop = min(start + _CHUNK_ROWS, count)
+                chunk = buffer[:stop - start]
+                np.copyto(chunk, matrix[start:stop])
+                np.matmul(chunk, query, out=scores[start:stop])
+            if self.dtype == "int8":
+                scores *= scales[:count]
+        k = min(k, count)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(ids[i], float(scores[i])) for i in best]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": self._count,
+                "dtype": self.dtype,
+                "bytes": self._matrix.nbytes + self._scales.nbytes if self._matrix is not None else 0,
+                "watermark": self.watermark,
+            }
@@ -0,0 +1,132 @@
+import base64
+import hashlib
+import json
+import os
+import sys
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional
+
+from jose import jwk, jws
+from jose.exceptions import JOSEError
+
+from qr_service import certificate_qr_payload
+
+ALGORITHM = "ES256"
+
+# Short claim names keep the token, and so the QR code, small
+CLAIMS = {
+    "id": "certificate_id",
+    "n": "recipient_name",
+    "c": "course_name",
+    "d": "issue_date",
+}
+
+
+class InvalidSignature(ValueError):
+    """Raised when a token is malformed, signed by an unknown key, or its signature does not match."""
+
+
+def key_id(public_key) -> str:
+    """Short, stable identifier of a public key, from a hash of its coordinates"""
+    key = public_key.to_dict()
+    digest = hashlib.sha256(f"{key['crv']}:{key['x']}:{key['y']}".encode()).digest()
+    return base64.urlsafe_b64encode(digest[:9]).decode()
+
+
+class CertificateSigner:
+    """Signs a certificate's core fields as a compact ES256 JWS, for its QR payload."""
+
+    def __init__(self, private_key_pem: str):
+        self._key = jwk.construct(private_key_pem, ALGORITHM)
+        self.public_key = self._key.public_key()
+        self.key_id = key_id(self.public_key)
+
+    def sign(self, certificate: Mapping[str, Any]) -> str:
+        claims = {claim: certificate[field] for claim, field in CLAIMS.items()}
+        claims["iat"] = int(time.time())
+        return jws.sign(claims, self._key, algorithm=ALGORITHM, headers={"kid": self.key_id})
+
+
+class CertificateVerifier:
+    """Checks certificate tokens against a set of public keys, parsed once and kept by key ID."""
+
+    def __init__(self, public_key_pems: List[str]):
+        self._keys = {}
+        for pem in public_key_pems:
+            key = jwk.construct(pem, ALGORITHM)
+            self._keys[key_id(key)] = key
+
+    def add_key(self, public_key) -> None:
+        self._keys[key_id(public_key)] = public_key
+
+    def jwks(self) -> Dict[str, Any]:
+        return {"keys": [dict(key.to_dict(), kid=kid, use="sig") for kid, key in self._keys.items()]}
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """The certificate fields a token was signed over, plus `issued_at` and `key_id`."""
+        try:
+            kid = jws.get_unverified_header(token).get("kid")
+            key = self._keys.get(kid)
+            if key is None:
+                raise InvalidSignature(f"Unknown signing key: {kid}")
+            claims = jws.verify(token, key, algorithms=[ALGORITHM])
+        except JOSEError as e:
+            raise InvalidSignature(str(e)) from e
+        claims = json.loads(claims)
+        if not all(claim in claims for claim in CLAIMS):
+            raise InvalidSignature("Token is missing certificate fields")
+        certificate = {field: claims[claim] for claim, field in CLAIMS.items()}
+        certificate["issued_at"] = claims.get("iat")
+        certificate["key_id"] = kid
+        return certificate
+
+
+def signed_qr_payload(certificate: Mapping[str, Any]) -> str:
+    """QR payload for a new certificate, carrying its signed token when signing is configured"""
+    signer = load_signer()
+    signature = signer.sign(certificate) if signer is not None else None
+    return certificate_qr_payload(certificate["certificate_id"], signature)
+
+
+def _read(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+@lru_cache(maxsize=None)
+def load_signer() -> Optional[CertificateSigner]:
+    """The signer configured by CERTIFICATE_SIGNING_KEY, or None if certificates are not signed"""
+    path = os.environ.get("CERTIFICATE_SIGNING_KEY")
+    return CertificateSigner(_read(path)) if path else None
+
+
+@lru_cache(maxsize=None)
+def load_verifier() -> Optional[CertificateVerifier]:
+    """A verifier for the signing key's public half and CERTIFICATE_VERIFY_KEYS; None if neither is set"""
+    paths = [path.strip() for path in os.environ.get("CERTIFICATE_VERIFY_KEYS", "").split(",") if path.strip()]
+    signer = load_signer()
+    if not paths and signer is None:
+        return None
+    verifier = CertificateVerifier([_read(path) for path in paths])
+    if signer is not None:
+        verifier.add_key(signer.public_key)
+    return verifier
+
+
+def new_private_key() -> str:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    return key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "new-key":
+        sys.exit("usage: python signing.py new-key <private-key.pem>")
+    with open(os.open(sys.argv[2], os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as f:
+        f.write(new_private_key())
+    print(f"Wrote a new ES256 signing key to {sys.argv[2]}")
@@ -0,0 +1,914 @@
+import fcntl
+import glob
+import heapq
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+import search
+from bloom import BloomFilter
+from ids import is_ulid, ulid_floor
+from records import CertificateRecord, pack_certificate_id
+from verify_index import VerifyIndex, build_verify_index, index_segments, segment_path
+
+# Columns of a stored certificate. QR images are not stored; they are
+# rendered from qr_payload on demand.
+CERTIFICATE_FIELDS = (
+    "recipient_name",
+    "course_name",
+    "issue_date",
+    "certificate_id",
+    "qr_payload",
+    "content",
+)
+
+
+def _index_search_terms(conn: sqlite3.Connection, rows: Iterable[tuple]) -> None:
+    """Add certificate rows (in CERTIFICATE_FIELDS order) to the search tables.
+
+    search_postings maps each token to the certificates containing it,
+    search_vocabulary counts certificates per token, and search_trigrams
+    maps trigrams to vocabulary tokens for typo-tolerant matching.
+    """
+    postings = []
+    documents: Counter = Counter()
+    for row in rows:
+        certificate = dict(zip(CERTIFICATE_FIELDS, row))
+        for token in search.certificate_tokens(certificate):
+            postings.append((token, certificate["certificate_id"]))
+            documents[token] += 1
+    conn.executemany("INSERT OR IGNORE INTO search_postings (token, certificate_id) VALUES (?, ?)", postings)
+    new_tokens = []
+    for token, count in documents.items():
+        total = conn.execute(
+            "INSERT INTO search_vocabulary (token, documents) VALUES (?, ?) "
+            "ON CONFLICT (token) DO UPDATE SET documents = documents + excluded.documents RETURNING documents",
+            (token, count),
+        ).fetchone()[0]
+        if total == count:
+            new_tokens.append(token)
+    conn.executemany(
+        "INSERT OR IGNORE INTO search_trigrams (trigram, token) VALUES (?, ?)",
+        [(trigram, token) for token in new_tokens for trigram in search.trigrams(token)],
+    )
+
+
+def _create_search_index(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "CREATE TABLE search_postings (token TEXT NOT NULL, certificate_id TEXT NOT NULL,"
+        " PRIMARY KEY (token, certificate_id)) WITHOUT ROWID"
+    )
+    conn.execute("CREATE TABLE search_vocabulary (token TEXT PRIMARY KEY, documents INTEGER NOT NULL) WITHOUT ROWID")
+    conn.execute(
+        "CREATE TABLE search_trigrams (trigram TEXT NOT NULL, token TEXT NOT NULL,"
+        " PRIMARY KEY (trigram, token)) WITHOUT ROWID"
+    )
+    rows = conn.execute(f"SELECT {', '.join(CERTIFICATE_FIELDS)} FROM certificates")
+    while True:
+        chunk = rows.fetchmany(10_000)
+        if not chunk:
+            break
+        _index_search_terms(conn, chunk)
+
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version
+_MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS certificates (
+        certificate_id TEXT PRIMARY KEY,
+        recipient_name TEXT NOT NULL,
+        course_name TEXT NOT NULL,
+        issue_date TEXT NOT NULL,
+        qr_code TEXT,
+        content TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_certificates_recipient_name ON certificates (recipient_name);
+    CREATE INDEX IF NOT EXISTS idx_certificates_course_name ON certificates (course_name);
+    CREATE INDEX IF NOT EXISTS idx_certificates_issue_date ON certificates (issue_date);
+    """,
+    # Replace stored base64 QR PNGs with their payload
+    """
+    CREATE TABLE certificates_new (
+        certificate_id TEXT PRIMARY KEY,
+        recipient_name TEXT NOT NULL,
+        course_name TEXT NOT NULL,
+        issue_date TEXT NOT NULL,
+        qr_payload TEXT,
+        content TEXT
+    );
+    INSERT INTO certificates_new
+        SELECT certificate_id, recipient_name, course_name, issue_date,
+               CASE WHEN qr_code IS NOT NULL THEN 'Certificate ID: ' || certificate_id END,
+               content
+        FROM certificates;
+    DROP TABLE certificates;
+    ALTER TABLE certificates_new RENAME TO certificates;
+    CREATE INDEX idx_certificates_recipient_name ON certificates (recipient_name);
+    CREATE INDEX idx_certificates_course_name ON certificates (course_name);
+    CREATE INDEX idx_certificates_issue_date ON certificates (issue_date);
+    """,
+    # Let filtered listings page by certificate_id without sorting every match
+    """
+    DROP INDEX idx_certificates_course_name;
+    DROP INDEX idx_certificates_issue_date;
+    CREATE INDEX idx_certificates_course_name ON certificates (course_name, certificate_id);
+    CREATE INDEX idx_certificates_issue_date ON certificates (issue_date, certificate_id);
+    """,
+    # Search index over recipient and course names
+    _create_search_index,
+    # Sentence embeddings of certificates, computed once and shared by all workers
+    """
+    CREATE TABLE certificate_embeddings (
+        certificate_id TEXT NOT NULL,
+        model TEXT NOT NULL,
+        embedding BLOB NOT NULL,
+        PRIMARY KEY (certificate_id, model)
+    ) WITHOUT ROWID;
+    """,
+    # Revoked certificates, checked by signed verification
+    """
+    CREATE TABLE revocations (
+        certificate_id TEXT PRIMARY KEY,
+        revoked_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))
+    ) WITHOUT ROWID;
+    """,
+    # Let workers pull in revocations made since they last looked
+    """
+    CREATE INDEX revocations_revoked_at ON revocations (revoked_at);
+    """,
+]
+
+
+class CertificateStore:
+    """Base class for certificate storage backends.
+
+    Stores behave like a read-only mapping of certificate_id to
+    CertificateRecord, so existing `id in store` / `store[id]` lookups keep
+    working. Writes go through `put` and `put_many`, which accept records
+    or plain certificate dicts.
+    """
+
+    def get(self, certificate_id: str, default: Any = None) -> Optional[CertificateRecord]:
+        raise NotImplementedError
+
+    def get_many(self, certificate_ids: Iterable[str]) -> Dict[str, CertificateRecord]:
+        """Certificates by ID, for those of the IDs that exist, looked up together."""
+        return {record["certificate_id"]: record for record in self._records(dict.fromkeys(certificate_ids))}
+
+    def put(self, certificate: Mapping[str, Any]) -> None:
+        self.put_many([certificate])
+
+    def put_many(self, certificates: Iterable[Mapping[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def find(self,
+             recipient_name: Optional[str] = None,
+             course_name: Optional[str] = None,
+             issue_date: Optional[str] = None,
+             limit: int = 100,
+             after: Optional[str] = None,
+             issued_since: Optional[float] = None) -> List[CertificateRecord]:
+        """Return certificates matching all of the given exact field values.
+
+        Results are ordered by certificate_id. Pass the last ID of one page
+        as `after` to get the next page. `issued_since` (a Unix time) keeps
+        only certificates with ULID IDs made since then, a range of the ID
+        index; legacy UUID IDs carry no time and are left out.
+        """
+        raise NotImplementedError
+
+    def values(self) -> Iterator[CertificateRecord]:
+        raise NotImplementedError
+
+    # Most certificates scored per search, and vocabulary tokens matched per query word
+    SEARCH_CANDIDATES = 500
+    SEARCH_VOCABULARY = 100
+    # Trigrams on more vocabulary tokens than this are skipped when matching typos, where possible
+    SEARCH_TRIGRAM_SCAN = 2000
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[CertificateRecord, float]]:
+        """Certificates whose recipient or course name match the query, best first, with scores.
+
+        Query words match whole words and prefixes, or close misspellings
+        when a word matches nothing. Candidates come from the most
+        selective words first, so common words like a course name do not
+        make a search scan every certificate.
+        """
+        query_tokens = search.tokenize(query)
+        if not query_tokens:
+            return []
+        matches = [self._matching_tokens(token) for token in query_tokens]
+        candidates: Set[str] = set()
+        # Rarest query words first; within a word, exact matches before prefixes and typos
+        for query_token, tokens in sorted(zip(query_tokens, matches), key=lambda item: sum(item[1].values())):
+            if not tokens:
+                continue
+            for token in sorted(tokens, key=lambda token: -search.token_score(query_token, token)):
+                if len(candidates) >= self.SEARCH_CANDIDATES:
+                    break
+                candidates |= self._postings([token], self.SEARCH_CANDIDATES - len(candidates))
+            # A word found as is (or as a prefix) narrows the search enough;
+            # typo matches may be wrong, so keep going
+            if candidates and any(token.startswith(query_token) for token in tokens):
+                break
+        return search.rank(query_tokens, self._records(candidates), limit)
+
+    def _matching_tokens(self, query_token: str) -> Dict[str, int]:
+        """Indexed tokens matching a query word, with their certificate counts."""
+        raise NotImplementedError
+
+    def _postings(self, tokens: Iterable[str], limit: int) -> Set[str]:
+        """Up to `limit` IDs of certificates containing any of the tokens."""
+        raise NotImplementedError
+
+    def changes(self, after: int = 0, limit: int = 1000) -> List[Tuple[int, CertificateRecord]]:
+        """Certificates in issuance order after position `after`, with their positions."""
+        raise NotImplementedError
+
+    def get_embeddings(self, model: str, certificate_ids: Iterable[str]) -> Dict[str, bytes]:
+        """Stored embeddings (float32 bytes) of the given certificates, where there are any."""
+        raise NotImplementedError
+
+    def put_embeddings(self, model: str, embeddings: Mapping[str, bytes]) -> None:
+        raise NotImplementedError
+
+    def revoke(self, certificate_id: str) -> None:
+        """Mark a certificate as revoked; its signed QR code will then fail revocation checks."""
+        raise NotImplementedError
+
+    def is_revoked(self, certificate_id: str) -> bool:
+        raise NotImplementedError
+
+    def revoked(self, certificate_ids: Iterable[str]) -> Set[str]:
+        """Those of the given certificates that are revoked."""
+        return {certificate_id for certificate_id in certificate_ids if self.is_revoked(certificate_id)}
+
+    def _records(self, certificate_ids: Iterable[str]) -> List[CertificateRecord]:
+        records = (self.get(certificate_id) for certificate_id in certificate_ids)
+        return [record for record in records if record is not None]
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+    def __contains__(self, certificate_id: object) -> bool:
+        return isinstance(certificate_id, str) and self.get(certificate_id) is not None
+
+    def __getitem__(self, certificate_id: str) -> CertificateRecord:
+        certificate = self.get(certificate_id)
+        if certificate is None:
+            raise KeyError(certificate_id)
+        return certificate
+
+
+class MemoryCertificateStore(CertificateStore):
+    """Non-persistent store for development and tests."""
+
+    def __init__(self):
+        # Keyed by packed ID, so UUID keys take 16 bytes rather than 36 characters
+        self._certificates: Dict[Any, CertificateRecord] = {}
+        self._lock = threading.Lock()
+        self._search = search.MemorySearchIndex()
+        # Issuance order, for changes()
+        self._sequence: List[CertificateRecord] = []
+        self._embeddings: Dict[Tuple[str, str], bytes] = {}
+        self._revoked: Set[str] = set()
+
+    def get(self, certificate_id: str, default: Any = None) -> Optional[CertificateRecord]:
+        return self._certificates.get(pack_certificate_id(certificate_id), default)
+
+    def put_many(self, certificates: Iterable[Mapping[str, Any]]) -> None:
+        with self._lock:
+            for certificate in certificates:
+                record = CertificateRecord.from_dict(certificate)
+                if record._id not in self._certificates:
+                    self._sequence.append(record)
+                self._certificates[record._id] = record
+                self._search.add(record)
+
+    def find(self, recipient_name=None, course_name=None, issue_date=None, limit=100, after=None,
+             issued_since=None):
+        floor = ulid_floor(issued_since) if issued_since is not None else None
+        criteria = {
+            "recipient_name": recipient_name,
+            "course_name": course_name,
+            "issue_date": issue_date,
+        }
+        criteria = {k: v for k, v in criteria.items() if v is not None}
+        matches = (
+            certificate for certificate in list(self._certificates.values())
+            if all(getattr(certificate, k) == v for k, v in criteria.items())
+            and (after is None or certificate.certificate_id > after)
+            and (floor is None or (certificate.certificate_id >= floor and is_ulid(certificate.certificate_id)))
+        )
+        return heapq.nsmallest(limit, matches, key=lambda certificate: certificate.certificate_id)
+
+    def changes(self, after=0, limit=1000):
+        return [(after + i + 1, record) for i, record in enumerate(self._sequence[after:after + limit])]
+
+    def get_embeddings(self, model, certificate_ids):
+        found = {}
+        for certificate_id in certificate_ids:
+            embedding = self._embeddings.get((model, certificate_id))
+            if embedding is not None:
+                found[certificate_id] = embedding
+        return found
+
+    def put_embeddings(self, model, embeddings):
+        for certificate_id, embedding in embeddings.items():
+            self._embeddings.setdefault((model, certificate_id), embedding)
+
+    def revoke(self, certificate_id):
+        self._revoked.add(certificate_id)
+
+    def is_revoked(self, certificate_id):
+        return certificate_id in self._revoked
+
+    def _matching_tokens(self, query_token):
+        return self._search.matching_tokens(query_token)
+
+    def _postings(self, tokens, limit):
+        return self._search.postings(tokens, limit)
+
+    def values(self) -> Iterator[CertificateRecord]:
+        return iter(list(self._certificates.values()))
+
+    def __len__(self) -> int:
+        return len(self._certificates)
+
+
+class _PendingWrite:
+    __slots__ = ("rows", "done", "error")
+
+    def __init__(self, rows: List[tuple]):
+        self.rows = rows
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class SQLiteCertificateStore(CertificateStore):
+    """SQLite-backed store in WAL mode.
+
+    Reads use one connection per thread. Writes are handed to a single
+    writer thread which commits everything queued so far in one
+    transaction (group commit), so concurrent issuance shares fsyncs.
+    Multiple processes can open the same file.
+
+    With an index_path, lookups by ID are served from a memory-mapped
+    VerifyIndex shared by every process. An indexer thread brings it up to
+    date once writes have been quiet for index_interval seconds, or after
+    index_max_staleness seconds under continuous writes, by appending a
+    delta segment of the new rows; IDs issued since fall back to SQLite.
+
+    With a bloom_fp_rate, a Bloom filter of issued IDs answers most lookups
+    for unknown IDs without touching SQLite. It is built from the table in
+    the background at startup, and before trusting a negative answer a
+    thread checks PRAGMA data_version and pulls in rows committed since
+    (by any process) past the filter's rowid watermark.
+
+    Revoked IDs are held in memory, so checking one is a set lookup. At most
+    every revocation_refresh seconds, a check whose thread sees a new PRAGMA
+    data_version pulls in revocations made since by other processes.
+    """
+
+    # Smallest Bloom filter capacity, so a new database does not resize it immediately
+    BLOOM_MIN_CAPACITY = 1_000_000
+    # Delta segments are merged into one once there are this many, and the
+    # whole index is rebuilt once they hold this fraction of the base's rows
+    INDEX_MAX_DELTAS = 8
+    INDEX_COMPACT_RATIO = 0.25
+
+    def __init__(self, path: str, max_batch_size: int = 1000,
+                 index_path: Optional[str] = None, index_interval: float = 2.0,
+                 index_max_staleness: float = 30.0,
+                 bloom_fp_rate: Optional[float] = None,
+                 revocation_refresh: float = 1.0):
+        self.path = path
+        self.max_batch_size = max_batch_size
+        self.index_path = index_path
+        self.index_interval = index_interval
+        self.index_max_staleness = index_max_staleness
+        self._local = threading.local()
+        self._queue: "queue.Queue[Optional[_PendingWrite]]" = queue.Queue()
+        self._closed = False
+
+        conn = self._connect()
+        self._migrate(conn)
+        conn.close()
+
+        self._writer = threading.Thread(target=self._write_loop, name="certificate-store-writer", daemon=True)
+        self._writer.start()
+
+        self.index: Optional[VerifyIndex] = None
+        self.index_error: Optional[str] = None
+        if index_path:
+            self.index = VerifyIndex(index_path)
+            self._index_dirty = threading.Event()
+            self._index_closed = threading.Event()
+            # Checked once at startup, in case the index is missing or stale
+            self._index_dirty.set()
+            self._indexer = threading.Thread(target=self._index_loop, name="certificate-store-indexer", daemon=True)
+            self._indexer.start()
+
+        self.bloom: Optional[BloomFilter] = None
+        self.bloom_fp_rate = bloom_fp_rate
+        self._bloom_watermark = 0
+        self._bloom_lock = threading.Lock()
+        self._bloom_building = False
+        # Lookups answered "not issued" by the filter, and filter hits SQLite did not confirm
+        self.bloom_absorbed = 0
+        self.bloom_false_positives = 0
+        if bloom_fp_rate:
+            self._start_bloom_build()
+
+        self.revocation_refresh = revocation_refresh
+        self._revocations: Set[str] = set()
+        # Latest revoked_at seen; rows are re-read from a little before it, as
+        # a revocation may commit after a later-stamped one
+        self._revocations_since = "0001-01-01T00:00:00Z"
+        self._revocations_checked = 0.0
+        self._revocations_lock = threading.Lock()
+        self._load_revocations(self._reader)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        # BEGIN IMMEDIATE serialises workers that open a fresh database at the same time
+        conn.isolation_level = None
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, script in enumerate(_MIGRATIONS[version:], start=version + 1):
+                if callable(script):
+                    # Migrations that need Python, e.g. to backfill derived tables
+                    script(conn)
+                else:
+                    for statement in script.split(";"):
+                        if statement.strip():
+                            conn.execute(statement)
+                conn.execute(f"PRAGMA user_version={number}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @property
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _row_to_record(self, row: tuple) -> CertificateRecord:
+        return CertificateRecord(**dict(zip(CERTIFICATE_FIELDS, row)))
+
+    def get(self, certificate_id: str, default: Any = None) -> Optional[CertificateRecord]:
+        bloom = self.bloom
+        if bloom is not None and not self._may_contain(bloom, certificate_id):
+            self.bloom_absorbed += 1
+            return default
+        if self.index is not None:
+            certificate = self.index.get(certificate_id)
+            if certificate is not None:
+                return certificate
+        row = self._reader.execute(
+            f"SELECT {', '.join(CERTIFICATE_FIELDS)} FROM certificates WHERE certificate_id = ?",
+            (certificate_id,),
+        ).fetchone()
+        if row is None:
+            if bloom is not None:
+                self.bloom_false_positives += 1
+            return default
+        return self._row_to_record(row)
+
+    def _may_contain(self, bloom: BloomFilter, certificate_id: str) -> bool:
+        if certificate_id in bloom:
+            return True
+        # A negative is only trusted once the filter has every row committed
+        # before this check, including other processes' writes
+        data_version = self._reader.execute("PRAGMA data_version").fetchone()[0]
+        if getattr(self._local, "data_version", None) == data_version:
+            return False
+        self._local.data_version = data_version
+        self._sync_bloom()
+        return certificate_id in self.bloom
+
+    def _sync_bloom(self) -> None:
+        with self._bloom_lock:
+            self._bloom_watermark = self._catch_up_bloom(self._reader, self.bloom, self._bloom_watermark)
+            if self.bloom.count > self.bloom.capacity:
+                self._start_bloom_build()
+
+    @staticmethod
+    def _catch_up_bloom(conn: sqlite3.Connection, bloom: BloomFilter, watermark: int) -> int:
+        """Add rows past the watermark to the filter and return the new watermark."""
+        rows = conn.execute(
+            "SELECT rowid, certificate_id FROM certificates WHERE rowid > ? ORDER BY rowid",
+            (watermark,),
+        ).fetchall()
+        if rows:
+            bloom.update(row[1] for row in rows)
+            watermark = rows[-1][0]
+        return watermark
+
+    def _start_bloom_build(self) -> None:
+        if self._bloom_building:
+            return
+        self._bloom_building = True
+        threading.Thread(target=self._build_bloom, name="certificate-store-bloom", daemon=True).start()
+
+    def _build_bloom(self) -> None:
+        conn = self._connect()
+        try:
+            # One read transaction, so the watermark matches the rows read
+            conn.execute("BEGIN")
+            watermark, count = conn.execute("SELECT COALESCE(MAX(rowid), 0), COUNT(*) FROM certificates").fetchone()
+            bloom = BloomFilter(max(2 * count, self.BLOOM_MIN_CAPACITY), self.bloom_fp_rate)
+            rows = conn.execute("SELECT certificate_id FROM certificates WHERE rowid <= ?", (watermark,))
+            while True:
+                chunk = rows.fetchmany(100_000)
+                if not chunk:
+                    break
+                bloom.update(row[0] for row in chunk)
+            conn.execute("COMMIT")
+            with self._bloom_lock:
+                # Rows committed while building go in before the swap, so the
+                # new filter never answers "not issued" for an ID the old one had
+                self._bloom_watermark = self._catch_up_bloom(conn, bloom, watermark)
+                self.bloom = bloom
+                self._bloom_building = False
+        finally:
+            conn.close()
+
+    def put_many(self, certificates: Iterable[Mapping[str, Any]]) -> None:
+        rows = [tuple(certificate.get(field) for field in CERTIFICATE_FIELDS) for certificate in certificates]
+        if not rows:
+            return
+        if self._closed:
+            raise RuntimeError("Certificate store is closed")
+        pending = _PendingWrite(rows)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        placeholders = ", ".join("?" for _ in CERTIFICATE_FIELDS)
+        insert = f"INSERT INTO certificates ({', '.join(CERTIFICATE_FIELDS)}) VALUES ({placeholders})"
+        while True:
+            pending = self._queue.get()
+            if pending is None:
+                break
+            # Group commit: take everything that queued up while the last
+            # transaction was being written
+            group = [pending]
+            size = len(pending.rows)
+            stop = False
+            while size < self.max_batch_size:
+                try:
+                    extra = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if extra is None:
+                    stop = True
+                    break
+                group.append(extra)
+                size += len(extra.rows)
+
+            try:
+                with conn:
+                    for item in group:
+                        conn.executemany(insert, item.rows)
+                        _index_search_terms(conn, item.rows)
+            except Exception:
+                # Retry each write on its own so one bad row does not fail the group
+                for item in group:
+                    try:
+                        with conn:
+                            conn.executemany(insert, item.rows)
+                            _index_search_terms(conn, item.rows)
+                    except Exception as e:
+                        item.error = e
+            for item in group:
+                item.done.set()
+            if self.index is not None:
+                self._index_dirty.set()
+            if stop:
+                break
+        conn.close()
+
+    def _index_loop(self) -> None:
+        while True:
+            self._index_dirty.wait()
+            # Let a burst of writes settle before updating, but not for longer
+            # than index_max_staleness when writes never stop
+            deadline = time.monotonic() + self.index_max_staleness
+            while not self._index_closed.is_set():
+                self._index_dirty.clear()
+                self._index_closed.wait(min(self.index_interval, max(deadline - time.monotonic(), 0)))
+                if not self._index_dirty.is_set() or time.monotonic() >= deadline:
+                    break
+            if self._index_closed.is_set():
+                break
+            try:
+                self.rebuild_index()
+                self.index_error = None
+            except Exception as e:
+                # Lookups keep working from the old index and SQLite
+                self.index_error = str(e)
+
+    def rebuild_index(self) -> bool:
+        """Bring the verify index up to date if the store has rows it lacks; returns whether it did.
+
+        New rows are appended as a delta segment. Deltas are merged once
+        there are INDEX_MAX_DELTAS of them, and the index is rebuilt from
+        scratch, as a new generation, once they outgrow INDEX_COMPACT_RATIO
+        of the base.
+        """
+        conn = self._connect()
+        try:
+            # One update at a time across processes sharing the index
+            with open(f"{self.index_path}.lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                conn.execute("BEGIN")
+                # Certificates are never updated, so the highest rowid tells whether the index is current
+                watermark = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM certificates").fetchone()[0]
+                segments = index_segments(self.index_path)
+                if segments and watermark <= segments[-1][1][1]:
+                    return False
+                columns = ", ".join(CERTIFICATE_FIELDS)
+                if segments:
+                    (_, (base_count, base_watermark, generation)), deltas = segments[0], segments[1:]
+                    delta_count = sum(header[0] for _, header in deltas)
+                    if delta_count + watermark - segments[-1][1][1] <= base_count * self.INDEX_COMPACT_RATIO:
+                        # Merge every delta into the first once there are too many; otherwise append one
+                        merge = len(deltas) >= self.INDEX_MAX_DELTAS
+                        since = base_watermark if merge else segments[-1][1][1]
+                        rows = conn.execute(f"SELECT {columns} FROM certificates WHERE rowid > ?", (since,))
+                        number = 1 if merge else len(segments)
+                        build_verify_index((self._row_to_record(row) for row in rows),
+                                           segment_path(self.index_path, generation, number), watermark, generation)
+                        if merge:
+                            self._remove_index_files(path for path, _ in deltas[1:])
+                        return True
+                    generation += 1
+                else:
+                    generation = 0
+                # Deltas left over from an earlier index of the same generation would be read as its own
+                self._remove_index_files(glob.glob(f"{glob.escape(segment_path(self.index_path, generation, ''))}*"))
+                rows = conn.execute(f"SELECT {columns} FROM certificates")
+                build_verify_index((self._row_to_record(row) for row in rows), self.index_path, watermark, generation)
+                self._remove_index_files(path for path, _ in segments[1:])
+                return True
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _remove_index_files(paths: Iterable[str]) -> None:
+        # Readers that still map them keep their copies until they reload
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def find(self, recipient_name=None, course_name=None, issue_date=None, limit=100, after=None,
+             issued_since=None):
+        clauses = []
+        params: List[Any] = []
+        for column, value in (("recipient_name", recipient_name),
+                              ("course_name", course_name),
+                              ("issue_date", issue_date)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if after is not None:
+            clauses.append("certificate_id > ?")
+            params.append(after)
+        if issued_since is not None:
+            # ULIDs are 26 characters; UUIDs sorting in the same range are 36
+            clauses.append("certificate_id >= ? AND length(certificate_id) = 26")
+            params.append(ulid_floor(issued_since))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.append(limit)
+        rows = self._reader.execute(
+            f"SELECT {', '.join(CERTIFICATE_FIELDS)} FROM certificates {where} ORDER BY certificate_id LIMIT ?",
+            params,
+        ).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def _matching_tokens(self, query_token):
+        conn = self._reader
+        if len(query_token) < 2:
+            rows = conn.execute("SELECT token, documents FROM search_vocabulary WHERE token = ?", (query_token,)).fetchall()
+        else:
+            # Exact and prefix matches are a range scan of the vocabulary
+            rows = conn.execute(
+                "SELECT token, documents FROM search_vocabulary WHERE token >= ? AND token < ? LIMIT ?",
+                (query_token, query_token + "\U0010ffff", self.SEARCH_VOCABULARY),
+            ).fetchall()
+        if rows:
+            return dict(rows)
+        # No match, so look for misspellings: tokens sharing at least `needed`
+        # of the query's trigrams can reach MIN_SIMILARITY. Up to needed - 1
+        # of the most common trigrams (mostly word starts) are not scanned,
+        # and candidates must share the rest of the requirement among the others.
+        grams = search.trigrams(query_token)
+        needed = max(1, math.ceil(search.MIN_SIMILARITY * len(grams)))
+        counts = sorted(
+            ((conn.execute("SELECT COUNT(*) FROM search_trigrams WHERE trigram = ?", (gram,)).fetchone()[0], gram)
+             for gram in grams),
+            reverse=True
+        )
+        skipped = 0
+        while skipped < needed - 1 and counts[skipped][0] > self.SEARCH_TRIGRAM_SCAN:
+            skipped += 1
+        scanned = [gram for _, gram in counts[skipped:]]
+        shared = Counter(token for (token,) in conn.execute(
+            f"SELECT token FROM search_trigrams WHERE trigram IN ({', '.join('?' for _ in scanned)})",
+            scanned,
+        ))
+        # Bound each token's similarity, taking every skipped trigram as shared
+        # and len(token) + 1 as its trigram count, before computing it exactly.
+        # A single edit leaves all but at most four of the query's trigrams,
+        # so single-edit typos are only looked for among tokens sharing the rest.
+        edit_shared = len(grams) - 4 if len(query_token) >= search.EDIT_MIN_LENGTH else len(grams) + 1
+        similarities = {
+            token: search.typo_similarity(query_token, token)
+            for token, count in shared.items()
+            if (count + skipped) / (len(grams) + len(token) + 1 - count - skipped) >= search.MIN_SIMILARITY
+            or (count + skipped >= edit_shared and abs(len(token) - len(query_token)) <= 1)
+        }
+        tokens = sorted(
+            (token for token, score in similarities.items() if score >= search.MIN_SIMILARITY),
+            key=lambda token: -similarities[token]
+        )[:self.SEARCH_VOCABULARY]
+        if not tokens:
+            return {}
+        return dict(conn.execute(
+            f"SELECT token, documents FROM search_vocabulary WHERE token IN ({', '.join('?' for _ in tokens)})",
+            tokens,
+        ).fetchall())
+
+    def _postings(self, tokens, limit):
+        tokens = list(tokens)
+        if limit <= 0 or not tokens:
+            return set()
+        rows = self._reader.execute(
+            f"SELECT DISTINCT certificate_id FROM search_postings WHERE token IN ({', '.join('?' for _ in tokens)}) LIMIT ?",
+            (*tokens, limit),
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def changes(self, after=0, limit=1000):
+        rows = self._reader.execute(
+            f"SELECT rowid, {', '.join(CERTIFICATE_FIELDS)} FROM certificates WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (after, limit),
+        ).fetchall()
+        return [(row[0], self._row_to_record(row[1:])) for row in rows]
+
+    def get_embeddings(self, model, certificate_ids):
+        certificate_ids = list(certificate_ids)
+        found = {}
+        for start in range(0, len(certificate_ids), 500):
+            chunk = certificate_ids[start:start + 500]
+            found.update(self._reader.execute(
+                f"SELECT certificate_id, embedding FROM certificate_embeddings"
+                f" WHERE model = ? AND certificate_id IN ({', '.join('?' for _ in chunk)})",
+                (model, *chunk),
+            ).fetchall())
+        return found
+
+    def put_embeddings(self, model, embeddings):
+        # Embeddings are derived data, so they are written directly rather than
+        # through the writer thread; workers racing on the same row keep the first
+        conn = self._reader
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO certificate_embeddings (certificate_id, model, embedding) VALUES (?, ?, ?)",
+                [(certificate_id, model, embedding) for certificate_id, embedding in embeddings.items()],
+            )
+
+    def revoke(self, certificate_id):
+        conn = self._reader
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO revocations (certificate_id) VALUES (?)", (certificate_id,))
+        self._revocations.add(certificate_id)
+
+    def is_revoked(self, certificate_id):
+        self._sync_revocations()
+        return certificate_id in self._revocations
+
+    def revoked(self, certificate_ids):
+        self._sync_revocations()
+        return {certificate_id for certificate_id in certificate_ids if certificate_id in self._revocations}
+
+    def _sync_revocations(self) -> None:
+        now = time.monotonic()
+        if now - self._revocations_checked < self.revocation_refresh:
+            return
+        self._revocations_checked = now
+        # data_version only changes when another connection commits
+        data_version = self._reader.execute("PRAGMA data_version").fetchone()[0]
+        if getattr(self._local, "revocations_version", None) == data_version:
+            return
+        self._local.revocations_version = data_version
+        self._load_revocations(self._reader)
+
+    def _load_revocations(self, conn: sqlite3.Connection) -> None:
+        with self._revocations_lock:
+            rows = conn.execute(
+                "SELECT certificate_id, revoked_at FROM revocations"
+                " WHERE revoked_at >= strftime('%Y-%m-%dT%H:%M:%SZ', ?, '-5 seconds')",
+                (self._revocations_since,),
+            ).fetchall()
+            self._revocations.update(certificate_id for certificate_id, _ in rows)
+            self._revocations_since = max([self._revocations_since] + [revoked_at for _, revoked_at in rows])
+
+    def _records(self, certificate_ids):
+        certificate_ids = list(certificate_ids)
+        records = []
+        for start in range(0, len(certificate_ids), 500):
+            chunk = certificate_ids[start:start + 500]
+            rows = self._reader.execute(
+                f"SELECT {', '.join(CERTIFICATE_FIELDS)} FROM certificates"
+                f" WHERE certificate_id IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            ).fetchall()
+            records.extend(self._row_to_record(row) for row in rows)
+        return records
+
+    def values(self) -> Iterator[CertificateRecord]:
+        # A dedicated connection keeps a long scan from holding up other reads on this thread
+        conn = self._connect()
+        try:
+            for row in conn.execute(f"SELECT {', '.join(CERTIFICATE_FIELDS)} FROM certificates"):
+                yield self._row_to_record(row)
+        finally:
+            conn.close()
+
+    def __len__(self) -> int:
+        return self._reader.execute("SELECT COUNT(*) FROM certificates").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {}
+        if self.index is not None:
+            stats["verify_index"] = dict(self.index.stats(), error=self.index_error)
+        if self.bloom is not None:
+            stats["bloom"] = dict(
+                self.bloom.stats(),
+                absorbed=self.bloom_absorbed,
+                false_positives=self.bloom_false_positives
+            )
+        return stats
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        if self.index is not None:
+            self._index_closed.set()
+            self._index_dirty.set()
+            self._indexer.join()
+
+
+def create_store(url: Optional[str] = None) -> CertificateStore:
+    """Create a store from a URL such as `sqlite:///certificates.db` or `memory://`.
+
+    Defaults to the CERTIFICATE_STORE_URL environment variable. SQLite stores
+    keep a verify index at VERIFY_INDEX_PATH (the database path plus `.idx`
+    by default; set it empty to disable) and a Bloom filter with false-positive
+    rate CERTIFICATE_BLOOM_FP_RATE (default 0.001; 0 disables it).
+    """
+    url = url or os.environ.get("CERTIFICATE_STORE_URL", "sqlite:///certificates.db")
+    if url.startswith("memory://"):
+        return MemoryCertificateStore()
+    if url.startswith("sqlite:///"):
+        path = url[len("sqlite:///"):]
+        return SQLiteCertificateStore(
+            path,
+            index_path=os.environ.get("VERIFY_INDEX_PATH", f"{path}.idx") or None,
+            index_interval=float(os.environ.get("VERIFY_INDEX_INTERVAL_SECONDS", 2.0)),
+            index_max_staleness=float(os.environ.get("VERIFY_INDEX_MAX_STALENESS_SECONDS", 30.0)),
+            bloom_fp_rate=float(os.environ.get("CERTIFICATE_BLOOM_FP_RATE", 0.001)) or None,
+            revocation_refresh=float(os.environ.get("REVOCATION_REFRESH_SECONDS", 1.0))
+        )
+    raise ValueError(f"Unsupported certificate store URL: {url}")
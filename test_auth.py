@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import multiprocessing
+
+import pytest
+
+import main
+from qr_service import certificate_qr_payload, qr_service
+from storage import SQLiteCertificateStore
+
+
+@pytest.mark.parametrize("headers", [
+    {},
+    {"Authorization": "Bearer anything"},
+    {"Authorization": "Bearer admin"},
+])
+def test_admin_routes_reject_tokens_not_issued_by_login(client, certificate_id, headers):
+    assert client.post(f"/certificates/{certificate_id}/revoke", headers=headers).status_code == 401
+    assert client.get("/certificates", headers=headers).status_code == 401
+    assert client.get("/certificates/search", params={"q": "jane"}, headers=headers).status_code == 401
+    assert client.get(f"/verify-certificate/{certificate_id}").status_code == 200
+
+
+def test_revoked_certificates_do_not_verify(client, admin, issue, certificate_id):
+    response = client.post(f"/certificates/{certificate_id}/revoke", headers=admin)
+    assert response.status_code == 200
+    assert client.get(f"/verify-certificate/{certificate_id}").status_code == 410
+
+    valid_id = issue()["certificate_id"]
+    images = [
+        ("images", ("revoked.png", qr_service.png(certificate_qr_payload(certificate_id)), "image/png")),
+        ("images", ("valid.png", qr_service.png(certificate_qr_payload(valid_id)), "image/png")),
+    ]
+    results = client.post("/verify-certificate/scan", files=images).json()["results"]
+    revoked, valid = (result["certificates"][0] for result in results)
+    assert (revoked["certificate_id"], revoked["valid"], revoked["revoked"]) == (certificate_id, False, True)
+    assert (valid["certificate_id"], valid["valid"], valid["revoked"]) == (valid_id, True, False)
+
+
+def test_chatbot_does_not_vouch_for_revoked_certificates(client, admin, issue):
+    def chat(conversation_id, **request):
+        return client.post("/verify-certificate-chatbot", json={"conversation_id": conversation_id, **request}).json()
+
+    revoked_id = issue()["certificate_id"]
+    client.post(f"/certificates/{revoked_id}/revoke", headers=admin)
+    assert "revoked" in chat("by-text", text=revoked_id)["response"]
+    assert "revoked" in chat("by-field", text="hi", certificate_id=revoked_id)["response"]
+
+    # Revoked while a conversation is already about it
+    certificate_id = issue()["certificate_id"]
+    assert "Jane Doe" in chat("found", text=certificate_id)["response"]
+    client.post(f"/certificates/{certificate_id}/revoke", headers=admin)
+    assert "revoked" in chat("found", text="who is this for")["response"]
+
+
+def test_revocations_reach_other_processes(tmp_path):
+    path = str(tmp_path / "certificates.db")
+    first = SQLiteCertificateStore(path, revocation_refresh=0)
+    second = SQLiteCertificateStore(path, revocation_refresh=0)
+    try:
+        assert not second.is_revoked("01HZX3J9Q4V8K2M7T5R6W0NBCD")
+        first.revoke("01HZX3J9Q4V8K2M7T5R6W0NBCD")
+        assert first.is_revoked("01HZX3J9Q4V8K2M7T5R6W0NBCD")
+        assert second.is_revoked("01HZX3J9Q4V8K2M7T5R6W0NBCD")
+        assert second.revoked(["01HZX3J9Q4V8K2M7T5R6W0NBCD", "01HZX3J9Q4V8K2M7T5R6W0NBCE"]) == {"01HZX3J9Q4V8K2M7T5R6W0NBCD"}
+        # A new worker loads existing revocations at startup
+        third = SQLiteCertificateStore(path)
+        assert third.is_revoked("01HZX3J9Q4V8K2M7T5R6W0NBCD")
+        third.close()
+    finally:
+        first.close()
+        second.close()
+
+
+def test_several_workers_need_a_shared_secret_key(monkeypatch, caplog):
+    monkeypatch.delenv("AUTH_SECRET_KEY", raising=False)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    with pytest.raises(RuntimeError):
+        asyncio.run(main.check_auth_secret_key())
+
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    monkeypatch.setattr(multiprocessing, "parent_process", lambda: object())
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(main.check_auth_secret_key())
+    assert "AUTH_SECRET_KEY" in caplog.text
+
+    monkeypatch.setenv("AUTH_SECRET_KEY", "shared")
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    asyncio.run(main.check_auth_secret_key())
@@ -0,0 +1,62 @@
+import io
+import json
+import zipfile
+
+import batch
+import main
+
+ROSTER = (
+    "recipient_name,course_name,issue_date\r\n"
+    "Jane Doe,Python Programming,2024-06-01\r\n"
+    '"Doe, John","Data Science\nand Statistics",2024-06-02\r\n'
+    "\r\n"
+    "Missing Date,Web Design\r\n"
+).encode()
+
+
+def test_csv_rows_allow_quoted_newlines():
+    rows = list(batch.iter_roster_rows(io.BytesIO(b"\xef\xbb\xbf" + ROSTER), "csv"))
+    assert [row_number for row_number, _, _ in rows] == [1, 2, 3]
+    assert rows[1][1] == {
+        "recipient_name": "Doe, John",
+        "course_name": "Data Science\nand Statistics",
+        "issue_date": "2024-06-02",
+    }
+    assert rows[2][1] == {"recipient_name": "Missing Date", "course_name": "Web Design"}
+
+
+def test_ndjson_rows_report_bad_lines():
+    roster = b'{"recipient_name": "A"}\n\n[1, 2]\nnot json\n'
+    rows = list(batch.iter_roster_rows(io.BytesIO(roster), "ndjson"))
+    assert rows[0] == (1, {"recipient_name": "A"}, None)
+    assert [(row_number, row) for row_number, row, _ in rows[1:]] == [(2, None), (3, None)]
+    assert all(error for _, _, error in rows[1:])
+
+
+def test_batch_ndjson_output(client):
+    response = client.post(
+        "/certificates/batch",
+        params={"output": "ndjson"},
+        files={"roster": ("roster.csv", ROSTER, "text/csv")},
+    )
+    assert response.status_code == 200
+    lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda line: line["row"])
+    assert [line["row"] for line in lines] == [1, 2, 3]
+    assert "issue_date" in lines[2]["error"]
+    certificate = main.certificates_db.get(lines[1]["certificate_id"])
+    assert certificate["recipient_name"] == "Doe, John"
+    assert certificate["course_name"] == "Data Science\nand Statistics"
+
+
+def test_batch_zip_output(client):
+    response = client.post("/certificates/batch", files={"roster": ("roster.csv", ROSTER, "text/csv")})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        names = archive.namelist()
+        pdfs = [name for name in names if name.endswith(".pdf")]
+        assert len(pdfs) == 2
+        assert all(archive.read(name).startswith(b"%PDF") for name in pdfs)
+        assert names.count("errors/row_3.txt") == 1
+        certificate_id = pdfs[0][len("certificate_"):-len(".pdf")]
+    assert main.certificates_db.get(certificate_id) is not None
@@ -32,7 +32,8 @@ def test_certificate_generation():
     print("\nTesting PDF generation...")
     response = requests.post(
         "http://localhost:8000/generate-certificate-pdf",
-        json=test_certificate
+        json=test_certificate,
+        headers={"Accept": "application/pdf"}
     )
     
     if response.status_code == 200:
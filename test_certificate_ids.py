@@ -0,0 +1,41 @@
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize("path", ["/verify-certificate/{}", "/certificates/{}/pdf", "/certificates/{}/qr"])
+def test_routes_accept_ids_in_any_case(client, certificate_id, path):
+    assert certificate_id != certificate_id.lower()
+    response = client.get(path.format(certificate_id.lower()))
+    assert response.status_code == 200
+
+
+def test_verify_returns_the_canonical_id(client, certificate_id):
+    assert client.get(f"/verify-certificate/{certificate_id.lower()}").json()["certificate_id"] == certificate_id
+
+
+def test_revoke_accepts_ids_in_any_case(client, admin, certificate_id):
+    response = client.post(f"/certificates/{certificate_id.lower()}/revoke", headers=admin)
+    assert response.status_code == 200
+    assert response.json()["certificate_id"] == certificate_id
+    assert client.get(f"/verify-certificate/{certificate_id}").status_code == 410
+
+
+def test_chatbot_request_certificate_id_is_normalized(client, certificate_id, monkeypatch):
+    seen = {}
+
+    def get_bot_response(conversation_id, user_input, certificate_data=None):
+        seen["certificate_data"] = certificate_data
+        return {"response": "ok"}
+
+    monkeypatch.setattr(main.chatbot, "get_bot_response", get_bot_response)
+    response = client.post("/verify-certificate-chatbot", json={"text": "hi", "certificate_id": f" {certificate_id.lower()} "})
+    assert response.status_code == 200
+    assert seen["certificate_data"]["certificate_id"] == certificate_id
+
+
+def test_ids_issued_together_are_not_consecutive():
+    from ids import decode_ulid, new_ulid
+
+    values = sorted(decode_ulid(new_ulid()) for _ in range(100))
+    assert all(b - a > 1 << 16 for a, b in zip(values, values[1:]))
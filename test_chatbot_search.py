@@ -0,0 +1,40 @@
+from chatbot import CertificateChatbot
+from ids import new_certificate_id
+from storage import MemoryCertificateStore
+
+
+def certificate(name, course):
+    return {"certificate_id": new_certificate_id(), "recipient_name": name,
+            "course_name": course, "issue_date": "2024-06-01"}
+
+
+def chatbot(*certificates):
+    store = MemoryCertificateStore()
+    store.put_many(certificates)
+    return CertificateChatbot(store)
+
+
+def test_search_needs_both_recipient_and_course():
+    jane = certificate("Jane Doe", "Python Programming")
+    bot = chatbot(jane, certificate("Janet Smith", "Data Science"), certificate("Jack Jones", "Web Design"))
+    for message in ("ja", "jane", "jane doe", "python programming", "find ja py"):
+        assert bot._search_response("c", message) is None, message
+
+    response = bot._search_response("c", "find the certificate for jane in python")
+    assert "Jane Doe" in response["response"]
+    assert bot.conversations.get("c")["certificate_id"] == jane["certificate_id"]
+
+
+def test_search_tolerates_single_typos():
+    bot = chatbot(certificate("Jane Doe", "Python Programming"))
+    assert "Jane Doe" in bot._search_response("c", "jame pyhton")["response"]
+
+
+def test_several_matches_are_not_listed():
+    first = certificate("Jane Doe", "Python Programming")
+    second = certificate("Jane Doe", "Python Programming")
+    bot = chatbot(first, second)
+    response = bot._search_response("c", "jane doe python")["response"]
+    assert "certificate ID" in response
+    assert first["certificate_id"] not in response and second["certificate_id"] not in response
+    assert bot.conversations.get("c") is None
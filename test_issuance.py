@@ -0,0 +1,59 @@
+import main
+from ids import new_certificate_id
+from qr_service import certificate_qr_payload
+from workers import PoolBusy
+
+
+def test_issuance_does_not_fail_after_storing_when_render_pool_is_busy(client, issue, monkeypatch):
+    async def busy(*args, **kwargs):
+        raise PoolBusy(main.render_pool)
+
+    monkeypatch.setattr(main.render_pool, "run", busy)
+    before = len(main.certificates_db)
+    certificate = issue()
+    assert certificate["qr_code"] is None
+    assert certificate["qr_code_url"] == f"/certificates/{certificate['certificate_id']}/qr"
+    assert len(main.certificates_db) == before + 1
+
+
+def test_issued_qr_code_is_rendered_in_the_background(client, issue):
+    certificate = issue()
+    qr = client.get(certificate["qr_code_url"])
+    assert qr.status_code == 200
+    assert qr.headers["content-type"] == "image/png"
+
+
+def test_verification_does_not_render_qr_codes(client, certificate_request, monkeypatch):
+    # Stored directly, so its QR code has never been rendered or cached
+    certificate_id = new_certificate_id()
+    main.certificates_db.put(dict(certificate_request, certificate_id=certificate_id,
+                                  qr_payload=certificate_qr_payload(certificate_id)))
+
+    async def unexpected(*args, **kwargs):
+        raise AssertionError("verification rendered a QR code")
+
+    monkeypatch.setattr(main.render_pool, "run", unexpected)
+    response = client.get(f"/verify-certificate/{certificate_id}")
+    assert response.status_code == 200
+    certificate = response.json()
+    assert certificate["qr_payload"] == main.certificates_db.get(certificate_id)["qr_payload"]
+    assert certificate["qr_code_url"] == f"/certificates/{certificate_id}/qr"
+    assert certificate["qr_code"] is None
+
+
+def test_qr_prefetches_stay_within_their_budget(issue, monkeypatch):
+    calls = []
+
+    async def render(*args, **kwargs):
+        calls.append(args)
+        raise PoolBusy(main.render_pool)
+
+    monkeypatch.setattr(main.render_pool, "run", render)
+    monkeypatch.setattr(main, "_prefetches", {object() for _ in range(main.QR_PREFETCH_MAX_PENDING)})
+    issue()
+    assert calls == []
+
+    monkeypatch.setattr(main, "_prefetches", set())
+    monkeypatch.setattr(main.render_pool, "pending", main.render_pool.max_pending // 2)
+    issue()
+    assert calls == []
@@ -0,0 +1,14 @@
+def test_metrics_export_conversations_and_batching(client):
+    client.post("/verify-certificate-chatbot", json={"text": "01HZX3J9Q4V8K2M7T5R6W0NBCD", "conversation_id": "metrics"})
+    text = client.get("/metrics").text
+    for family, kind in [
+        ("chatbot_conversations_live", "gauge"),
+        ("chatbot_conversation_evictions_total", "counter"),
+        ("model_inference_batch_size", "histogram"),
+        ("model_inference_queue_wait_seconds", "histogram"),
+    ]:
+        assert f"# TYPE {family} {kind}" in text
+    assert 'model_inference_batch_size_bucket{model="embedding",le=' in text
+    assert 'model_inference_queue_wait_seconds_count{model="zero_shot"}' in text
+    samples = dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+    assert int(samples["chatbot_conversations_live"]) >= 0
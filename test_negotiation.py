@@ -0,0 +1,35 @@
+import pytest
+
+from main import _negotiate
+
+
+OFFERED = ["application/pdf", "application/json"]
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, "application/pdf"),
+    ("", "application/pdf"),
+    ("*/*", "application/pdf"),
+    ("application/json", "application/json"),
+    ("application/pdf;q=0, */*", "application/json"),
+    ("application/pdf;q=0, application/*", "application/json"),
+    ("application/*;q=0.5, application/json", "application/json"),
+    ("application/json;q=0.5, application/*;q=0.9", "application/pdf"),
+    ("*/*;q=0.1, application/json;q=0.2", "application/json"),
+    ("application/json;q=0, application/pdf;q=0", None),
+    ("application/*;q=0, */*", None),
+    ("text/html", None),
+    ("APPLICATION/JSON", "application/json"),
+    ("application/pdf, application/json", "application/pdf"),
+])
+def test_negotiate(accept, expected):
+    assert _negotiate(accept, OFFERED) == expected
+
+
+def test_refused_pdf_falls_back_to_json(client, certificate_request):
+    response = client.post("/generate-certificate-pdf", json=certificate_request,
+                           headers={"Accept": "application/pdf;q=0, */*"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert client.post("/generate-certificate-pdf", json=certificate_request,
+                       headers={"Accept": "application/pdf;q=0, application/json;q=0"}).status_code == 406
@@ -0,0 +1,53 @@
+import os
+
+import main
+from pdf_cache import PDFCache
+
+
+def test_pdf_downloads_use_etags_and_ranges(client, certificate_id):
+    url = f"/certificates/{certificate_id}/pdf"
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "application/pdf"
+    assert first.content.startswith(b"%PDF")
+    etag = first.headers["etag"]
+
+    cached = client.get(url)
+    assert cached.content == first.content
+    assert cached.headers["etag"] == etag
+
+    not_modified = client.get(url, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    partial = client.get(url, headers={"Range": "bytes=0-99"})
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == f"bytes 0-99/{len(first.content)}"
+    assert partial.content == first.content[:100]
+
+
+def test_pdf_evicted_before_it_is_sent_is_still_served(client, certificate_id, monkeypatch):
+    url = f"/certificates/{certificate_id}/pdf"
+    expected = client.get(url).content
+    get = main.pdf_cache.get
+
+    def get_then_evict(key):
+        file = get(key)
+        os.remove(main.pdf_cache.path(key))
+        return file
+
+    monkeypatch.setattr(main.pdf_cache, "get", get_then_evict)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.content == expected
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = PDFCache(str(tmp_path), max_bytes=250)
+    for key in ("a", "b"):
+        cache.put(key, b"x" * 100).close()
+    cache.get("a").close()
+    cache.put("c", b"x" * 100).close()
+    assert cache.get("b") is None
+    assert cache.get("a").read() == b"x" * 100
+    assert cache.stats()["evictions"] == 1
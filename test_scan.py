@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+import main
+from qr_service import certificate_qr_payload, render_qr_png
+
+
+def test_importing_the_api_does_not_load_opencv():
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, main; print('cv2' in sys.modules)"],
+        capture_output=True, text=True, check=True
+    ).stdout.split()[-1]
+    assert loaded == "False"
+
+
+def test_scan_finds_issued_certificate(client, certificate_id):
+    png = render_qr_png(certificate_qr_payload(certificate_id))
+    response = client.post("/verify-certificate/scan", files=[("images", ("qr.png", png, "image/png"))])
+    assert response.status_code == 200
+    [result] = response.json()["results"]
+    assert [(c["certificate_id"], c["valid"]) for c in result["certificates"]] == [(certificate_id, True)]
+
+
+def test_scan_rejects_too_many_images(client):
+    files = [("images", (f"{i}.png", b"not an image", "image/png")) for i in range(main.SCAN_MAX_IMAGES + 1)]
+    assert client.post("/verify-certificate/scan", files=files).status_code == 413
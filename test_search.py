@@ -0,0 +1,56 @@
+import pytest
+
+import search
+from ids import new_certificate_id
+from storage import MemoryCertificateStore, SQLiteCertificateStore
+
+PEOPLE = [
+    ("Jane Doe", "Python Programming"),
+    ("John Smith", "Data Science"),
+    ("Maria Garcia", "Web Design"),
+]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        store = MemoryCertificateStore()
+    else:
+        store = SQLiteCertificateStore(str(tmp_path / "certificates.db"))
+    store.put_many({
+        "certificate_id": new_certificate_id(),
+        "recipient_name": name,
+        "course_name": course,
+        "issue_date": "2024-06-01",
+    } for name, course in PEOPLE)
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("jame", "jane", True),      # substitution
+    ("pyhton", "python", True),  # transposition
+    ("pythn", "python", True),   # deletion
+    ("janee", "jane", True),     # insertion
+    ("abcd", "badc", False),
+    ("jane", "joan", False),
+])
+def test_within_one_edit(a, b, expected):
+    assert search.within_one_edit(a, b) is expected
+
+
+@pytest.mark.parametrize("query, recipient", [
+    ("jame", "Jane Doe"),
+    ("jnae doe", "Jane Doe"),
+    ("pyhton", "Jane Doe"),
+    ("jhon smith", "John Smith"),
+    ("garica", "Maria Garcia"),
+])
+def test_single_typos_are_found(store, query, recipient):
+    results = store.search(query)
+    assert results and results[0][0]["recipient_name"] == recipient
+
+
+def test_short_words_need_exact_or_prefix_matches(store):
+    # Three letters are too short for an edit to be told apart from another word
+    assert store.search("jne") == []
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import numpy as np
+
+from chatbot import CertificateChatbot
+from ids import new_certificate_id
+from storage import MemoryCertificateStore
+
+
+class FakeEmbeddingChatbot(CertificateChatbot):
+    """Embeds texts by their first letter; embedding can be held up to simulate a slow model"""
+
+    def __init__(self, *args, **kwargs):
+        self.embedding_allowed = threading.Event()
+        self.embedding_allowed.set()
+        super().__init__(*args, **kwargs)
+
+    def _encode_batch(self, texts):
+        if not texts[0].startswith("query:"):
+            self.embedding_allowed.wait(5)
+        vectors = []
+        for text in texts:
+            vector = np.zeros(26, dtype=np.float32)
+            vector[ord(text.removeprefix("query:").lower()[0]) - ord("a")] = 1
+            vectors.append(vector)
+        return vectors
+
+
+def certificate(name):
+    return {"certificate_id": new_certificate_id(), "recipient_name": name,
+            "course_name": "Python Programming", "issue_date": "2024-06-01"}
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_semantic_search_does_not_wait_for_new_certificates_to_be_embedded():
+    store = MemoryCertificateStore()
+    store.put_many([certificate("Jane Doe")])
+    bot = FakeEmbeddingChatbot(store, semantic_sync_interval=0.05)
+    try:
+        # The first search starts the fill rather than waiting for it
+        bot.embedding_allowed.clear()
+        started = time.monotonic()
+        assert bot.semantic_search("query:jane") == []
+        assert time.monotonic() - started < 1
+
+        bot.embedding_allowed.set()
+        wait_for(lambda: len(bot.semantic_index) == 1)
+        assert [c["recipient_name"] for c, _ in bot.semantic_search("query:jane")] == ["Jane Doe"]
+
+        bot.embedding_allowed.clear()
+        store.put_many([certificate("Kim Lee")])
+        started = time.monotonic()
+        assert [c["recipient_name"] for c, _ in bot.semantic_search("query:kim", k=1)] == ["Jane Doe"]
+        assert time.monotonic() - started < 1
+
+        bot.embedding_allowed.set()
+        wait_for(lambda: len(bot.semantic_index) == 2)
+        assert [c["recipient_name"] for c, _ in bot.semantic_search("query:kim", k=1)] == ["Kim Lee"]
+    finally:
+        bot.close()
@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+
+import pytest
+
+from ids import new_certificate_id
+from storage import SQLiteCertificateStore
+from verify_index import index_segments, read_watermark
+
+
+def certificate(i):
+    return {
+        "certificate_id": new_certificate_id(),
+        "recipient_name": f"Recipient {i}",
+        "course_name": "Data Science",
+        "issue_date": "2024-06-01",
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    # Updates only happen when the test asks for them
+    store = SQLiteCertificateStore(str(tmp_path / "certificates.db"), index_path=str(tmp_path / "certificates.idx"),
+                                   index_interval=3600, index_max_staleness=3600)
+    yield store
+    store.close()
+
+
+def indexed(store, certificate_id):
+    store.index._checked_at = 0
+    return store.index.get(certificate_id) is not None
+
+
+def test_new_rows_are_appended_as_deltas(store):
+    base = [certificate(i) for i in range(100)]
+    store.put_many(base)
+    assert store.rebuild_index()
+    assert len(index_segments(store.index_path)) == 1
+    base_inode = os.stat(store.index_path).st_ino
+
+    added = [certificate(i) for i in range(100, 110)]
+    store.put_many(added)
+    assert store.rebuild_index()
+    assert not store.rebuild_index()
+    segments = index_segments(store.index_path)
+    assert [header[0] for _, header in segments] == [100, 10]
+    assert os.stat(store.index_path).st_ino == base_inode
+    assert read_watermark(store.index_path) == 110
+    assert all(indexed(store, row["certificate_id"]) for row in base + added)
+
+
+def test_deltas_are_merged_then_compacted(store):
+    store.put_many([certificate(i) for i in range(1000)])
+    store.rebuild_index()
+    rows = []
+    for i in range(store.INDEX_MAX_DELTAS + 1):
+        rows.append(certificate(1000 + i))
+        store.put(rows[-1])
+        store.rebuild_index()
+    # The ninth update merged the eight deltas and itself into one
+    assert [header[0] for _, header in index_segments(store.index_path)] == [1000, 9]
+
+    # Outgrowing a quarter of the base starts a new generation
+    store.put_many([certificate(i) for i in range(2000, 2300)])
+    store.rebuild_index()
+    segments = index_segments(store.index_path)
+    assert [(header[0], header[2]) for _, header in segments] == [(1309, 1)]
+    assert not os.path.exists(f"{store.index_path}.0.1")
+    assert all(indexed(store, row["certificate_id"]) for row in rows)
+
+
+def test_continuous_writes_still_update_the_index(tmp_path):
+    store = SQLiteCertificateStore(str(tmp_path / "certificates.db"), index_path=str(tmp_path / "certificates.idx"),
+                                   index_interval=0.2, index_max_staleness=0.5)
+    stop = threading.Event()
+
+    def issue():
+        i = 0
+        while not stop.is_set():
+            store.put(certificate(i))
+            i += 1
+            time.sleep(0.02)
+
+    writer = threading.Thread(target=issue)
+    writer.start()
+    try:
+        time.sleep(2)
+        watermark = read_watermark(store.index_path)
+        # Writes never paused for index_interval, but the index kept up
+        assert watermark > 30
+    finally:
+        stop.set()
+        writer.join()
+        store.close()
@@ -0,0 +1,13 @@
+import time
+
+import main
+
+
+def test_warm_up_starts_every_render_process(client):
+    deadline = time.monotonic() + 30
+    while not main.warmup_state["render_pool"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert main.warmup_state["error"] is None
+    assert main.warmup_state["render_pool"]
+    assert len(main.render_pool.executor._processes) == main.render_pool.max_workers
+    assert client.get("/readyz").json()["render_pool"]
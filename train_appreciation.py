@@ -0,0 +1,45 @@
+"""Train the appreciation predictor offline and write it as a lookup-table artifact.
+
+Run from the repository root (needs pandas and scikit-learn, which the
+serving processes do not):
+
+    python train_appreciation.py [output]
+
+The classifier's only feature is the course type, so its prediction for
+every known type is computed here and stored; the content generator loads
+the table and never imports sklearn.
+"""
+import json
+import sys
+from datetime import datetime, timezone
+
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from content_generator import APPRECIATION_MODEL_PATH, APPRECIATION_MODEL_VERSION, appreciation_data
+
+
+def train(data):
+    df = pd.DataFrame(data)
+    le = LabelEncoder()
+    X = le.fit_transform(df["course_type"]).reshape(-1, 1)
+    y = df["appreciation_message"]
+    clf = RandomForestClassifier(random_state=0)
+    clf.fit(X, y)
+    predictions = clf.predict(le.transform(le.classes_).reshape(-1, 1))
+    return {
+        "version": APPRECIATION_MODEL_VERSION,
+        "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "messages": dict(zip(le.classes_.tolist(), predictions.tolist())),
+        "fallback": sorted(set(data["appreciation_message"])),
+    }
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else APPRECIATION_MODEL_PATH
+    model = train(appreciation_data)
+    with open(path, "w") as f:
+        json.dump(model, f, indent=2)
+        f.write("\n")
+    print(f"Wrote predictions for {len(model['messages'])} course types to {path}")
@@ -0,0 +1,248 @@
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from records import CertificateRecord
+
+# File layout:
+#   header   magic, entry count, watermark (the store's highest rowid when built), generation
+#   buckets  _BUCKETS + 1 entry positions; bucket b holds keys starting with b
+#   entries  sorted (16-byte key, record offset, record length)
+#   records  compact JSON arrays of _FIELDS, one per entry
+#
+# An index is a base file at `path` plus delta segments `path.<generation>.1`,
+# `path.<generation>.2`, ... in the same layout, each holding the rows added
+# since the previous file's watermark. A full rebuild starts a new generation,
+# which orphans the old deltas.
+_MAGIC = b"CVI3"
+_HEADER = struct.Struct("<4sIQI")
+_BUCKETS = 1 << 16
+_BUCKET = struct.Struct("<I")
+_ENTRY = struct.Struct("<16sQI")
+_ENTRIES_START = _HEADER.size + _BUCKET.size * (_BUCKETS + 1)
+
+_FIELDS = ("certificate_id", "recipient_name", "course_name", "issue_date", "qr_payload", "content")
+
+
+def index_key(certificate_id: str) -> bytes:
+    """16-byte index key; hashed so keys spread evenly over the buckets."""
+    return hashlib.blake2b(certificate_id.encode(), digest_size=16).digest()
+
+
+def segment_path(path: str, generation: int, number: int) -> str:
+    return f"{path}.{generation}.{number}"
+
+
+def read_header(path: str) -> Optional[Tuple[int, int, int]]:
+    """(entry count, watermark, generation) of an index file, or None if there is no valid one."""
+    try:
+        with open(path, "rb") as f:
+            magic, count, watermark, generation = _HEADER.unpack(f.read(_HEADER.size))
+    except (FileNotFoundError, struct.error):
+        return None
+    return (count, watermark, generation) if magic == _MAGIC else None
+
+
+def index_segments(path: str) -> List[Tuple[str, Tuple[int, int, int]]]:
+    """(path, header) of the base file and each of its generation's delta segments, in order."""
+    base = read_header(path)
+    if base is None:
+        return []
+    segments = [(path, base)]
+    generation = base[2]
+    while True:
+        delta_path = segment_path(path, generation, len(segments))
+        header = read_header(delta_path)
+        if header is None or header[2] != generation:
+            return segments
+        segments.append((delta_path, header))
+
+
+def read_watermark(path: str) -> int:
+    """Watermark of an existing index (its newest segment), or -1 if there is none."""
+    segments = index_segments(path)
+    return segments[-1][1][1] if segments else -1
+
+
+def build_verify_index(records: Iterable[CertificateRecord], path: str, watermark: int = 0,
+                       generation: int = 0) -> int:
+    """Write an index file of the records to path, atomically replacing any existing one.
+
+    Returns the number of records indexed.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w+b") as f:
+            # Records are spooled to a second file until the sorted entries are known
+            keys = []
+            data_size = 0
+            with tempfile.TemporaryFile(dir=directory) as data:
+                for record in records:
+                    encoded = json.dumps([record[field] for field in _FIELDS], separators=(",", ":")).encode()
+                    keys.append((index_key(record.certificate_id), data_size, len(encoded)))
+                    data.write(encoded)
+                    data_size += len(encoded)
+                keys.sort()
+                buckets = [0] * (_BUCKETS + 1)
+                for key, _, _ in keys:
+                    buckets[int.from_bytes(key[:2], "big") + 1] += 1
+                for bucket in range(_BUCKETS):
+                    buckets[bucket + 1] += buckets[bucket]
+                base = _ENTRIES_START + _ENTRY.size * len(keys)
+                f.write(_HEADER.pack(_MAGIC, len(keys), watermark, generation))
+                f.write(struct.pack(f"<{_BUCKETS + 1}I", *buckets))
+                f.write(b"".join(_ENTRY.pack(key, base + offset, length) for key, offset, length in keys))
+                data.seek(0)
+                while True:
+                    chunk = data.read(1 << 20)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return len(keys)
+
+
+class _Segment:
+    __slots__ = ("mapped", "count", "generation", "identity")
+
+    def __init__(self, mapped: mmap.mmap, count: int, generation: int, identity: Tuple[int, int]):
+        self.mapped = mapped
+        self.count = count
+        self.generation = generation
+        self.identity = identity
+
+
+class VerifyIndex:
+    """Read-only, memory-mapped certificate index.
+
+    Lookups jump to the key's bucket and binary-search the sorted keys
+    within it, in place, so every process that maps the file shares it
+    through the page cache instead of holding its own copy. The base file
+    and its delta segments are written elsewhere and swapped in with a
+    rename; readers notice within check_interval seconds and map the new
+    files. An index is a snapshot, so a miss must fall back to the store.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # Mapped base file then delta segments, oldest first
+        self._segments: List[_Segment] = []
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _current(self) -> List[_Segment]:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            with self._lock:
+                if now - self._checked_at >= self.check_interval:
+                    self._checked_at = now
+                    self._reload_if_replaced()
+        return self._segments
+
+    def _map(self, path: str, previous: Optional[_Segment]) -> Optional[_Segment]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        if previous is not None and previous.identity == identity:
+            return previous
+        if stat.st_size < _HEADER.size:
+            return None
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, _, generation = _HEADER.unpack_from(mapped)
+        if magic != _MAGIC:
+            mapped.close()
+            return None
+        return _Segment(mapped, count, generation, identity)
+
+    def _reload_if_replaced(self) -> None:
+        previous = self._segments
+        segments = []
+        base = self._map(self.path, previous[0] if previous else None)
+        if base is not None:
+            segments.append(base)
+            while True:
+                number = len(segments)
+                segment = self._map(segment_path(self.path, base.generation, number),
+                                    previous[number] if number < len(previous) else None)
+                if segment is None or segment.generation != base.generation:
+                    break
+                segments.append(segment)
+        if len(segments) != len(previous) or any(new is not old for new, old in zip(segments, previous)):
+            # Replaced maps are left for garbage collection, since other
+            # threads may still be reading from them
+            self._segments = segments
+            self.reloads += 1
+
+    def get(self, certificate_id: str) -> Optional[CertificateRecord]:
+        segments = self._current()
+        if segments:
+            key = index_key(certificate_id)
+            bucket = _HEADER.size + _BUCKET.size * int.from_bytes(key[:2], "big")
+            # Newest first: recent certificates are the most looked up
+            for segment in reversed(segments):
+                certificate = self._lookup(segment.mapped, bucket, key, certificate_id)
+                if certificate is not None:
+                    self.hits += 1
+                    return certificate
+        self.misses += 1
+        return None
+
+    @staticmethod
+    def _lookup(mapped: mmap.mmap, bucket: int, key: bytes, certificate_id: str) -> Optional[CertificateRecord]:
+        low, high = struct.unpack_from("<2I", mapped, bucket)
+        position = bisect.bisect_left(_KeyView(mapped), key, low, high)
+        # Keys can in principle collide, so check every entry with this key
+        while position < high:
+            entry_key, offset, length = _ENTRY.unpack_from(mapped, _ENTRIES_START + position * _ENTRY.size)
+            if entry_key != key:
+                break
+            values = json.loads(mapped[offset:offset + length])
+            if values[0] == certificate_id:
+                return CertificateRecord(*values)
+            position += 1
+        return None
+
+    def stats(self):
+        segments = self._segments
+        return {
+            "entries": sum(segment.count for segment in segments),
+            "segments": len(segments),
+            "bytes": sum(len(segment.mapped) for segment in segments),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+        }
+
+
+class _KeyView:
+    """Sequence view of the keys in a mapped index, for bisect."""
+
+    __slots__ = ("_mapped",)
+
+    def __init__(self, mapped: mmap.mmap):
+        self._mapped = mapped
+
+    def __getitem__(self, position: int) -> bytes:
+        start = _ENTRIES_START + position * _ENTRY.size
+        return self._mapped[start:start + 16]
@@ -0,0 +1,120 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class PoolBusy(Exception):
+    """Raised when a pool's queue is full; surfaced to clients as 503."""
+
+    def __init__(self, pool: "WorkerPool"):
+        super().__init__(f"{pool.name} pool is busy")
+        self.pool = pool
+        self.retry_after = pool.retry_after
+
+
+class WorkerPool:
+    """Runs blocking or CPU-bound calls off the event loop.
+
+    At most max_pending calls may be queued or running at once. Beyond
+    that, `run` fails fast with PoolBusy instead of letting latency grow
+    without bound, unless the caller asks to wait for a slot.
+    """
+
+    def __init__(self,
+                 name: str,
+                 executor_factory: Callable[[int], Executor],
+                 max_workers: int,
+                 max_pending: int,
+                 retry_after: int = 1):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._executor_factory = executor_factory
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+        self.rejected = 0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._executor_factory(self.max_workers)
+        return self._executor
+
+    async def run(self, fn: Callable, *args: Any, wait: bool = False, **kwargs: Any) -> Any:
+        """
+        Run fn(*args, **kwargs) in the pool and return its result.
+
+        Args:
+            wait: Wait for a free slot instead of raising PoolBusy (for bulk jobs
+                  that already bound their own concurrency)
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        if not wait and self._slots.locked():
+            self.rejected += 1
+            raise PoolBusy(self)
+        async with self._slots:
+            self.pending += 1
+            try:
+                loop = asyncio.get_running_loop()
+                call = functools.partial(fn, *args, **kwargs)
+                if isinstance(self.executor, ThreadPoolExecutor):
+                    # Threads see the caller's context variables, such as the request's timing spans
+                    call = functools.partial(contextvars.copy_context().run, call)
+                return await loop.run_in_executor(self.executor, call)
+            finally:
+                self.pending -= 1
+
+    async def start(self, fn: Callable, *args: Any) -> None:
+        """Start every worker, by running fn(*args) once per worker at the same time.
+
+        Process pools only spawn a process when a call arrives and no worker
+        is idle, so a single call would start just one of them.
+        """
+        await asyncio.gather(*(self.run(fn, *args, wait=True) for _ in range(self.max_workers)))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+def _process_executor(max_workers: int) -> Executor:
+    # Spawn rather than fork: the API process may hold model weights and store threads
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _thread_executor(name: str) -> Callable[[int], Executor]:
+    return lambda max_workers: ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+
+_cpus = os.cpu_count() or 1
+
+# PDF rendering, QR encoding and bulk issuance
+render_pool = WorkerPool(
+    "render",
+    _process_executor,
+    max_workers=int(os.environ.get("RENDER_WORKERS", _cpus)),
+    max_pending=int(os.environ.get("RENDER_MAX_PENDING", _cpus * 8))
+)
+
+# Chatbot requests. Models live in this process, so threads; most of them
+# wait on the chatbot's inference batchers, which run one model call at a time.
+inference_pool = WorkerPool(
+    "inference",
+    _thread_executor("inference"),
+    max_workers=int(os.environ.get("INFERENCE_WORKERS", 16)),
+    max_pending=int(os.environ.get("INFERENCE_MAX_PENDING", 64)),
+    retry_after=2
+)
+
+
+def shutdown_pools() -> None:
+    render_pool.shutdown()
+    inference_pool.shutdown()